@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""A local, in-memory stand-in for the Kentik APIs used by the collection.
+
+Only the standard library is used. The server implements the device, site,
+label, plan, custom dimension and batch endpoints the modules call, can add latency to every
+request and can answer a share of requests with 429 to exercise the client's
+retry path. Every request is counted, along with the bytes moved each way.
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTES = []
+
+
+def route(method, pattern):
+    """Register a handler for a method and path regular expression"""
+    def decorator(func):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), func))
+        return func
+    return decorator
+
+
+class ApiError(Exception):
+    """Raised by handlers to answer with an error status"""
+
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+
+
+class MockKentik(object):
+    """Tenant state and request accounting behind the mock server"""
+
+    def __init__(self, tenant, latency=0.0, throttle_rate=0.0, retry_after=0, seed=0):
+        self.labels = dict((label["id"], label) for label in tenant["labels"])
+        self.sites = dict((site["id"], site) for site in tenant["sites"])
+        self.plans = list(tenant["plans"])
+        self.devices = dict((device["id"], device) for device in tenant["devices"])
+        self.device_names = dict((device["deviceName"], device["id"]) for device in tenant["devices"])
+        self.dimensions = dict(
+            (dimension["name"], dict(dimension, populators={})) for dimension in tenant.get("dimensions", [])
+        )
+        self.batches = {}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self._device_list = None
+        self.next_id = max([int(key) for key in self.devices] + [0]) + 1
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the request counters"""
+        with self.lock:
+            self.calls = []
+            self.throttled = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def stats(self):
+        """Return the request counters"""
+        with self.lock:
+            return {
+                "calls": len(self.calls),
+                "throttled": self.throttled,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "endpoints": self._endpoint_counts(),
+            }
+
+    def _endpoint_counts(self):
+        counts = {}
+        for method, template, status in self.calls:
+            key = f"{method} {template} {status}"
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def new_id(self):
+        """Allocate an object id"""
+        with self.lock:
+            value = self.next_id
+            self.next_id += 1
+        return str(value)
+
+    def device_list(self):
+        """Return the serialized device list, reusing it until a device changes"""
+        with self.lock:
+            if self._device_list is None:
+                self._device_list = json.dumps({"devices": list(self.devices.values())}).encode("utf-8")
+            return self._device_list
+
+    def devices_changed(self):
+        """Drop the serialized device list"""
+        with self.lock:
+            self._device_list = None
+
+
+@route("GET", r"/label/v\w+/labels")
+def list_labels(api, match, body):
+    return {"labels": list(api.labels.values())}
+
+
+@route("POST", r"/label/v\w+/labels")
+def create_label(api, match, body):
+    label = dict(body["label"], id=int(api.new_id()))
+    api.labels[label["id"]] = label
+    return {"label": label}
+
+
+@route("PUT", r"/label/v\w+/labels/(\d+)")
+def update_label(api, match, body):
+    label_id = int(match.group(1))
+    if label_id not in api.labels:
+        raise ApiError(404, "label not found")
+    api.labels[label_id] = dict(body["label"], id=label_id)
+    return {"label": api.labels[label_id]}
+
+
+@route("DELETE", r"/label/v\w+/labels/(\d+)")
+def delete_label(api, match, body):
+    if api.labels.pop(int(match.group(1)), None) is None:
+        raise ApiError(404, "label not found")
+    return {}
+
+
+@route("GET", r"/site/v\w+/sites")
+def list_sites(api, match, body):
+    return {"sites": list(api.sites.values())}
+
+
+@route("POST", r"/site/v\w+/sites")
+def create_site(api, match, body):
+    site = dict(body["site"], id=api.new_id())
+    api.sites[site["id"]] = site
+    return {"site": site}
+
+
+@route("GET", r"/site/v\w+/sites/(\d+)")
+def get_site(api, match, body):
+    if match.group(1) not in api.sites:
+        raise ApiError(404, "site not found")
+    return {"site": api.sites[match.group(1)]}
+
+
+@route("PUT", r"/site/v\w+/sites/(\d+)")
+def update_site(api, match, body):
+    if match.group(1) not in api.sites:
+        raise ApiError(404, "site not found")
+    api.sites[match.group(1)] = dict(body["site"], id=match.group(1))
+    return {"site": api.sites[match.group(1)]}
+
+
+@route("DELETE", r"/site/v\w+/sites/(\d+)")
+def delete_site(api, match, body):
+    if api.sites.pop(match.group(1), None) is None:
+        raise ApiError(404, "site not found")
+    return {}
+
+
+@route("GET", r"/api/v5/plans")
+def list_plans(api, match, body):
+    return {"plans": api.plans}
+
+
+def _label_refs(api, labels):
+    """Return the labels of a device request as the device API returns them"""
+    return [{"id": label["id"], "name": api.labels.get(label["id"], {}).get("name", "")} for label in labels]
+
+
+def _store_device(api, device_id, fields):
+    """Store a device request as the whole device, the way the create and update endpoints do"""
+    device = {"id": device_id, "labels": []}
+    fields = dict(fields, id=device_id)
+    if "siteId" in fields:
+        site_id = str(fields.pop("siteId"))
+        device["site"] = {"id": int(site_id), "siteName": api.sites.get(site_id, {}).get("title", "")}
+    if "planId" in fields:
+        device["plan"] = {"id": int(fields.pop("planId"))}
+    if "labels" in fields:
+        device["labels"] = _label_refs(api, fields.pop("labels"))
+    device.update(fields)
+    previous = api.devices.get(device_id)
+    if previous is not None and previous["deviceName"] != device["deviceName"]:
+        api.device_names.pop(previous["deviceName"], None)
+    api.devices[device_id] = device
+    api.device_names[device["deviceName"]] = device_id
+    api.devices_changed()
+    return device
+
+
+@route("GET", r"/device/v\w+/device")
+def list_devices(api, match, body):
+    return api.device_list()
+
+
+@route("POST", r"/device/v\w+/device")
+def create_device(api, match, body):
+    if body["device"]["deviceName"] in api.device_names:
+        raise ApiError(409, "device already exists")
+    return {"device": _store_device(api, api.new_id(), body["device"])}
+
+
+@route("GET", r"/device/v\w+/device/(\d+)")
+def get_device(api, match, body):
+    if match.group(1) not in api.devices:
+        raise ApiError(404, "device not found")
+    return {"device": api.devices[match.group(1)]}
+
+
+@route("PUT", r"/device/v\w+/device/(\d+)")
+def update_device(api, match, body):
+    if match.group(1) not in api.devices:
+        raise ApiError(404, "device not found")
+    return {"device": _store_device(api, match.group(1), body["device"])}
+
+
+@route("PUT", r"/device/v\w+/device/(\d+)/labels")
+def update_device_labels(api, match, body):
+    device = api.devices.get(match.group(1))
+    if device is None:
+        raise ApiError(404, "device not found")
+    device["labels"] = _label_refs(api, body["labels"])
+    api.devices_changed()
+    return {"device": device}
+
+
+@route("DELETE", r"/device/v\w+/device/(\d+)")
+def delete_device(api, match, body):
+    device = api.devices.pop(match.group(1), None)
+    if device is None:
+        raise ApiError(404, "device not found")
+    api.device_names.pop(device["deviceName"], None)
+    api.devices_changed()
+    return {}
+
+
+@route("GET", r"/api/v5/device/([^/]+)")
+def get_v5_device(api, match, body):
+    device_id = api.device_names.get(match.group(1))
+    if device_id is None and match.group(1) in api.devices:
+        device_id = match.group(1)
+    if device_id is None:
+        raise ApiError(404, "Device not found")
+    device = api.devices[device_id]
+    return {"device": {"id": device_id, "device_name": device["deviceName"]}}
+
+
+def _populator_records(dimension):
+    """Return the populators of a dimension the way the v5 API lists them, one criterion each"""
+    records = []
+    for value, criteria in dimension["populators"].items():
+        for criterion in criteria:
+            record = {"id": len(records) + 1, "dimension_id": dimension["id"], "value": value}
+            for key, field in criterion.items():
+                record[key] = ",".join(field) if isinstance(field, list) else field
+            records.append(record)
+    return records
+
+
+def _dimension_record(dimension):
+    return {"id": dimension["id"], "name": dimension["name"], "populators": _populator_records(dimension)}
+
+
+@route("GET", r"/api/v5/customdimensions")
+def list_dimensions(api, match, body):
+    with api.lock:
+        return {"customDimensions": [_dimension_record(dimension) for dimension in api.dimensions.values()]}
+
+
+@route("GET", r"/api/v5/customdimension/(\d+)")
+def get_dimension(api, match, body):
+    with api.lock:
+        for dimension in api.dimensions.values():
+            if str(dimension["id"]) == match.group(1):
+                return {"customDimension": _dimension_record(dimension)}
+    raise ApiError(404, "custom dimension not found")
+
+
+def _apply_batch(api, batch):
+    """Apply a completed populator batch to its dimension"""
+    dimension = api.dimensions.get(batch["dimension"])
+    if dimension is None:
+        return
+    if batch["replace_all"]:
+        dimension["populators"] = {}
+    for entry in batch["delete_entries"]:
+        dimension["populators"].pop(entry["value"], None)
+    for entry in batch["upsert_entries"]:
+        dimension["populators"][entry["value"]] = entry.get("criteria") or []
+
+
+@route("POST", r"/api/v5/batch/(tags|customdimensions/([^/]+)/populators)")
+def submit_batch(api, match, body):
+    with api.lock:
+        guid = body.get("guid")
+        if guid:
+            batch = api.batches.get(guid)
+            if batch is None or batch["complete"]:
+                raise ApiError(400, "no open batch with this guid")
+        else:
+            guid = str(uuid.uuid4())
+            batch = api.batches[guid] = {
+                "upserts": 0,
+                "deletes": 0,
+                "parts": 0,
+                "complete": False,
+                "dimension": match.group(2),
+                "replace_all": body.get("replace_all", False),
+                "upsert_entries": [],
+                "delete_entries": [],
+            }
+        batch["upserts"] += len(body.get("upserts") or [])
+        batch["deletes"] += len(body.get("deletes") or [])
+        if batch["dimension"]:
+            batch["upsert_entries"].extend(body.get("upserts") or [])
+            batch["delete_entries"].extend(body.get("deletes") or [])
+        batch["parts"] += 1
+        batch["complete"] = batch["complete"] or body.get("complete", True)
+        batch["submitted"] = time.time()
+        if batch["complete"]:
+            _apply_batch(api, batch)
+            batch["upsert_entries"] = batch["delete_entries"] = []
+    return {"message": "Batch request received", "guid": guid}
+
+
+@route("GET", r"/api/v5/batch/([0-9a-f-]+)/status")
+def batch_status(api, match, body):
+    batch = api.batches.get(match.group(1))
+    if batch is None:
+        raise ApiError(404, "batch not found")
+    # Batches take a moment to apply once their last part arrives, so a
+    # status poll straight after the submit reports the batch as running.
+    complete = batch["complete"] and time.time() - batch["submitted"] >= 0.05
+    return {
+        "guid": match.group(1),
+        "is_complete": complete,
+        "upsert": {"applied": batch["upserts"] if complete else 0, "invalid": 0},
+        "delete": {"applied": batch["deletes"] if complete else 0, "unapplied": 0},
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Dispatch requests to the registered routes"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, template, payload, headers=None):
+        if isinstance(payload, bytes):
+            data = payload
+        else:
+            data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        api = self.server.api
+        with api.lock:
+            api.calls.append((self.command, template, status))
+            api.bytes_out += len(data)
+
+    def _dispatch(self):
+        api = self.server.api
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        with api.lock:
+            api.bytes_in += len(raw)
+        if api.latency:
+            time.sleep(api.latency)
+        path = self.path.split("?", 1)[0]
+        for method, pattern, handler in ROUTES:
+            match = pattern.match(path)
+            if method != self.command or not match:
+                continue
+            template = pattern.pattern.strip("^$")
+            with api.lock:
+                throttle = api.throttle_rate and api.random.random() < api.throttle_rate
+                if throttle:
+                    api.throttled += 1
+            if throttle:
+                self._reply(429, template, {"error": "Too Many Requests"}, {"Retry-After": str(api.retry_after)})
+                return
+            try:
+                body = json.loads(raw) if raw else {}
+                self._reply(200, template, handler(api, match, body))
+            except ApiError as exc:
+                self._reply(exc.status, template, {"error": str(exc)})
+            return
+        self._reply(404, path, {"error": f"no route for {self.command} {path}"})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+def serve(api, port=0):
+    """Start the mock server in a background thread and return it"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.api = api
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Run the collection's modules against a local mock Kentik API and report what they cost.
+
+Example:
+
+    python benchmarks/run.py --size 1k --size 10k --objects 100 --save results.json
+    python benchmarks/run.py --size 10k --baseline results.json
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import mock_kentik  # noqa: E402
+import scenarios  # noqa: E402
+import tenant  # noqa: E402
+
+COLLECTION_ROOT = os.path.dirname(HERE)
+# Metrics compared against a baseline; for all of them higher is worse.
+COMPARED_METRICS = ("calls_per_object", "ms_per_object", "peak_rss_mb", "bytes_per_object")
+
+
+def collections_path(workdir):
+    """Expose this checkout as ansible_collections.kentik.kentik_config under workdir"""
+    namespace = os.path.join(workdir, "ansible_collections", "kentik")
+    os.makedirs(namespace)
+    os.symlink(COLLECTION_ROOT, os.path.join(namespace, "kentik_config"))
+    return workdir
+
+
+def run_scenario(args, name, size, workdir):
+    """Run one scenario against a fresh tenant and return its measurements"""
+    api = mock_kentik.MockKentik(
+        tenant.make_tenant(tenant.SIZES[size], labels=args.labels, seed=args.seed),
+        latency=args.latency_ms / 1000.0,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = mock_kentik.serve(api)
+    ctx = {
+        "scenario": name,
+        "tenant_size": tenant.SIZES[size],
+        "objects": args.objects,
+        "labels": args.labels,
+        "seed": args.seed,
+        "max_retries": args.max_retries,
+        "url": f"http://127.0.0.1:{server.server_port}",
+        "collections_path": collections_path(tempfile.mkdtemp(dir=workdir)),
+        "cache_dir": tempfile.mkdtemp(dir=workdir),
+    }
+    env = dict(os.environ, HOME=tempfile.mkdtemp(dir=workdir))
+    try:
+        child = subprocess.run(
+            [sys.executable, scenarios.__file__, json.dumps(ctx)],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=False,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    if child.returncode != 0:
+        raise SystemExit(f"Scenario {name} ({size}) crashed:\n{child.stderr}")
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    stats = api.stats()
+    objects = max(1, args.objects)
+    result.update(
+        scenario=name,
+        size=size,
+        objects=args.objects,
+        calls=stats["calls"],
+        throttled=stats["throttled"],
+        bytes_in=stats["bytes_in"],
+        bytes_out=stats["bytes_out"],
+        calls_per_object=stats["calls"] / float(objects),
+        ms_per_object=result["wall_s"] * 1000.0 / objects,
+        bytes_per_object=(stats["bytes_in"] + stats["bytes_out"]) / float(objects),
+        endpoints=stats["endpoints"],
+    )
+    return result
+
+
+def print_table(results):
+    """Print the results as a text table"""
+    header = ("scenario", "size", "objects", "calls", "calls/obj", "429s", "wall s", "ms/obj",
+              "peak RSS MB", "KB sent", "KB recv", "changed", "failed")
+    rows = [header]
+    for result in results:
+        rows.append((
+            result["scenario"],
+            result["size"],
+            str(result["objects"]),
+            str(result["calls"]),
+            f"{result['calls_per_object']:.2f}",
+            str(result["throttled"]),
+            f"{result['wall_s']:.2f}",
+            f"{result['ms_per_object']:.1f}",
+            f"{result['peak_rss_mb']:.1f}",
+            f"{result['bytes_in'] / 1024.0:.1f}",
+            f"{result['bytes_out'] / 1024.0:.1f}",
+            str(result["changed"]),
+            str(result["failed"]),
+        ))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of every metric that regressed beyond tolerance against the baseline"""
+    previous = dict(((result["scenario"], result["size"]), result) for result in baseline)
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["size"]))
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if result[metric] > before[metric] * (1 + tolerance) and result[metric] - before[metric] > 1e-9:
+                regressions.append(
+                    f"{result['scenario']} ({result['size']}): {metric} {before[metric]:.2f} -> {result[metric]:.2f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(scenarios.SCENARIOS),
+                        help="Scenario to run; may be repeated. Defaults to all of them.")
+    parser.add_argument("--size", action="append", choices=sorted(tenant.SIZES),
+                        help="Tenant size to run against; may be repeated. Defaults to 1k.")
+    parser.add_argument("--objects", type=int, default=50, help="Objects each scenario manages.")
+    parser.add_argument("--labels", type=int, default=50, help="Labels in the synthetic tenant.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every request.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Share of requests answered with 429, between 0 and 1.")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After sent with injected 429s.")
+    parser.add_argument("--max-retries", type=int, default=5, help="max_retries passed to the modules.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Fail if results regress against this saved JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slack allowed against the baseline before a metric counts as a regression.")
+    parser.add_argument("--verbose", action="store_true", help="Also print the per-endpoint call counts.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="kentik-bench-") as workdir:
+        for size in args.size or ["1k"]:
+            for name in args.scenario or sorted(scenarios.SCENARIOS):
+                result = run_scenario(args, name, size, workdir)
+                results.append(result)
+                if args.verbose:
+                    print(f"{name} ({size}):")
+                    for endpoint, count in sorted(result["endpoints"].items()):
+                        print(f"    {count:6d}  {endpoint}")
+                if result["first_failure"]:
+                    print(f"{name} ({size}) failed: {result['first_failure']}", file=sys.stderr)
+    print_table(results)
+
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump(results, save_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Benchmark scenarios, run one per child process so peak RSS is per scenario.
+
+Each scenario is a list of module invocations. They run one after another
+through the module's main(), the same path a forked module takes, against the
+mock API and a scenario-private reference-data cache.
+"""
+from __future__ import absolute_import, division, print_function
+
+import contextlib
+import importlib
+import io
+import itertools
+import json
+import logging
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tenant  # noqa: E402
+
+
+def _existing_devices(ctx):
+    """Return the first ctx objects devices of the tenant the server holds"""
+    sites = tenant.make_sites(tenant.site_count(ctx["tenant_size"]))
+    labels = tenant.make_labels(ctx["labels"])
+    return list(itertools.islice(tenant.iter_devices(ctx["tenant_size"], sites, labels, ctx["seed"]), ctx["objects"]))
+
+
+def _device_params(device, **overrides):
+    """Return kentik_device parameters that describe an existing synthetic device"""
+    params = {
+        "deviceName": device["deviceName"],
+        "planName": tenant.PLAN_NAME,
+        "siteName": device["site"]["siteName"],
+        "sendingIps": device["sendingIps"],
+        "labels": sorted(label["name"] for label in device["labels"]),
+    }
+    params.update(overrides)
+    return params
+
+
+def label_create(ctx):
+    return [("kentik_label", {"name": f"new-label-{index}", "color": "#000000"}) for index in range(ctx["objects"])]
+
+
+def label_noop(ctx):
+    return [
+        ("kentik_label", {"name": label["name"], "color": label["color"]})
+        for label in tenant.make_labels(ctx["labels"])[:ctx["objects"]]
+    ]
+
+
+def site_create(ctx):
+    return [
+        ("kentik_site", {"title": f"new-site-{index}", "type": "SITE_TYPE_BRANCH"})
+        for index in range(ctx["objects"])
+    ]
+
+
+def site_noop(ctx):
+    return [
+        ("kentik_site", {"title": site["title"], "type": site["type"]})
+        for site in tenant.make_sites(tenant.site_count(ctx["tenant_size"]))[:ctx["objects"]]
+    ]
+
+
+def device_create(ctx):
+    site = tenant.site_title(0)
+    return [
+        ("kentik_device", {
+            "deviceName": f"new-router-{index:06d}",
+            "planName": tenant.PLAN_NAME,
+            "siteName": site,
+            "sendingIps": [f"192.0.2.{index % 250 + 1}"],
+            "labels": [tenant.label_name(0)],
+        })
+        for index in range(ctx["objects"])
+    ]
+
+
+def device_noop(ctx):
+    return [("kentik_device", _device_params(device)) for device in _existing_devices(ctx)]
+
+
+def device_noop_index(ctx):
+    return [("kentik_device", _device_params(device, use_device_index=True)) for device in _existing_devices(ctx)]
+
+
+def device_update(ctx):
+    return [
+        ("kentik_device", _device_params(device, deviceDescription="Updated by the benchmark"))
+        for device in _existing_devices(ctx)
+    ]
+
+
+def devices_bulk_noop(ctx):
+    return [("kentik_devices", {"devices": [_device_params(device) for device in _existing_devices(ctx)]})]
+
+
+SCENARIOS = {
+    "label_create": label_create,
+    "label_noop": label_noop,
+    "site_create": site_create,
+    "site_noop": site_noop,
+    "device_create": device_create,
+    "device_noop": device_noop,
+    "device_noop_index": device_noop_index,
+    "device_update": device_update,
+    "devices_bulk_noop": devices_bulk_noop,
+}
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB.
+
+    ru_maxrss survives execve, so a child started from a large parent would
+    report the parent's peak; VmHWM belongs to the current address space only.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+@contextlib.contextmanager
+def _legacy_module_args(args):
+    """Hand args to the AnsibleModule created in the block the way ansible-core 2.18 and older read them"""
+    from ansible.module_utils import basic
+
+    previous = basic._ANSIBLE_ARGS
+    basic._ANSIBLE_ARGS = json.dumps({"ANSIBLE_MODULE_ARGS": args}).encode("utf-8")
+    try:
+        yield
+    finally:
+        basic._ANSIBLE_ARGS = previous
+
+
+def module_args(args):
+    """Return a context manager that hands args to the AnsibleModule created in it"""
+    try:
+        # ansible-core 2.19 and later also need the serialization profile the arguments were encoded with.
+        from ansible.module_utils.testing import patch_module_args
+    except ImportError:
+        return _legacy_module_args(args)
+    return patch_module_args(args)
+
+
+def invoke(module_name, args):
+    """Run a module's main() in this process and return its JSON result"""
+    module = importlib.import_module(f"ansible_collections.kentik.kentik_config.plugins.modules.{module_name}")
+    output = io.StringIO()
+    with module_args(args), contextlib.redirect_stdout(output):
+        try:
+            module.main()
+        except SystemExit:
+            pass
+    try:
+        return json.loads(output.getvalue())
+    except ValueError:
+        return {"failed": True, "msg": output.getvalue()}
+
+
+def run(ctx):
+    """Run a scenario and return its client-side measurements"""
+    sys.path.insert(0, ctx["collections_path"])
+    from ansible_collections.kentik.kentik_config.plugins.module_utils import kentik_client
+
+    for region in kentik_client.KENTIK_HOSTS:
+        kentik_client.KENTIK_HOSTS[region] = {"grpc": ctx["url"], "v5": ctx["url"]}
+    logging.disable(logging.CRITICAL)
+    invocations = SCENARIOS[ctx["scenario"]](ctx)
+    common = {
+        "email": "bench@example.com",
+        "token": "bench-token",
+        "cache_dir": ctx["cache_dir"],
+        "max_retries": ctx["max_retries"],
+    }
+    failed = []
+    changed = 0
+    start = time.perf_counter()
+    for module_name, args in invocations:
+        result = invoke(module_name, dict(common, **args))
+        if result.get("failed"):
+            failed.append(result.get("msg"))
+        elif result.get("changed"):
+            changed += 1
+    wall = time.perf_counter() - start
+    return {
+        "invocations": len(invocations),
+        "changed": changed,
+        "failed": len(failed),
+        "first_failure": failed[0] if failed else None,
+        "wall_s": wall,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(json.loads(sys.argv[1]))))
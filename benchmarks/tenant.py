@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Synthetic Kentik tenants for the benchmarks.
+
+Devices carry the full set of fields the device API returns, so list
+responses are about as large per device as they are against a real tenant.
+"""
+from __future__ import absolute_import, division, print_function
+
+import random
+
+SIZES = {
+    "1k": 1000,
+    "10k": 10000,
+    "100k": 100000,
+}
+
+PLAN_NAME = "Benchmark Plan"
+DIMENSION_NAMES = ("c_src_customer", "c_dst_customer")
+
+
+def device_name(index):
+    """Return the name of the index-th synthetic device"""
+    return f"bench-router-{index:06d}"
+
+
+def site_title(index):
+    """Return the title of the index-th synthetic site"""
+    return f"bench-site-{index:04d}"
+
+
+def label_name(index):
+    """Return the name of the index-th synthetic label"""
+    return f"bench-label-{index:03d}"
+
+
+def make_device(index, sites, labels, rng):
+    """Build one device as the device API returns it"""
+    site = sites[index % len(sites)]
+    address = f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+    return {
+        "id": str(100000 + index),
+        "deviceName": device_name(index),
+        "deviceDescription": "Added by Ansible",
+        "deviceSubtype": "router",
+        "deviceSampleRate": 1,
+        "cdnAttr": "none",
+        "plan": {"id": 1, "name": PLAN_NAME, "active": True, "maxDevices": 200000, "maxFps": 1000000},
+        "site": {"id": int(site["id"]), "siteName": site["title"], "lat": site["lat"], "lon": site["lon"]},
+        "labels": [
+            {"id": label["id"], "name": label["name"], "color": label["color"]}
+            for label in rng.sample(labels, 2)
+        ],
+        "sendingIps": [address],
+        "deviceSnmpIp": address,
+        "deviceSnmpCommunity": "",
+        "minimizeSnmp": False,
+        "deviceBgpType": "none",
+        "deviceBgpNeighborIp": "",
+        "deviceBgpNeighborIp6": "",
+        "deviceBgpNeighborAsn": "",
+        "deviceBgpFlowspec": False,
+        "deviceFlowType": "auto",
+        "deviceAlert": "",
+        "deviceStatus": "V",
+        "interfaces": [],
+        "nms": {
+            "agentId": "",
+            "ipAddress": address,
+            "snmp": {"credentialName": "", "port": 161, "timeout": "2s"},
+            "st": None,
+        },
+        "createdDate": "2024-01-01T00:00:00.000Z",
+        "updatedDate": "2024-01-01T00:00:00.000Z",
+    }
+
+
+def make_sites(count):
+    """Build the synthetic sites"""
+    return [
+        {
+            "id": str(index + 1),
+            "title": site_title(index),
+            "lat": 0,
+            "lon": 0,
+            "type": "SITE_TYPE_DATA_CENTER",
+            "siteMarket": "",
+            "addressClassification": {"infrastructureNetworks": [], "userAccessNetworks": [], "otherNetworks": []},
+        }
+        for index in range(count)
+    ]
+
+
+def make_labels(count):
+    """Build the synthetic labels"""
+    return [{"id": index + 1, "name": label_name(index), "color": "#5340A5"} for index in range(count)]
+
+
+def site_count(devices):
+    """Return the number of sites a tenant of the given size is spread over"""
+    return max(1, devices // 100)
+
+
+def iter_devices(count, sites, labels, seed=0):
+    """Yield the synthetic devices in order; the first n are the same whatever the count"""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield make_device(index, sites, labels, rng)
+
+
+def make_tenant(devices, labels=50, seed=0):
+    """Build a tenant with the given number of devices, spread over sites and labels"""
+    site_list = make_sites(site_count(devices))
+    label_list = make_labels(labels)
+    return {
+        "labels": label_list,
+        "sites": site_list,
+        "plans": [{"id": 1, "name": PLAN_NAME}],
+        "devices": list(iter_devices(devices, site_list, label_list, seed)),
+        "dimensions": [{"id": index + 1, "name": name} for index, name in enumerate(DIMENSION_NAMES)],
+    }
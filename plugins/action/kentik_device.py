@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    ensure_device,
+    device_module_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.plugin_utils.kentik_action import KentikActionBase
+
+
+class ActionModule(KentikActionBase):
+    """Run looped kentik_device items in-process on the controller"""
+
+    MODULE = "kentik_device"
+
+    def argument_spec(self):
+        return device_module_argument_spec()
+
+    def ensure(self, module, client, cache):
+        return ensure_device(module, client, cache)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (
+    ensure_site,
+    site_module_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.plugin_utils.kentik_action import KentikActionBase
+
+
+class ActionModule(KentikActionBase):
+    """Run looped kentik_site items in-process on the controller"""
+
+    MODULE = "kentik_site"
+
+    def argument_spec(self):
+        return site_module_argument_spec()
+
+    def ensure(self, module, client, cache):
+        return ensure_site(module, client, cache)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: kentik_profile
+type: aggregate
+short_description: Profile the Kentik tasks of a playbook and export the timings for Prometheus
+version_added: "1.2.0"
+description:
+- Times every task of a C(kentik.kentik_config) module, per host and per loop item, and adds the timings up per
+  module.
+- When a module is run with I(api_stats=true), the latency histograms, errors, retries and bytes of the API calls
+  it reports are added up per module and endpoint.
+- When the playbook ends, the totals are written as a Prometheus node exporter textfile collector file and as a JSON
+  summary, both named after the playbook.
+requirements:
+- Enable the callback in the C(callbacks_enabled) setting of C(ansible.cfg).
+options:
+    output_dir:
+        description: Directory the JSON summary is written to, and the textfile when I(prometheus_dir) is not set.
+        type: path
+        default: ~/.ansible/kentik_profile
+        env:
+        - name: KENTIK_PROFILE_OUTPUT_DIR
+        ini:
+        - section: callback_kentik_profile
+          key: output_dir
+    prometheus_dir:
+        description: The directory the node exporter textfile collector reads, for example C(/var/lib/node_exporter).
+        type: path
+        env:
+        - name: KENTIK_PROFILE_PROMETHEUS_DIR
+        ini:
+        - section: callback_kentik_profile
+          key: prometheus_dir
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+# ansible.cfg
+# [defaults]
+# callbacks_enabled = kentik.kentik_config.kentik_profile
+#
+# [callback_kentik_profile]
+# prometheus_dir = /var/lib/node_exporter
+
+- name: Report the API calls of every device task to the profiler
+  hosts: localhost
+  module_defaults:
+    kentik.kentik_config.kentik_device:
+      api_stats: true
+  tasks:
+    - name: Sync the devices
+      kentik.kentik_config.kentik_device:
+        deviceName: "{{ item }}"
+        email: "{{ kentik_user }}"
+        token: "{{ kentik_token }}"
+      loop: "{{ groups['routers'] }}"
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+
+from ansible.module_utils._text import to_text
+from ansible.plugins.callback import CallbackBase
+
+COLLECTION_PREFIX = "kentik.kentik_config."
+METRIC_PREFIX = "kentik_ansible"
+# Upper bounds, in seconds, of the task duration histogram buckets.
+DURATION_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return to_text(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _bucket_key(bound):
+    return "+Inf" if bound is None else str(bound)
+
+
+class _Histogram(object):
+    """Cumulative histogram counts with their sum, in the form the Prometheus exposition format takes"""
+
+    def __init__(self, bounds):
+        self.buckets = dict((_bucket_key(bound), 0) for bound in tuple(bounds) + (None,))
+        self.bounds = bounds
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add one observation"""
+        for bound in self.bounds:
+            if value <= bound:
+                self.buckets[str(bound)] += 1
+        self.buckets["+Inf"] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, buckets, total, count):
+        """Add pre-aggregated cumulative bucket counts, as reported in a module's api_stats"""
+        for key, value in buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + value
+        self.sum += total
+        self.count += count
+
+    def lines(self, name, labels):
+        """Return the exposition lines of the histogram"""
+        lines = []
+        for key in sorted(self.buckets, key=lambda key: float("inf") if key == "+Inf" else float(key)):
+            lines.append(f"{name}_bucket{{{_labels(le=key, **labels)}}} {self.buckets[key]}")
+        lines.append(f"{name}_sum{{{_labels(**labels)}}} {_number(round(self.sum, 6))}")
+        lines.append(f"{name}_count{{{_labels(**labels)}}} {self.count}")
+        return lines
+
+
+def _write_atomically(path, text):
+    """Write text to path through a temporary file, so readers never see a partial file"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".kentik_profile.")
+    try:
+        with os.fdopen(handle, "w") as temp_file:
+            temp_file.write(text)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+class CallbackModule(CallbackBase):
+    """Aggregate the timings of Kentik tasks and export them when the playbook ends"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "kentik.kentik_config.kentik_profile"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)
+        self.playbook = "playbook"
+        self.started = time.time()
+        self.marks = {}
+        self.modules = {}
+        self.endpoints = {}
+        self.tasks = {}
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook = os.path.splitext(os.path.basename(playbook._file_name))[0]
+        self.started = time.time()
+
+    def _module(self, task):
+        """Return the short name of the Kentik module a task runs, or None for any other task"""
+        action = getattr(task, "resolved_action", None) or task.action
+        if not action or not action.startswith(COLLECTION_PREFIX):
+            return None
+        return action[len(COLLECTION_PREFIX):]
+
+    def v2_runner_on_start(self, host, task):
+        if self._module(task):
+            self.marks[(host.get_name(), task._uuid)] = time.time()
+
+    def _elapsed(self, result):
+        """Return the seconds since the task, or its previous loop item, started on the host"""
+        key = (result._host.get_name(), result._task._uuid)
+        now = time.time()
+        started = self.marks.get(key, now)
+        self.marks[key] = now
+        return now - started
+
+    def _record(self, result, status, item=False):
+        module = self._module(result._task)
+        if module is None:
+            return
+        outcome = result._result
+        if not item and isinstance(outcome.get("results"), list):
+            # The items of a loop were already recorded one at a time.
+            self.marks.pop((result._host.get_name(), result._task._uuid), None)
+            return
+        duration = self._elapsed(result)
+        stats = self.modules.setdefault(module, {
+            "runs": 0, "failed": 0, "hosts": set(), "duration": _Histogram(DURATION_BUCKETS), "duration_max": 0.0,
+        })
+        stats["runs"] += 1
+        stats["failed"] += 1 if status == "failed" else 0
+        stats["hosts"].add(result._host.get_name())
+        stats["duration"].observe(duration)
+        stats["duration_max"] = max(stats["duration_max"], duration)
+        task = self.tasks.setdefault(result._task._uuid, {
+            "name": result._task.get_name(), "module": module, "runs": 0, "failed": 0, "duration": 0.0,
+        })
+        task["runs"] += 1
+        task["failed"] += 1 if status == "failed" else 0
+        task["duration"] += duration
+        for endpoint, calls in ((outcome.get("api_stats") or {}).get("endpoints") or {}).items():
+            self._record_calls(module, endpoint, calls)
+        if not item:
+            self.marks.pop((result._host.get_name(), result._task._uuid), None)
+
+    def _record_calls(self, module, endpoint, calls):
+        """Add the API calls a module reported for one endpoint"""
+        method, _sep, path = endpoint.partition(" ")
+        stats = self.endpoints.setdefault((module, method, path), {
+            "calls": 0, "errors": 0, "retries": 0, "bytes_sent": 0, "bytes_received": 0, "latency": None,
+        })
+        for key in ("calls", "errors", "retries", "bytes_sent", "bytes_received"):
+            stats[key] += calls.get(key, 0)
+        buckets = calls.get("latency_buckets") or {}
+        if stats["latency"] is None:
+            stats["latency"] = _Histogram(tuple(float(key) for key in buckets if key != "+Inf"))
+        stats["latency"].merge(buckets, calls.get("latency_total", 0), calls.get("calls", 0))
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, "failed")
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, "failed")
+
+    def v2_runner_item_on_ok(self, result):
+        self._record(result, "ok", item=True)
+
+    def v2_runner_item_on_failed(self, result):
+        self._record(result, "failed", item=True)
+
+    def summary(self, finished):
+        """Return the JSON summary of the playbook"""
+        modules = {}
+        for module, stats in sorted(self.modules.items()):
+            modules[module] = {
+                "runs": stats["runs"],
+                "failed": stats["failed"],
+                "hosts": len(stats["hosts"]),
+                "duration_total": round(stats["duration"].sum, 3),
+                "duration_max": round(stats["duration_max"], 3),
+            }
+        endpoints = []
+        for (module, method, path), stats in sorted(self.endpoints.items()):
+            latency = stats["latency"]
+            endpoints.append({
+                "module": module,
+                "method": method,
+                "endpoint": path,
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "bytes_sent": stats["bytes_sent"],
+                "bytes_received": stats["bytes_received"],
+                "latency_total": round(latency.sum, 4),
+                "latency_buckets": latency.buckets,
+            })
+        return {
+            "playbook": self.playbook,
+            "started": self.started,
+            "duration": round(finished - self.started, 3),
+            "modules": modules,
+            "tasks": [
+                dict(task, duration=round(task["duration"], 3))
+                for task in sorted(self.tasks.values(), key=lambda task: -task["duration"])
+            ],
+            "endpoints": endpoints,
+        }
+
+    def metrics(self, finished, failed):
+        """Return the Prometheus textfile collector exposition of the playbook"""
+        playbook = {"playbook": self.playbook}
+        lines = [
+            f"# HELP {METRIC_PREFIX}_playbook_duration_seconds Wall time of the last run of the playbook.",
+            f"# TYPE {METRIC_PREFIX}_playbook_duration_seconds gauge",
+            f"{METRIC_PREFIX}_playbook_duration_seconds{{{_labels(**playbook)}}} {round(finished - self.started, 3)}",
+            f"# HELP {METRIC_PREFIX}_playbook_last_run_timestamp_seconds When the last run of the playbook ended.",
+            f"# TYPE {METRIC_PREFIX}_playbook_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_playbook_last_run_timestamp_seconds{{{_labels(**playbook)}}} {int(finished)}",
+            f"# HELP {METRIC_PREFIX}_playbook_failed Whether any host failed in the last run of the playbook.",
+            f"# TYPE {METRIC_PREFIX}_playbook_failed gauge",
+            f"{METRIC_PREFIX}_playbook_failed{{{_labels(**playbook)}}} {1 if failed else 0}",
+        ]
+        sections = (
+            ("task_duration_seconds", "histogram", "Wall time of each Kentik task, per host and loop item."),
+            ("task_failures", "gauge", "Kentik tasks that failed in the last run."),
+            ("api_request_duration_seconds", "histogram", "Latency of the Kentik API calls, including retries."),
+            ("api_errors", "gauge", "Kentik API calls that did not succeed in the last run."),
+            ("api_retries", "gauge", "Kentik API requests retried in the last run."),
+            ("api_bytes_sent", "gauge", "Bytes sent to the Kentik API in the last run."),
+            ("api_bytes_received", "gauge", "Bytes received from the Kentik API in the last run."),
+        )
+        values = dict((name, []) for name, _type, _help in sections)
+        for module, stats in sorted(self.modules.items()):
+            labels = dict(playbook, module=module)
+            values["task_duration_seconds"].extend(
+                stats["duration"].lines(f"{METRIC_PREFIX}_task_duration_seconds", labels)
+            )
+            values["task_failures"].append(f"{METRIC_PREFIX}_task_failures{{{_labels(**labels)}}} {stats['failed']}")
+        for (module, method, path), stats in sorted(self.endpoints.items()):
+            labels = dict(playbook, module=module, method=method, endpoint=path)
+            values["api_request_duration_seconds"].extend(
+                stats["latency"].lines(f"{METRIC_PREFIX}_api_request_duration_seconds", labels)
+            )
+            for key in ("errors", "retries", "bytes_sent", "bytes_received"):
+                values[f"api_{key}"].append(f"{METRIC_PREFIX}_api_{key}{{{_labels(**labels)}}} {stats[key]}")
+        for name, metric_type, help_text in sections:
+            if values[name]:
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+                lines.extend(values[name])
+        return "\n".join(lines) + "\n"
+
+    def v2_playbook_on_stats(self, stats):
+        finished = time.time()
+        failed = any(stats.failures.values()) or any(stats.dark.values())
+        name = _UNSAFE_NAME.sub("_", self.playbook)
+        output_dir = self.get_option("output_dir")
+        prometheus_dir = self.get_option("prometheus_dir") or output_dir
+        summary = self.summary(finished)
+        try:
+            _write_atomically(
+                os.path.join(output_dir, f"{name}.json"), json.dumps(summary, indent=2, sort_keys=True) + "\n"
+            )
+            _write_atomically(os.path.join(prometheus_dir, f"kentik_{name}.prom"), self.metrics(finished, failed))
+        except (IOError, OSError) as exc:
+            self._display.warning(f"Unable to write the Kentik profile: {to_text(exc)}")
+            return
+        for module, totals in summary["modules"].items():
+            self._display.vv(
+                f"{module}: {totals['runs']} run(s), {totals['failed']} failed, {totals['duration_total']}s total"
+            )
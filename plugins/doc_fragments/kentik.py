@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+    """Options shared by every module that talks to the Kentik API"""
+
+    DOCUMENTATION = r"""
+options:
+    region:
+        description: The region that your Kentik portal is located in.
+        type: str
+        default: US
+        choices: [ US, EU ]
+    token:
+        description: The Kentik API Token used to authenticate.
+        type: str
+        required: true
+    email:
+        description: The Kentik API Email used to authenticate.
+        type: str
+        required: true
+    max_retries:
+        description:
+        - How many times a request is retried when the API rate limits it (HTTP 429), returns a transient 5xx error
+          or the connection fails.
+        - Retries back off exponentially with jitter and honor the C(Retry-After) header.
+        - Creates are only retried when the API reports that the request was rate limited.
+        type: int
+        default: 5
+    rate_limit:
+        description:
+        - The maximum number of requests per second sent for this account by all forks on the host combined.
+        - The limit is enforced with a token bucket shared through a lock file, so it holds across every concurrent task.
+        - Set to C(0) to disable client-side rate limiting.
+        type: float
+        default: 0
+    api_stats:
+        description:
+        - Record every Kentik API call the module makes and return a summary as C(api_stats) in the result.
+        - The summary holds the number of calls, retries and errors, the total, 95th percentile and maximum latency
+          in seconds, cumulative latency histogram counts and the bytes sent and received, in total and per method
+          and endpoint.
+        - Latency includes the time spent waiting between retries. For streamed list responses it runs until the
+          last chunk is read.
+        type: bool
+        default: false
+    validate_certs:
+        description:
+        - Whether the TLS certificate of the Kentik API is validated.
+        - Only turn this off when a proxy that intercepts TLS sits in front of the API and its CA cannot be trusted
+          through I(ca_path).
+        type: bool
+        default: true
+    ca_path:
+        description:
+        - A file or directory of PEM encoded CA certificates to validate the Kentik API certificate against,
+          instead of the system CA store.
+        type: path
+"""
+
+    CACHE = r"""
+options:
+    cache_ttl:
+        description:
+        - Number of seconds that plan, site and label lists fetched from Kentik are cached on disk.
+        - The cache is shared by every fork on the host, so only one of them fetches a list when it expires.
+        - Set to C(0) to disable the cache.
+        type: int
+        default: 300
+    cache_dir:
+        description: Directory where the Kentik reference-data cache is stored.
+        type: path
+        default: ~/.ansible/tmp/kentik_cache
+"""
+
+    # List before kentik.kentik_config.kentik so that its email and token options take these settings.
+    TARGETS = r"""
+options:
+    token:
+        description:
+        - The Kentik API Token used to authenticate.
+        - Required unless I(targets) is set.
+        type: str
+        required: false
+    email:
+        description:
+        - The Kentik API Email used to authenticate.
+        - Required unless I(targets) is set.
+        type: str
+        required: false
+    targets:
+        description:
+        - Run against several Kentik regions and accounts instead of the one set by I(email), I(token) and
+          I(region).
+        - Every target gets its own API connections, rate limiter and reference-data cache, and the targets are
+          synced concurrently.
+        - A target that fails is reported in its own result without stopping the others.
+        - Mutually exclusive with I(email) and I(token).
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description: A name for the target in the results. Defaults to its email and region.
+                type: str
+            email:
+                description: The Kentik API Email used to authenticate.
+                type: str
+                required: true
+            token:
+                description: The Kentik API Token used to authenticate.
+                type: str
+                required: true
+            region:
+                description: The region that the Kentik portal of this account is located in.
+                type: str
+                default: US
+                choices: [ US, EU ]
+"""
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: kentik
+short_description: Kentik device inventory source
+version_added: "1.2.0"
+description:
+- Builds an inventory from the devices that exist in a Kentik tenant.
+- Devices, sites, labels and plans are listed through the same API endpoints used by the modules in this collection.
+- Hosts are grouped by site, label, plan and device subtype.
+- The source data can be cached with the standard inventory cache settings so repeated runs within I(cache_timeout)
+  do not call the Kentik API at all.
+- The inventory file name must end with C(kentik.yml) or C(kentik.yaml).
+options:
+    plugin:
+        description: Token that ensures this is a source file for the plugin.
+        required: true
+        choices: [ kentik.kentik_config.kentik ]
+    email:
+        description: The Kentik API Email used to authenticate.
+        type: str
+        required: true
+        env:
+        - name: KENTIK_EMAIL
+    token:
+        description: The Kentik API Token used to authenticate.
+        type: str
+        required: true
+        env:
+        - name: KENTIK_TOKEN
+    region:
+        description: The region that your Kentik portal is located in.
+        type: str
+        default: US
+        choices: [ US, EU ]
+        env:
+        - name: KENTIK_REGION
+    validate_certs:
+        description: Whether the TLS certificate of the Kentik API is validated.
+        type: bool
+        default: true
+    ca_path:
+        description: A file or directory of PEM encoded CA certificates to validate the Kentik API certificate against.
+        type: path
+    group_by:
+        description: The device attributes to create groups from.
+        type: list
+        elements: str
+        default: [ site, label, plan, subtype ]
+        choices: [ site, label, plan, subtype ]
+extends_documentation_fragment:
+- constructed
+- inventory_cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+# kentik.yml, with the credentials taken from KENTIK_EMAIL and KENTIK_TOKEN
+plugin: kentik.kentik_config.kentik
+region: US
+group_by:
+- site
+- label
+# cache the device listing between runs
+cache: true
+cache_plugin: jsonfile
+cache_connection: ~/.ansible/tmp/kentik_inventory
+cache_timeout: 3600
+keyed_groups:
+- key: kentik_subtype
+  prefix: type
+"""
+
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_native
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable, to_safe_group_name
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikClient,
+    KentikError,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    gather_labels,
+    gather_plans,
+    gather_sites,
+    iter_devices,
+)
+
+# The device fields the inventory keeps, so each streamed device is reduced as soon as it is parsed.
+DEVICE_FIELDS = (
+    "id",
+    "deviceName",
+    "deviceDescription",
+    "deviceSubtype",
+    "site",
+    "plan",
+    "labels",
+    "sendingIps",
+    "deviceSnmpIp",
+)
+
+GROUP_PREFIXES = {
+    "site": "site",
+    "label": "label",
+    "plan": "plan",
+    "subtype": "subtype",
+}
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+    """Host inventory parser for Kentik devices"""
+
+    NAME = "kentik.kentik_config.kentik"
+
+    def verify_file(self, path):
+        """Only accept inventory files named for this plugin"""
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(("kentik.yml", "kentik.yaml"))
+        return False
+
+    def _fetch_hosts(self):
+        """List the tenant's devices and reduce each one to the variables kept in the inventory"""
+        client = KentikClient(
+            self.get_option("email"),
+            self.get_option("token"),
+            self.get_option("region"),
+            validate_certs=self.get_option("validate_certs"),
+            ca_path=self.get_option("ca_path"),
+        )
+        try:
+            site_names = dict((str(site_id), title) for title, site_id in gather_sites(client).items())
+            label_names = dict((str(label_id), name) for name, label_id in gather_labels(client).items())
+            plan_names = dict((str(plan_id), name) for name, plan_id in gather_plans(client).items())
+            hosts = [self._host(device, site_names, label_names, plan_names)
+                     for device in iter_devices(client, DEVICE_FIELDS)]
+        except KentikError as exc:
+            raise AnsibleError(f"Unable to list Kentik devices: {to_native(exc)}")
+        return hosts
+
+    def _host(self, device, site_names, label_names, plan_names):
+        """Reduce a device to the variables kept in the inventory"""
+        site_id = str((device.get("site") or {}).get("id", ""))
+        plan_id = str((device.get("plan") or {}).get("id", ""))
+        return {
+            "name": device["deviceName"],
+            "kentik_id": device["id"],
+            "kentik_description": device.get("deviceDescription"),
+            "kentik_subtype": device.get("deviceSubtype"),
+            "kentik_site": site_names.get(site_id),
+            "kentik_plan": plan_names.get(plan_id),
+            "kentik_labels": [
+                label_names.get(str(label["id"]), label.get("name"))
+                for label in device.get("labels") or []
+            ],
+            "kentik_sending_ips": device.get("sendingIps") or [],
+            "kentik_snmp_ip": device.get("deviceSnmpIp"),
+        }
+
+    def _populate(self, hosts):
+        """Add the hosts and their groups to the inventory"""
+        group_by = self.get_option("group_by")
+        strict = self.get_option("strict")
+        for host in hosts:
+            name = host["name"]
+            self.inventory.add_host(name)
+            host_vars = dict((key, value) for key, value in host.items() if key != "name")
+            address = host["kentik_snmp_ip"] or (host["kentik_sending_ips"] or [None])[0]
+            if address:
+                host_vars["ansible_host"] = address
+            for key, value in host_vars.items():
+                self.inventory.set_variable(name, key, value)
+
+            memberships = []
+            if "site" in group_by and host["kentik_site"]:
+                memberships.append(("site", host["kentik_site"]))
+            if "plan" in group_by and host["kentik_plan"]:
+                memberships.append(("plan", host["kentik_plan"]))
+            if "subtype" in group_by and host["kentik_subtype"]:
+                memberships.append(("subtype", host["kentik_subtype"]))
+            if "label" in group_by:
+                for label in host["kentik_labels"]:
+                    if label:
+                        memberships.append(("label", label))
+            for kind, value in memberships:
+                group = self.inventory.add_group(to_safe_group_name(f"{GROUP_PREFIXES[kind]}_{value}"))
+                self.inventory.add_child(group, name)
+
+            self._set_composite_vars(self.get_option("compose"), host_vars, name, strict=strict)
+            self._add_host_to_composed_groups(self.get_option("groups"), host_vars, name, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option("keyed_groups"), host_vars, name, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option("cache")
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        hosts = None
+        if attempt_to_read_cache:
+            try:
+                hosts = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+        if hosts is None:
+            hosts = self._fetch_hosts()
+        if cache_needs_update:
+            self._cache[cache_key] = hosts
+
+        self._populate(hosts)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: kentik_lookup
+short_description: Resolve Kentik plan, site, label and device names to IDs
+version_added: "1.2.0"
+description:
+- Resolves the names of Kentik plans, sites, labels or devices to their IDs on the controller.
+- Each object type is listed with a single API call and the resulting name to ID map is memoized for the rest of the
+  play, both in the worker process and in the reference-data cache shared with the modules, so templating across
+  thousands of items never downloads or rebuilds the map again.
+- When no names are given the whole name to ID dictionary is returned, so it can be indexed directly.
+options:
+    _terms:
+        description: The names to resolve.
+        type: list
+        elements: str
+        required: false
+    type:
+        description: The kind of object the names refer to.
+        type: str
+        default: device
+        choices: [ device, label, plan, site ]
+    on_missing:
+        description: What to do when a name does not exist in Kentik.
+        type: str
+        default: error
+        choices: [ error, skip, warn ]
+    email:
+        description: The Kentik API Email used to authenticate.
+        type: str
+        required: true
+        env:
+        - name: KENTIK_EMAIL
+        vars:
+        - name: kentik_user
+    token:
+        description: The Kentik API Token used to authenticate.
+        type: str
+        required: true
+        env:
+        - name: KENTIK_TOKEN
+        vars:
+        - name: kentik_token
+    region:
+        description: The region that your Kentik portal is located in.
+        type: str
+        default: US
+        choices: [ US, EU ]
+        env:
+        - name: KENTIK_REGION
+    validate_certs:
+        description: Whether the TLS certificate of the Kentik API is validated.
+        type: bool
+        default: true
+    ca_path:
+        description: A file or directory of PEM encoded CA certificates to validate the Kentik API certificate against.
+        type: path
+    cache_ttl:
+        description:
+        - Number of seconds the name to ID map is kept in the reference-data cache shared with the modules.
+        - Set to C(0) to only memoize within the current worker process.
+        type: int
+        default: 300
+    cache_dir:
+        description: Directory where the Kentik reference-data cache is stored.
+        type: path
+        default: ~/.ansible/tmp/kentik_cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Resolve a single device ID
+  ansible.builtin.debug:
+    msg: "{{ lookup('kentik.kentik_config.kentik_lookup', inventory_hostname) }}"
+
+- name: Resolve several label IDs at once
+  ansible.builtin.set_fact:
+    label_ids: "{{ query('kentik.kentik_config.kentik_lookup', 'core', 'edge', type='label') }}"
+
+- name: Fetch the whole device name to ID map once and index it directly
+  ansible.builtin.set_fact:
+    device_id_dict: "{{ lookup('kentik.kentik_config.kentik_lookup', type='device') }}"
+  run_once: true
+"""
+
+RETURN = r"""
+_raw:
+    description:
+    - The IDs of the requested names, in the same order.
+    - When no names are given, a single dictionary mapping every name to its ID.
+    type: list
+"""
+
+import threading
+
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_native
+from ansible.plugins.lookup import LookupBase
+from ansible.utils.display import Display
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import ReferenceCache
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikClient,
+    KentikError,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    gather_devices,
+    gather_labels,
+    gather_plans,
+    gather_sites,
+)
+
+display = Display()
+
+# The cache endpoint name and loader for each object type. The endpoint names
+# match the ones the modules use, so a map loaded here is reused by them.
+LOADERS = {
+    "device": ("devices", gather_devices),
+    "label": ("labels", gather_labels),
+    "plan": ("plans", gather_plans),
+    "site": ("sites", gather_sites),
+}
+
+_MEMO = {}
+_MEMO_LOCK = threading.Lock()
+
+
+class LookupModule(LookupBase):
+    """Resolve Kentik object names to IDs"""
+
+    def _mapping(self, object_type):
+        """Return the memoized name to ID map for an object type, loading it on first use"""
+        region = self.get_option("region")
+        email = self.get_option("email")
+        key = (region, email, object_type)
+        with _MEMO_LOCK:
+            if key not in _MEMO:
+                client = KentikClient(
+                    email,
+                    self.get_option("token"),
+                    region,
+                    validate_certs=self.get_option("validate_certs"),
+                    ca_path=self.get_option("ca_path"),
+                )
+                cache = ReferenceCache(region, email, ttl=self.get_option("cache_ttl"),
+                                       cache_dir=self.get_option("cache_dir"))
+                endpoint, loader = LOADERS[object_type]
+                try:
+                    _MEMO[key] = cache.get(endpoint, lambda: loader(client))
+                except KentikError as exc:
+                    raise AnsibleError(f"Unable to list Kentik {endpoint}: {to_native(exc)}")
+            return _MEMO[key]
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        object_type = self.get_option("type")
+        mapping = self._mapping(object_type)
+        if not terms:
+            return [mapping]
+        on_missing = self.get_option("on_missing")
+        ret = []
+        for term in terms:
+            if term in mapping:
+                ret.append(mapping[term])
+            elif on_missing == "error":
+                raise AnsibleError(f"Kentik {object_type} {term} does not exist")
+            elif on_missing == "warn":
+                display.warning(f"Kentik {object_type} {term} does not exist, skipping")
+        return ret
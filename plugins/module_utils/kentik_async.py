@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Concurrent reads of many Kentik API objects on an asyncio event loop.
+
+The bulk modules list a kind of object once and then fetch the detail record
+of the objects they compare field by field. Those fetches are pure I/O, so
+they overlap on one event loop, at most max_in_flight at a time, with the
+same retries, backoff and rate limiting as KentikClient.request. aiohttp is
+used when it is installed; otherwise every fetch runs on the client's
+pooled keep-alive connections in a thread the event loop waits on.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import functools
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib.parse import quote
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import DEFAULT_MAX_IN_FLIGHT
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KENTIK_HOSTS,
+    RETRY_STATUS_CODES,
+    KentikApiError,
+    KentikError,
+    body_error_message,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_http import ssl_context
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_ratelimit import (
+    backoff_delay,
+    retry_after_delay,
+)
+
+
+async def _get(client, session, path, api):
+    """GET path through aiohttp, retrying like KentikClient.request, and return the decoded JSON body"""
+    loop = asyncio.get_event_loop()
+    url = f"{KENTIK_HOSTS[client.region][api]}{path}"
+    timeout = aiohttp.ClientTimeout(total=client.timeout)
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        if client.limiter is not None:
+            # The bucket is shared with other processes through a lock file, so wait for it off the loop.
+            await loop.run_in_executor(None, client.limiter.acquire)
+        try:
+            async with session.get(url, headers=client.headers, timeout=timeout) as response:
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            message = to_text(exc) or f"Timed out after {client.timeout}s"
+            if attempt >= client.max_retries:
+                client._record("GET", path, None, started, {"retries": attempt})
+                raise KentikApiError(message, method="GET", url=url)
+            delay = backoff_delay(attempt)
+            logging.warning("GET %s failed (%s), retrying in %.1fs", url, message, delay)
+        else:
+            if status not in RETRY_STATUS_CODES or attempt >= client.max_retries:
+                break
+            delay = retry_after_delay(retry_after)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logging.warning("GET %s returned %s, retrying in %.1fs", url, status, delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+    client._record("GET", path, status, started, {"retries": attempt}, len(body))
+    text = body.decode("utf-8", errors="replace")
+    if status != 200:
+        raise KentikApiError(body_error_message(text), status_code=status, method="GET", url=url)
+    if not body:
+        return {}
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise KentikApiError(f"Invalid JSON in response: {text}", status_code=status, method="GET", url=url)
+
+
+async def _fetch_all(client, paths, api, max_in_flight):
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def guarded(fetch, path):
+        async with semaphore:
+            try:
+                return await fetch(path)
+            except KentikError as exc:
+                return exc
+
+    if HAS_AIOHTTP:
+        connector = aiohttp.TCPConnector(limit=max_in_flight, ssl=ssl_context(client.validate_certs, client.ca_path))
+        # trust_env makes aiohttp honor the same proxy variables as kentik_http.
+        async with aiohttp.ClientSession(connector=connector, trust_env=True) as session:
+            fetch = functools.partial(_get, client, session, api=api)
+            return await asyncio.gather(*(guarded(fetch, path) for path in paths))
+
+    loop = asyncio.get_event_loop()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        def fetch(path):
+            return loop.run_in_executor(executor, functools.partial(client.get, path, api=api))
+        return await asyncio.gather(*(guarded(fetch, path) for path in paths))
+
+
+def fetch_all(client, paths, api="grpc", max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """GET every path with at most max_in_flight requests in flight and return the decoded bodies in order.
+
+    A fetch that still fails after its retries is returned as its KentikError
+    instead of being raised, so one bad object does not abort the others.
+    """
+    if not paths:
+        return []
+    max_in_flight = max(1, min(max_in_flight, len(paths)))
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_fetch_all(client, paths, api, max_in_flight))
+    finally:
+        loop.close()
+
+
+def fetch_details(client, records, path, key, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Fetch the detail record of every listed record concurrently and return them in the same order.
+
+    path is formatted with the id of each record and key names the object in
+    the response. The first fetch that failed is raised.
+    """
+    paths = [path.format(id=quote(str(record["id"]), safe="")) for record in records]
+    bodies = fetch_all(client, paths, max_in_flight=max_in_flight)
+    for body in bodies:
+        if isinstance(body, KentikError):
+            raise body
+    logging.info("Fetched %d detail records from %s", len(bodies), path)
+    return [body[key] for body in bodies]
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Client for the v5 batch API used to load flow tags and custom dimension populators.
+
+Large sets are split into parts small enough for the API and submitted
+concurrently. A replace_all load is sent as the parts of one multi-part
+batch, so the tenant is only replaced once every part has arrived; any
+other load is sent as independent batches. Every batch is then polled with
+a growing delay until the API reports it complete.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    DEFAULT_MAX_WORKERS,
+    run_concurrently,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+
+BATCH_TARGETS = ("populators", "tags")
+# The API accepts up to 16,000 entries or a few MB per part; stay well below both.
+DEFAULT_CHUNK_SIZE = 10000
+MAX_CHUNK_BYTES = 2 * 1024 * 1024
+DEFAULT_WAIT_TIMEOUT = 1800
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 30.0
+POLL_BACKOFF = 1.5
+
+
+def batch_argument_spec():
+    """Return the argument spec options shared by the modules that load data through the batch API"""
+    return dict(
+        chunk_size=dict(type="int", required=False, default=DEFAULT_CHUNK_SIZE),
+        wait=dict(type="bool", required=False, default=True),
+        wait_timeout=dict(type="int", required=False, default=DEFAULT_WAIT_TIMEOUT),
+    )
+
+
+def batch_path(target, dimension=None):
+    """Return the batch API path for flow tags or for the populators of a custom dimension"""
+    if target == "tags":
+        return "/api/v5/batch/tags"
+    if not dimension:
+        raise KentikError("A custom dimension name is required to load populators.")
+    return f"/api/v5/batch/customdimensions/{quote(dimension, safe='')}/populators"
+
+
+def iter_chunks(upserts=(), deletes=(), chunk_size=DEFAULT_CHUNK_SIZE, max_bytes=MAX_CHUNK_BYTES):
+    """Split upserts and deletes, which may be any iterables, into parts of at most chunk_size entries and max_bytes.
+
+    Entries are consumed lazily, so only one part is held in memory at a time.
+    """
+    chunk = {"upserts": [], "deletes": []}
+    count = 0
+    size = 0
+    for key, items in (("upserts", upserts), ("deletes", deletes)):
+        for item in items or ():
+            item_size = len(json.dumps(item)) + 1
+            if count and (count >= chunk_size or size + item_size > max_bytes):
+                yield chunk
+                chunk = {"upserts": [], "deletes": []}
+                count = 0
+                size = 0
+            chunk[key].append(item)
+            count += 1
+            size += item_size
+    if count:
+        yield chunk
+
+
+def submit_part(client, path, chunk, replace_all=False, complete=True, guid=None):
+    """Submit one part of a batch and return the batch guid"""
+    payload = {"replace_all": replace_all, "complete": complete}
+    if guid:
+        payload["guid"] = guid
+    for key in ("upserts", "deletes"):
+        if chunk.get(key):
+            payload[key] = chunk[key]
+    logging.info(
+        "Submitting batch part with %d upserts and %d deletes",
+        len(chunk.get("upserts") or []),
+        len(chunk.get("deletes") or []),
+    )
+    response = client.post(path, payload, api="v5")
+    if not response.get("guid"):
+        raise KentikError(f"The batch API did not return a guid: {response.get('message', response)}")
+    return response["guid"]
+
+
+def _part_summary(guid, chunk):
+    return {"guid": guid, "upserts": len(chunk.get("upserts") or []), "deletes": len(chunk.get("deletes") or [])}
+
+
+def _bounded_map(func, items, max_workers):
+    """Call func on every item with at most max_workers calls in flight, consuming items lazily.
+
+    Returns the results in the order of items. An exception raised by func
+    is re-raised once the calls in flight have finished.
+    """
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = set()
+        for item in items:
+            if len(pending) >= max_workers:
+                _done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            future = executor.submit(func, item)
+            futures.append(future)
+            pending.add(future)
+    return [future.result() for future in futures]
+
+
+def _with_last(chunks):
+    """Yield (chunk, is_last) for every chunk, looking one chunk ahead"""
+    iterator = iter(chunks)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for chunk in iterator:
+        yield previous, False
+        previous = chunk
+    yield previous, True
+
+
+def submit_chunks(client, path, chunks, replace_all=False, max_workers=DEFAULT_MAX_WORKERS):
+    """Submit every chunk and return a list with one entry per batch, each holding its guid and parts"""
+    if not replace_all:
+        parts = _bounded_map(
+            lambda chunk: _part_summary(submit_part(client, path, chunk), chunk), chunks, max_workers
+        )
+        return [dict(part, parts=1) for part in parts]
+
+    # Every part of a replace_all load belongs to one batch: the first part
+    # opens it, the others join it by guid and the last part closes it.
+    batch = None
+    last = None
+    middle = []
+    for chunk, is_last in _with_last(chunks):
+        if batch is None:
+            guid = submit_part(client, path, chunk, replace_all=True, complete=is_last)
+            batch = dict(_part_summary(guid, chunk), parts=1)
+        elif is_last:
+            last = chunk
+        else:
+            middle.append(chunk)
+            if len(middle) >= max_workers:
+                _submit_joined(client, path, middle, batch, max_workers)
+                middle = []
+    if batch is None:
+        # Replacing everything with nothing still needs one, empty, part.
+        guid = submit_part(client, path, {}, replace_all=True, complete=True)
+        return [dict(_part_summary(guid, {}), parts=1)]
+    _submit_joined(client, path, middle, batch, max_workers)
+    if last is not None:
+        submit_part(client, path, last, replace_all=True, complete=True, guid=batch["guid"])
+        _count_part(batch, last)
+    return [batch]
+
+
+def _count_part(batch, chunk):
+    batch["parts"] += 1
+    batch["upserts"] += len(chunk.get("upserts") or [])
+    batch["deletes"] += len(chunk.get("deletes") or [])
+
+
+def _submit_joined(client, path, chunks, batch, max_workers):
+    """Submit parts that join an open multi-part batch, concurrently"""
+    _bounded_map(
+        lambda chunk: submit_part(client, path, chunk, replace_all=True, complete=False, guid=batch["guid"]),
+        chunks,
+        max_workers,
+    )
+    for chunk in chunks:
+        _count_part(batch, chunk)
+
+
+def batch_status(client, guid):
+    """Return the status of a batch"""
+    return client.get(f"/api/v5/batch/{quote(guid, safe='')}/status", api="v5")
+
+
+def wait_for_batches(client, batches, timeout=DEFAULT_WAIT_TIMEOUT, max_workers=DEFAULT_MAX_WORKERS,
+                     initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY):
+    """Poll every batch until the API reports it complete or timeout seconds pass.
+
+    All outstanding batches are polled together, concurrently, and the delay
+    between rounds grows from initial_delay up to max_delay. The status of
+    each batch is stored in it and the batches that did not complete in time
+    are marked timed_out.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    pending = [batch for batch in batches if batch.get("guid")]
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            for batch in pending:
+                batch["timed_out"] = True
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * POLL_BACKOFF, max_delay)
+        statuses = run_concurrently(lambda batch: batch_status(client, batch["guid"]), pending, max_workers)
+        still_pending = []
+        for batch, status in zip(pending, statuses):
+            if status.get("failed"):
+                batch.update(failed=True, msg=status["msg"])
+                continue
+            batch["status"] = status
+            if not status.get("is_complete"):
+                still_pending.append(batch)
+        logging.info("%d of %d batches still running", len(still_pending), len(batches))
+        pending = still_pending
+    return batches
+
+
+def summarize_batches(batches):
+    """Add up the counts the API reported for a list of batches"""
+    summary = {
+        "batches": len(batches),
+        "parts": 0,
+        "upserts": 0,
+        "deletes": 0,
+        "upserts_applied": 0,
+        "upserts_invalid": 0,
+        "deletes_applied": 0,
+        "deletes_unapplied": 0,
+        "incomplete": 0,
+        "failed": 0,
+    }
+    for batch in batches:
+        summary["parts"] += batch.get("parts", 0)
+        summary["upserts"] += batch.get("upserts", 0)
+        summary["deletes"] += batch.get("deletes", 0)
+        status = batch.get("status") or {}
+        summary["upserts_applied"] += (status.get("upsert") or {}).get("applied", 0)
+        summary["upserts_invalid"] += (status.get("upsert") or {}).get("invalid", 0)
+        summary["deletes_applied"] += (status.get("delete") or {}).get("applied", 0)
+        summary["deletes_unapplied"] += (status.get("delete") or {}).get("unapplied", 0)
+        if batch.get("failed"):
+            summary["failed"] += 1
+        elif batch.get("timed_out"):
+            summary["incomplete"] += 1
+    return summary
+
+
+def run_batches(client, path, chunks, replace_all=False, max_workers=DEFAULT_MAX_WORKERS,
+                wait_for_completion=True, timeout=DEFAULT_WAIT_TIMEOUT):
+    """Submit chunks to a batch endpoint, wait for them when asked to and return the batches and their summary"""
+    batches = submit_chunks(client, path, chunks, replace_all, max_workers)
+    if wait_for_completion:
+        wait_for_batches(client, batches, timeout, max_workers)
+    return batches, summarize_batches(batches)
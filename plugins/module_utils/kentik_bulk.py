@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Helpers for applying a set of changes to Kentik with bounded concurrency."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_IN_FLIGHT = 32
+
+
+def bulk_argument_spec():
+    """Return the argument spec options shared by the bulk modules"""
+    return dict(
+        max_workers=dict(type="int", required=False, default=DEFAULT_MAX_WORKERS),
+    )
+
+
+def fetch_argument_spec():
+    """Return the argument spec options of the bulk modules that fetch detail records"""
+    return dict(
+        max_in_flight=dict(type="int", required=False, default=DEFAULT_MAX_IN_FLIGHT),
+    )
+
+
+def run_concurrently(worker, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Call worker on every item with at most max_workers calls in flight.
+
+    worker must return a result dictionary. A KentikError raised by worker is
+    caught and recorded in that item's result as failed, so one bad item does
+    not abort the others. Results are returned in the same order as items.
+    """
+    def guarded(item):
+        try:
+            return worker(item)
+        except KentikError as exc:
+            return {"failed": True, "msg": to_text(exc), "status_code": getattr(exc, "status_code", None)}
+
+    if not items:
+        return []
+    # Imported here so that modules which only apply a single change start faster.
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(guarded, items))
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Cross-process, TTL-bounded cache for Kentik reference data such as plans, sites and labels."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_DIR = "~/.ansible/tmp/kentik_cache"
+
+
+def kentik_cache_argument_spec():
+    """Return the argument spec options for modules that use the reference-data cache"""
+    return dict(
+        cache_ttl=dict(type="int", required=False, default=DEFAULT_CACHE_TTL),
+        cache_dir=dict(type="path", required=False, default=DEFAULT_CACHE_DIR),
+    )
+
+
+class ReferenceCache(object):
+    """On-disk cache of API lookups keyed by region, account email and endpoint.
+
+    Entries are JSON files written atomically. A per-entry lock file makes a
+    miss single-flight: the first process to take the lock runs the loader and
+    every other process waiting on the lock reads the freshly written entry.
+    """
+
+    def __init__(self, region, email, ttl=DEFAULT_CACHE_TTL, cache_dir=DEFAULT_CACHE_DIR):
+        self.region = region
+        self.email = email
+        self.ttl = ttl
+        self.cache_dir = os.path.expanduser(cache_dir or DEFAULT_CACHE_DIR)
+        # Entries already parsed by this process, keyed by path and tagged with
+        # the file identity they were read from.
+        self._memory = {}
+
+    @classmethod
+    def from_module(cls, module, target=None):
+        """Build a cache from the standard module parameters, or for one of its targets"""
+        account = target or module.params
+        return cls(
+            account["region"],
+            account["email"],
+            ttl=module.params["cache_ttl"],
+            cache_dir=module.params["cache_dir"],
+        )
+
+    @property
+    def enabled(self):
+        """Whether entries are cached at all"""
+        return self.ttl is not None and self.ttl > 0
+
+    def _path(self, endpoint):
+        key = hashlib.sha256(f"{self.region}|{self.email}|{endpoint}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, path):
+        """Return the cached data at path if it exists and has not expired"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        memo = self._memory.get(path)
+        if memo is not None and memo[0] == identity:
+            entry = memo[1]
+        else:
+            try:
+                with open(path, "r") as cache_file:
+                    entry = json.load(cache_file)
+            except (IOError, OSError, ValueError):
+                return None
+            self._memory[path] = (identity, entry)
+        if time.time() - entry.get("timestamp", 0) > self.ttl:
+            return None
+        return entry
+
+    def _write(self, path, data):
+        """Atomically replace the cache entry at path"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                json.dump({"timestamp": time.time(), "data": data}, tmp_file)
+            os.replace(tmp_path, path)
+        except (IOError, OSError):
+            logging.warning("Unable to write Kentik cache entry %s", path)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def get(self, endpoint, loader):
+        """Return the cached value for endpoint, calling loader on a miss"""
+        if not self.enabled:
+            return loader()
+        path = self._path(endpoint)
+        entry = self._read(path)
+        if entry is not None:
+            logging.info("Using cached %s", endpoint)
+            return entry["data"]
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entry = self._read(path)
+                if entry is not None:
+                    logging.info("Using %s cached by another process", endpoint)
+                    return entry["data"]
+                data = loader()
+                self._write(path, data)
+                return data
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load_state(self, name):
+        """Return the state last saved under name, or None.
+
+        State lives next to the cached entries but, unlike them, never
+        expires and is kept even when caching is disabled.
+        """
+        try:
+            with open(self._path(name), "r") as state_file:
+                return json.load(state_file)["data"]
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def update_state(self, name, updater):
+        """Save updater(state) as the state under name, holding the entry lock so concurrent updates are not lost"""
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        path = self._path(name)
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = updater(self.load_state(name))
+                self._write(path, data)
+                return data
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def invalidate(self, *endpoints):
+        """Drop the cached entries for the given endpoints.
+
+        The entry lock is taken first so a fetch that is already in flight
+        finishes writing before the entry is removed, rather than after.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for endpoint in endpoints:
+            path = self._path(endpoint)
+            with open(f"{path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._memory.pop(path, None)
+                try:
+                    os.unlink(path)
+                    logging.info("Invalidated cached %s", endpoint)
+                except OSError:
+                    pass
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Shared Kentik API client used by the kentik_config modules and plugins."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+import json
+import logging
+import time
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils import kentik_http
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_ratelimit import (
+    TokenBucket,
+    backoff_delay,
+    retry_after_delay,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stats import module_api_stats
+
+KENTIK_HOSTS = {
+    "US": {
+        "grpc": "https://grpc.api.kentik.com",
+        "v5": "https://api.kentik.com",
+    },
+    "EU": {
+        "grpc": "https://grpc.api.kentik.eu",
+        "v5": "https://api.kentik.eu",
+    },
+}
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 5
+# Statuses worth retrying: rate limited, or a transient failure in front of the API.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# POST is not idempotent, so it is only retried when the API says it was not processed.
+RETRY_POST_STATUS_CODES = (429,)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def kentik_argument_spec():
+    """Return the argument spec options shared by every Kentik module"""
+    return dict(
+        email=dict(type="str", required=True),
+        token=dict(type="str", no_log=True, required=True),
+        region=dict(type="str", required=False, default="US", choices=["US", "EU"]),
+        max_retries=dict(type="int", required=False, default=DEFAULT_MAX_RETRIES),
+        rate_limit=dict(type="float", required=False, default=0),
+        api_stats=dict(type="bool", required=False, default=False),
+        validate_certs=dict(type="bool", required=False, default=True),
+        ca_path=dict(type="path", required=False),
+    )
+
+
+class KentikError(Exception):
+    """Base class for errors raised by the Kentik module utilities"""
+
+
+class KentikApiError(KentikError):
+    """Raised when a Kentik API call fails or returns an unexpected status"""
+
+    def __init__(self, msg, status_code=None, method=None, url=None):
+        super(KentikApiError, self).__init__(msg)
+        self.status_code = status_code
+        self.method = method
+        self.url = url
+
+
+def error_message(response):
+    """Pull the most useful error message out of a Kentik API response"""
+    return body_error_message(response.text)
+
+
+def body_error_message(text):
+    """Pull the most useful error message out of the text of a Kentik API error response"""
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(body, dict):
+        for key in ("message", "error", "msg"):
+            if body.get(key):
+                return to_text(body[key])
+    return text
+
+
+class KentikClient(object):
+    """Thin client for the Kentik APIs over pooled keep-alive connections"""
+
+    def __init__(self, email, token, region="US", timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, rate_limit=0, stats=None, validate_certs=True, ca_path=None):
+        self.email = email
+        self.region = region
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.validate_certs = validate_certs
+        self.ca_path = ca_path
+        self.headers = {
+            "X-CH-Auth-Email": email,
+            "X-CH-Auth-API-Token": token,
+            "Content-Type": "application/json",
+        }
+        self.limiter = None
+        if rate_limit and rate_limit > 0:
+            self.limiter = TokenBucket(f"{region}|{email}", rate_limit)
+        self.stats = stats
+
+    @classmethod
+    def from_module(cls, module, target=None):
+        """Build a client from the standard module parameters, or for one of its targets"""
+        account = target or module.params
+        return cls(
+            account["email"],
+            account["token"],
+            account["region"],
+            max_retries=module.params["max_retries"],
+            rate_limit=module.params["rate_limit"],
+            stats=module_api_stats(module),
+            validate_certs=module.params["validate_certs"],
+            ca_path=module.params["ca_path"],
+        )
+
+    def with_stats(self, stats):
+        """Return a client that shares this one's settings and rate limiter but records its calls in stats"""
+        client = copy.copy(self)
+        client.stats = stats
+        return client
+
+    def _record(self, method, path, status, started, call, bytes_received=0):
+        """Add a finished call to the stats, when they are being collected"""
+        if self.stats is not None:
+            self.stats.record(
+                method,
+                path,
+                status,
+                time.monotonic() - started,
+                retries=call.get("retries", 0),
+                bytes_sent=call.get("bytes_sent", 0),
+                bytes_received=bytes_received,
+            )
+
+    def url(self, path, api="grpc"):
+        """Build the full URL for a path on the grpc or v5 API host"""
+        return f"{KENTIK_HOSTS[self.region][api]}{path}"
+
+    def _send(self, method, url, data, timeout, stream=False):
+        """Send a single request, waiting for the rate limiter first"""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        logging.debug("%s %s", method, url)
+        return kentik_http.request(
+            method, url, headers=self.headers, data=data, timeout=timeout, stream=stream, pool_key=self.email,
+            validate_certs=self.validate_certs, ca_path=self.ca_path,
+        )
+
+    def _perform(self, method, path, api, payload, timeout, stream=False, call=None):
+        """Send a request, retrying rate limited and transient failures, and return the successful response.
+
+        The number of retries and the bytes sent are stored in call when a dictionary is given.
+        """
+        call = {} if call is None else call
+        url = f"{KENTIK_HOSTS[self.region][api]}{path}"
+        data = None
+        if payload is not None:
+            data = json.dumps(payload)
+        retry_codes = RETRY_POST_STATUS_CODES if method == "POST" else RETRY_STATUS_CODES
+        attempt = 0
+        while True:
+            call.update(retries=attempt, bytes_sent=len(data or "") * (attempt + 1))
+            try:
+                response = self._send(method, url, data, timeout or self.timeout, stream=stream)
+            except kentik_http.TransportError as exc:
+                # A POST may have reached the API before the connection failed, so only
+                # retry it when the connection was never established.
+                retryable = method != "POST" or not exc.connected
+                if not retryable or attempt >= self.max_retries:
+                    raise KentikApiError(to_text(exc), method=method, url=url)
+                delay = backoff_delay(attempt)
+                logging.warning("%s %s failed (%s), retrying in %.1fs", method, url, to_text(exc), delay)
+            else:
+                if response.status_code not in retry_codes or attempt >= self.max_retries:
+                    break
+                delay = retry_after_delay(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                logging.warning("%s %s returned %s, retrying in %.1fs", method, url, response.status_code, delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+        if response.status_code != 200:
+            raise KentikApiError(
+                error_message(response),
+                status_code=response.status_code,
+                method=method,
+                url=url,
+            )
+        return response
+
+    def request(self, method, path, api="grpc", payload=None, timeout=None):
+        """Send a request, retrying rate limited and transient failures, and return the decoded JSON body"""
+        started = time.monotonic()
+        call = {}
+        try:
+            response = self._perform(method, path, api, payload, timeout, call=call)
+        except KentikApiError as exc:
+            self._record(method, path, exc.status_code, started, call)
+            raise
+        body = response.read()
+        self._record(method, path, response.status_code, started, call, len(body))
+        if not body:
+            return {}
+        try:
+            return response.json()
+        except ValueError:
+            raise KentikApiError(
+                f"Invalid JSON in response: {response.text}",
+                status_code=response.status_code,
+                method=method,
+                url=response.url,
+            )
+
+    def stream(self, method, path, api="grpc", payload=None, timeout=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Send a request and yield the raw response body in chunks instead of loading it into memory"""
+        started = time.monotonic()
+        call = {}
+        try:
+            response = self._perform(method, path, api, payload, timeout, stream=True, call=call)
+        except KentikApiError as exc:
+            self._record(method, path, exc.status_code, started, call)
+            raise
+        received = 0
+        status = response.status_code
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                yield chunk
+        except kentik_http.TransportError as exc:
+            status = None
+            raise KentikApiError(to_text(exc), method=method, url=response.url)
+        finally:
+            response.close()
+            self._record(method, path, status, started, call, received)
+
+    def get(self, path, api="grpc", **kwargs):
+        """Send a GET request"""
+        return self.request("GET", path, api=api, **kwargs)
+
+    def post(self, path, payload, api="grpc", **kwargs):
+        """Send a POST request"""
+        return self.request("POST", path, api=api, payload=payload, **kwargs)
+
+    def put(self, path, payload, api="grpc", **kwargs):
+        """Send a PUT request"""
+        return self.request("PUT", path, api=api, payload=payload, **kwargs)
+
+    def delete(self, path, api="grpc", **kwargs):
+        """Send a DELETE request"""
+        return self.request("DELETE", path, api=api, **kwargs)
@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Device payload building, comparison and API helpers shared by the device modules."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+import logging
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_WORKERS,
+    run_concurrently,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikApiError,
+    KentikError,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import (
+    changed_fields,
+    merge_update,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_label_utils import (  # noqa: F401
+    LABEL_API_VERSION,
+    gather_labels,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (  # noqa: F401
+    SITE_API_VERSION,
+    gather_sites,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import (
+    iter_items,
+    matches_any,
+)
+
+DEVICE_API_VERSION = "v202308beta1"
+
+DEVICE_SUBTYPES = [
+    "router",
+    "host-nprobe-dns-www",
+    "aws-subnet",
+    "azure_subnet",
+    "cisco_asa",
+    "gcp-subnet",
+    "istio_beta",
+    "open_nms",
+    "paloalto",
+    "silverpeak",
+]
+
+# Module options that describe how to manage the device rather than the device itself.
+NON_DEVICE_KEYS = ("siteName", "planName", "labels", "updateSnmpAuth", "state")
+SNMP_V3_SECRETS = ("authenticationPassphrase", "privacyPassphrase")
+# Device fields that are not compared field by field: the site and plan are
+# returned as nested objects and the secrets are never returned.
+DEVICE_DIFF_IGNORED = ("siteId", "planId", "deviceSnmpCommunity", "deviceBgpPassword", "id") + tuple(
+    f"deviceSnmpV3Conf.{key}" for key in SNMP_V3_SECRETS
+)
+# Fields of a returned device that the update endpoint takes in another form.
+DEVICE_RECORD_ONLY = ("site", "plan", "labels")
+LABEL_ACTIONS = ("replace", "add", "remove")
+# Nested settings compared against the detail record of a device rather than its list record.
+DEVICE_DETAIL_FIELDS = ("nms", "deviceSnmpV3Conf")
+
+
+def device_argument_spec():
+    """Return the argument spec options describing a single device"""
+    return dict(
+        deviceName=dict(type="str", required=True),
+        deviceDescription=dict(type="str", required=False, default="Added by Ansible"),
+        deviceSubtype=dict(
+            type="str",
+            required=False,
+            default="router",
+            choices=DEVICE_SUBTYPES,
+        ),
+        cdnAttr=dict(type="str", required=False, choices=["none", "y", "n"]),
+        deviceSampleRate=dict(type="int", required=False, default=1),
+        planName=dict(type="str", required=True),
+        siteName=dict(type="str", required=False),
+        sendingIps=dict(type="list", required=False, elements="str"),
+        minimizeSnmp=dict(type="bool", required=False),
+        deviceSnmpIp=dict(type="str", required=False),
+        deviceSnmpCommunity=dict(type="str", required=False),
+        updateSnmpAuth=dict(type="bool", required=False, default=False),
+        deviceSnmpV3Conf=dict(type="dict", required=False),
+        deviceBgpType=dict(
+            type="str",
+            required=False,
+            choices=["none", "device", "other_device"],
+            default="none",
+        ),
+        deviceBgpNeighborIp=dict(type="str", required=False),
+        deviceBgpNeighborIp6=dict(type="str", required=False),
+        deviceBgpNeighborAsn=dict(type="str", required=False),
+        deviceBgpPassword=dict(type="str", required=False, no_log=True),
+        useBgpDeviceId=dict(type="int", required=False),
+        deviceBgpFlowspec=dict(type="bool", required=False),
+        nms=dict(type="dict", required=False),
+        labels=dict(type="list", required=False, elements="str"),
+        state=dict(type="str", default="present", choices=["present", "absent"]),
+    )
+
+
+def device_module_argument_spec():
+    """Return the full argument spec of the kentik_device module"""
+    argument_spec = device_argument_spec()
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(
+        use_device_index=dict(type="bool", required=False, default=False),
+    )
+    return argument_spec
+
+
+def list_plans(client):
+    """Return the full list of plans in the tenant"""
+    plan_data = client.get("/api/v5/plans", api="v5")
+    return plan_data["plans"]
+
+
+def gather_plans(client):
+    """Return a name to id dictionary of the plans in the tenant"""
+    plan_dict = {}
+    for plan in list_plans(client):
+        plan_dict[plan["name"]] = plan["id"]
+    return plan_dict
+
+
+def iter_devices(client, fields=None):
+    """Stream the devices in the tenant one at a time, reduced to fields when given"""
+    return iter_items(client, f"/device/{DEVICE_API_VERSION}/device", "devices", fields=fields)
+
+
+def list_devices(client, fields=None):
+    """Return the list of devices in the tenant, reduced to fields when given"""
+    return list(iter_devices(client, fields))
+
+
+def device_matches(device, names=None, sites=None, labels=None, subtypes=None):
+    """Check whether a device returned by the API passes every filter that is given.
+
+    names are shell-style patterns. A device passes the sites, labels and
+    subtypes filters when its site, one of its labels or its subtype is listed.
+    """
+    if not matches_any(device.get("deviceName"), names):
+        return False
+    if sites and (device.get("site") or {}).get("siteName") not in sites:
+        return False
+    if labels and not set(label.get("name") for label in device.get("labels") or []) & set(labels):
+        return False
+    if subtypes and device.get("deviceSubtype") not in subtypes:
+        return False
+    return True
+
+
+def gather_devices(client):
+    """Return a name to id dictionary of the devices in the tenant"""
+    device_dict = {}
+    for device in iter_devices(client, fields=("id", "deviceName")):
+        device_dict[device["deviceName"]] = device["id"]
+    return device_dict
+
+
+def find_device_id(client, device_name):
+    """Look a device up by name and return its id, or None if it does not exist"""
+    try:
+        device_info = client.get(f"/api/v5/device/{device_name}", api="v5")
+    except KentikApiError as exc:
+        if exc.status_code == 404:
+            return None
+        raise
+    return device_info["device"]["id"]
+
+
+def get_device(client, device_id):
+    """Return the device with device_id, or None if it does not exist"""
+    try:
+        device_data = client.get(f"/device/{DEVICE_API_VERSION}/device/{device_id}")
+    except KentikApiError as exc:
+        if exc.status_code == 404:
+            return None
+        raise
+    return device_data["device"]
+
+
+def needs_device_detail(params):
+    """Check whether the desired state of a device sets a nested setting that is compared against its detail record"""
+    return params.get("state") != "absent" and any(params.get(field) is not None for field in DEVICE_DETAIL_FIELDS)
+
+
+def get_device_details(client, devices, names, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Return devices with the listed record of every device called one of names replaced by its detail record.
+
+    The detail records are fetched concurrently.
+    """
+    from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_async import fetch_details
+
+    wanted = [device for device in devices if device["deviceName"] in names]
+    details = fetch_details(client, wanted, f"/device/{DEVICE_API_VERSION}/device/{{id}}", "device", max_in_flight)
+    detail_by_id = dict((device["id"], detail) for device, detail in zip(wanted, details))
+    return [detail_by_id.get(device["id"], device) for device in devices]
+
+
+def fetch_device(client, cache, device_name, use_index=False):
+    """Fetch a device by name, through the cached device index when use_index is set, or return None"""
+    device_id = None
+    if use_index:
+        device_id = cache.get("devices", lambda: gather_devices(client)).get(device_name)
+    if device_id is None:
+        device_id = find_device_id(client, device_name)
+    if device_id is None:
+        logging.info("Device, %s does not exists", device_name)
+        return None
+    device = get_device(client, device_id)
+    if use_index and (device is None or device["deviceName"] != device_name):
+        logging.info("Device index is stale, looking %s up by name", device_name)
+        cache.invalidate("devices")
+        device_id = find_device_id(client, device_name)
+        device = get_device(client, device_id) if device_id is not None else None
+    return device
+
+
+def resolve_labels(label_names, label_dict):
+    """Translate a list of label names into a sorted list of label ids"""
+    label_ids = []
+    for label in label_names or []:
+        if label == "":
+            continue
+        if label not in label_dict:
+            raise KentikError(f"Label {label} does not exist.")
+        label_ids.append(label_dict[label])
+    label_ids.sort()
+    return label_ids
+
+
+def build_device_payload(params, site_dict, plan_dict):
+    """Build the device object sent to the API from a set of device options"""
+    payload = {}
+    for key, value in params.items():
+        if key in NON_DEVICE_KEYS or value is None:
+            continue
+        payload[key] = copy.deepcopy(value)
+    site = params.get("siteName")
+    if site not in site_dict:
+        raise KentikError(f"Site {site} does not exist.")
+    payload["siteId"] = int(site_dict[site])
+    plan = params["planName"]
+    if plan not in plan_dict:
+        raise KentikError(f"Plan {plan} does not exist.")
+    payload["planId"] = int(plan_dict[plan])
+    if "nms" in payload:
+        if "port" in payload["nms"].get("snmp", {}):
+            payload["nms"]["snmp"]["port"] = int(payload["nms"]["snmp"]["port"])
+    return payload
+
+
+def device_label_ids(device):
+    """Return the sorted label ids currently assigned to a device returned by the API"""
+    return sorted(label["id"] for label in device.get("labels") or [])
+
+
+def labels_differ(device, label_ids):
+    """Check whether the labels on a device differ from the desired label ids"""
+    return sorted(label_ids) != device_label_ids(device)
+
+
+def target_label_ids(current, label_ids, action="replace"):
+    """Return the sorted label ids a device ends with when action applies label_ids to its current label ids"""
+    if action == "add":
+        return sorted(set(current) | set(label_ids))
+    if action == "remove":
+        return sorted(set(current) - set(label_ids))
+    return sorted(label_ids)
+
+
+def group_label_assignments(devices, assignments, label_dict):
+    """Work out the labels every device should end with and group the devices whose labels change by that set.
+
+    Each assignment selects devices by names, sites, subtypes and has_labels,
+    like device_matches, and applies its labels with its action. Assignments
+    apply in order, so a later one sees the labels an earlier one set: its
+    has_labels is matched against the labels the device has at that point.
+    Returns a dictionary mapping a tuple of label ids to the devices that
+    should end with exactly those labels.
+    """
+    resolved = [
+        (assignment, resolve_labels(assignment["labels"], label_dict))
+        for assignment in assignments
+    ]
+    label_names = dict((label_id, name) for name, label_id in label_dict.items())
+    groups = {}
+    for device in devices:
+        current = device_label_ids(device)
+        target = current
+        names = dict(label_names)
+        names.update((label["id"], label.get("name")) for label in device.get("labels") or [])
+        for assignment, label_ids in resolved:
+            # has_labels is matched against the labels the earlier assignments left, not the original ones.
+            view = device
+            if target != current:
+                view = dict(device, labels=[{"id": label_id, "name": names.get(label_id)} for label_id in target])
+            if device_matches(
+                view, assignment.get("names"), assignment.get("sites"), assignment.get("has_labels"),
+                assignment.get("subtypes"),
+            ):
+                target = target_label_ids(target, label_ids, assignment.get("action") or "replace")
+        if target != current:
+            groups.setdefault(tuple(target), []).append(device)
+    return groups
+
+
+def assign_label_groups(client, groups, max_workers=DEFAULT_MAX_WORKERS):
+    """Give every device in each group the group's labels, concurrently, and return one result per device"""
+    items = [(device, label_ids) for label_ids, devices in groups.items() for device in devices]
+
+    def assign(item):
+        device, label_ids = item
+        update_device_labels(client, device["id"], label_ids)
+        return {"changed": True}
+
+    results = run_concurrently(assign, items, max_workers)
+    for (device, _label_ids), result in zip(items, results):
+        result.update(name=device["deviceName"], id=device["id"])
+        result.setdefault("changed", False)
+    return results
+
+
+def device_changes(device, device_object, update_snmp_auth=False):
+    """Return the names of the fields where a device returned by the API differs from device_object"""
+    changes = []
+    if int(device["site"]["id"]) != int(device_object["siteId"]):
+        logging.info("Site does not match...updating...")
+        changes.append("siteId")
+    if int(device["plan"]["id"]) != int(device_object["planId"]):
+        logging.info("Plan IDs don't match...updating")
+        changes.append("planId")
+    if update_snmp_auth:
+        changes.append("deviceSnmpCommunity")
+        if any((device_object.get("deviceSnmpV3Conf") or {}).get(key) is not None for key in SNMP_V3_SECRETS):
+            changes.append("deviceSnmpV3Conf")
+    for field in changed_fields(device, device_object, ignore=DEVICE_DIFF_IGNORED):
+        if field not in changes:
+            changes.append(field)
+    if device_object.get("deviceBgpPassword") is not None and any(field.startswith("deviceBgp") for field in changes):
+        changes.append("deviceBgpPassword")
+    if not changes:
+        logging.info("Device is up to date...")
+    return changes
+
+
+def label_refs(label_ids):
+    """Return the label references the device API takes for a list of label ids"""
+    return [{"id": int(label)} for label in label_ids]
+
+
+def _confirm_labels(client, device, label_ids):
+    """Assign the labels through the labels endpoint if the device write did not apply them"""
+    if label_ids is not None and labels_differ(device, label_ids):
+        logging.info("Labels were not applied with the device...updating them separately")
+        update_device_labels(client, device["id"], label_ids)
+
+
+def create_device(client, device_object, label_ids=None):
+    """Create a device, assigning label_ids in the same request when given, and return its id"""
+    logging.info("Creating Device...")
+    if label_ids:
+        device_object = dict(device_object, labels=label_refs(label_ids))
+    device_data = client.post(f"/device/{DEVICE_API_VERSION}/device", {"device": device_object})
+    _confirm_labels(client, device_data["device"], label_ids or None)
+    return device_data["device"]["id"]
+
+
+def device_update_base(device):
+    """Return a device returned by the API in the form the update endpoint takes"""
+    payload = dict((key, copy.deepcopy(value)) for key, value in device.items() if key not in DEVICE_RECORD_ONLY)
+    if device.get("site"):
+        payload["siteId"] = int(device["site"]["id"])
+    if device.get("plan"):
+        payload["planId"] = int(device["plan"]["id"])
+    payload["labels"] = label_refs(device_label_ids(device))
+    return payload
+
+
+def update_device(client, device_id, device_object, fields=None, label_ids=None, device=None):
+    """Update the fields of a device listed in fields, every field of device_object by default, and return its id.
+
+    The update endpoint replaces the whole device, so the fields are laid
+    over device, the detail record of the device, which is fetched when it is
+    not given. label_ids, when given, replace the labels of the device in the
+    same request.
+    """
+    logging.info("Updating Device...")
+    if fields is None:
+        fields = list(device_object)
+    if device is None:
+        device = get_device(client, device_id)
+        if device is None:
+            raise KentikError(f"Device {device_id} does not exist.")
+    device_object = merge_update(device_update_base(device), device_object, fields)
+    device_object["id"] = device_id
+    if label_ids is not None:
+        device_object["labels"] = label_refs(label_ids)
+    device_data = client.put(f"/device/{DEVICE_API_VERSION}/device/{device_id}", {"device": device_object})
+    _confirm_labels(client, device_data["device"], label_ids)
+    return device_data["device"]["id"]
+
+
+def update_device_labels(client, device_id, label_ids):
+    """Replace the labels assigned to a device"""
+    logging.info("Updating Device Labels...")
+    payload = {"id": device_id, "labels": label_refs(label_ids)}
+    device_data = client.put(f"/device/{DEVICE_API_VERSION}/device/{device_id}/labels", payload)
+    return device_data["device"]["id"]
+
+
+def write_device(client, device_id, device_object, fields, label_ids=None, device=None):
+    """Apply the changed fields of an existing device in as few requests as possible.
+
+    Labels go in the device update when other fields change too, and
+    through the labels endpoint when they are the only change. device is the
+    detail record of the device, when it is at hand.
+    """
+    device_fields = [field for field in fields if field != "labels"]
+    label_ids = label_ids if "labels" in fields else None
+    if device_fields:
+        return update_device(client, device_id, device_object, device_fields, label_ids, device)
+    if label_ids is not None:
+        return update_device_labels(client, device_id, label_ids)
+    return device_id
+
+
+def delete_device(client, device_id):
+    """Delete a device"""
+    logging.info("Deleting Device...")
+    client.delete(f"/device/{DEVICE_API_VERSION}/device/{device_id}")
+
+
+def ensure_device(module, client, cache):
+    """Bring a single device to the state described by module.params and return the module result"""
+    params = module.params
+    state = params["state"]
+    result = {"changed": False}
+    try:
+        label_ids = None
+        if params["labels"]:
+            logging.info("Labels found")
+            label_ids = resolve_labels(params["labels"], cache.get("labels", lambda: gather_labels(client)))
+        device_object = build_device_payload(
+            dict((key, params[key]) for key in device_argument_spec()),
+            cache.get("sites", lambda: gather_sites(client)),
+            cache.get("plans", lambda: gather_plans(client)),
+        )
+        device = fetch_device(client, cache, params["deviceName"], params.get("use_device_index"))
+        if device is None:
+            if state == "present":
+                if not module.check_mode:
+                    result["device_id"] = create_device(client, device_object, label_ids)
+                result["changed"] = True
+        elif state == "absent":
+            if not module.check_mode:
+                delete_device(client, device["id"])
+            result["changed"] = True
+        else:
+            device_id = device["id"]
+            fields = device_changes(device, device_object, params["updateSnmpAuth"])
+            if label_ids and labels_differ(device, label_ids):
+                fields.append("labels")
+            if fields and not module.check_mode:
+                write_device(client, device_id, device_object, fields, label_ids, device)
+            if fields:
+                result["changed"] = True
+                result["changes"] = fields
+            result["device_id"] = device_id
+    except KentikApiError as exc:
+        module.fail_json(status_code=exc.status_code, msg=to_text(exc))
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc))
+    return result
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Structural comparison of desired objects against the objects the Kentik APIs return."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+import logging
+import numbers
+
+
+def is_empty(value):
+    """Check whether a value is one the APIs leave out of their responses.
+
+    The APIs omit fields holding their zero value, so None, "", 0, False and
+    empty or all-empty containers all mean the same as a missing field.
+    """
+    if isinstance(value, dict):
+        return all(is_empty(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return len(value) == 0
+    if isinstance(value, str):
+        return value == ""
+    return value is None or value == 0
+
+
+def _number(value):
+    """Return value as a float if it is a number or a numeric string, otherwise None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, numbers.Number):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def scalars_equal(remote, desired):
+    """Compare two scalar values, treating ints, floats and numeric strings as numbers"""
+    if isinstance(remote, bool) or isinstance(desired, bool):
+        return remote is desired or remote == desired
+    if isinstance(remote, numbers.Number) or isinstance(desired, numbers.Number):
+        remote_number = _number(remote)
+        desired_number = _number(desired)
+        if remote_number is not None and desired_number is not None:
+            return remote_number == desired_number
+    return remote == desired
+
+
+def _sort_key(value):
+    """Order scalars of mixed types consistently"""
+    number = _number(value)
+    if number is not None:
+        return (0, number, "")
+    return (1, 0, str(value))
+
+
+def diff(remote, desired, path=()):
+    """Return the paths, as tuples of keys, where desired differs from remote.
+
+    Only what desired sets is compared, so fields the API adds or that the
+    task does not manage never count as a change. Dictionaries are compared
+    key by key, lists of scalars as unordered collections and lists of
+    dictionaries element by element.
+    """
+    if isinstance(desired, dict):
+        if is_empty(remote):
+            remote = {}
+        if not isinstance(remote, dict):
+            return [path]
+        changes = []
+        for key, value in desired.items():
+            if value is None:
+                continue
+            if key not in remote:
+                if not is_empty(value):
+                    changes.append(path + (key,))
+                continue
+            changes.extend(diff(remote[key], value, path + (key,)))
+        return changes
+    if isinstance(desired, (list, tuple)):
+        if remote is None:
+            remote = []
+        if not isinstance(remote, (list, tuple)) or len(remote) != len(desired):
+            return [path]
+        if any(isinstance(item, (dict, list, tuple)) for item in desired):
+            for remote_item, desired_item in zip(remote, desired):
+                if diff(remote_item, desired_item, path):
+                    return [path]
+            return []
+        for remote_item, desired_item in zip(sorted(remote, key=_sort_key), sorted(desired, key=_sort_key)):
+            if not scalars_equal(remote_item, desired_item):
+                return [path]
+        return []
+    if remote is None:
+        return [] if is_empty(desired) else [path]
+    return [] if scalars_equal(remote, desired) else [path]
+
+
+def changed_fields(remote, desired, ignore=()):
+    """Return the top level fields of desired that differ from remote, logging each difference.
+
+    ignore names the fields that are never compared, with nested fields
+    written as dotted paths such as nms.snmp.port.
+    """
+    fields = []
+    ignored = [tuple(name.split(".")) for name in ignore]
+    for path in diff(remote, desired):
+        if any(path[:len(prefix)] == prefix for prefix in ignored):
+            continue
+        logging.info("Configured %s does not match the returned value", ".".join(str(key) for key in path))
+        if path[0] not in fields:
+            fields.append(path[0])
+    return fields
+
+
+def changed_values(desired, fields):
+    """Return the part of desired that changed: the fields listed in fields that desired sets"""
+    return dict(
+        (key, value) for key, value in desired.items()
+        if value is not None and key in fields
+    )
+
+
+def overlay(remote, desired):
+    """Return a copy of remote with every value desired sets laid over it, merging dictionaries key by key"""
+    if not isinstance(desired, dict) or not isinstance(remote, dict):
+        return copy.deepcopy(desired)
+    merged = copy.deepcopy(remote)
+    for key, value in desired.items():
+        if value is not None:
+            merged[key] = overlay(remote.get(key), value)
+    return merged
+
+
+def merge_update(remote, desired, fields):
+    """Return the object to send to an update endpoint that replaces the whole object.
+
+    The fields of desired listed in fields are laid over the object the API
+    returned, so the attributes the task leaves alone are sent back as they
+    are instead of being dropped.
+    """
+    payload = copy.deepcopy(remote)
+    for key in fields:
+        if desired.get(key) is not None:
+            payload[key] = overlay(remote.get(key), desired[key])
+    return payload
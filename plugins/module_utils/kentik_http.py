@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Keep-alive HTTP transport for the Kentik APIs, built only on the standard library.
+
+Connections are pooled per process and host and reused across requests, so
+a task that makes many calls pays for the TCP and TLS handshakes once per
+connection. Only http.client and ssl are imported, which keeps module start
+up fast and lets the modules run where no third-party HTTP library is
+installed. Proxies are taken from the usual environment variables, and
+certificates are checked like ansible.module_utils.urls does, against the
+system CA store or ca_path unless validate_certs is turned off.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import http.client
+import json
+import os
+import select
+import ssl
+import threading
+import zlib
+from urllib.parse import unquote, urlsplit
+
+from ansible.module_utils._text import to_text
+
+POOL_MAXSIZE = 32
+READ_CHUNK_SIZE = 64 * 1024
+USER_AGENT = "kentik-kentik_config"
+# Methods that are safe to send again when a pooled connection turns out to be closed.
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+# Errors that mean the server closed a pooled connection before it answered.
+STALE_CONNECTION_ERRORS = (BrokenPipeError, ConnectionResetError, http.client.BadStatusLine)
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+_SSL_CONTEXTS = {}
+
+
+class TransportError(Exception):
+    """Raised when a request cannot be sent or its response cannot be read.
+
+    connected is False when no connection to the server was ever established,
+    so the request certainly did not reach it.
+    """
+
+    def __init__(self, msg, connected=True):
+        super(TransportError, self).__init__(msg)
+        self.connected = connected
+
+
+def ssl_context(validate_certs=True, ca_path=None):
+    """Return the TLS context for a certificate validation setting, built once per process.
+
+    ca_path is a file or directory of CA certificates to trust instead of the
+    system store. With validate_certs off, neither the certificate nor the
+    host name is checked.
+    """
+    key = (validate_certs, ca_path)
+    with _POOLS_LOCK:
+        if key not in _SSL_CONTEXTS:
+            if not validate_certs:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            elif ca_path and os.path.isdir(ca_path):
+                context = ssl.create_default_context(capath=ca_path)
+            else:
+                context = ssl.create_default_context(cafile=ca_path)
+            _SSL_CONTEXTS[key] = context
+        return _SSL_CONTEXTS[key]
+
+
+def _proxy_for(scheme, host):
+    """Return the proxy URL to reach host through, as set in the environment, or None"""
+    # urllib.request is slow to import, so it is only loaded when a proxy may be set.
+    if not any(key.lower().endswith("_proxy") for key in os.environ):
+        return None
+    from urllib.request import getproxies, proxy_bypass
+
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(host):
+        return None
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def _is_dropped(connection):
+    """Check whether the server closed an idle connection, which then reads as ready or has no socket"""
+    if connection.sock is None:
+        return True
+    try:
+        poller = select.poll()
+        poller.register(connection.sock, select.POLLIN)
+        return bool(poller.poll(0))
+    except (OSError, ValueError):
+        return True
+
+
+class HttpResponse(object):
+    """The status, headers and body of a response, read at once through read or in chunks through iter_content"""
+
+    def __init__(self, pool, connection, response, url):
+        self.status_code = response.status
+        self.headers = response.headers
+        self.url = url
+        self._pool = pool
+        self._connection = connection
+        self._response = response
+        self._content = None
+        self._decoder = None
+        if (response.getheader("Content-Encoding") or "").lower() == "gzip":
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def iter_content(self, chunk_size=READ_CHUNK_SIZE):
+        """Yield the decoded body in chunks, handing the connection back to the pool once it is read"""
+        try:
+            while True:
+                chunk = self._response.read(chunk_size)
+                if not chunk:
+                    break
+                if self._decoder is not None:
+                    chunk = self._decoder.decompress(chunk)
+                if chunk:
+                    yield chunk
+            if self._decoder is not None:
+                tail = self._decoder.flush()
+                if tail:
+                    yield tail
+        except (OSError, http.client.HTTPException, zlib.error) as exc:
+            self.close()
+            raise TransportError(to_text(exc) or type(exc).__name__)
+        self._release()
+
+    def read(self):
+        """Read the whole decoded body, handing the connection back to the pool, and return it"""
+        if self._content is None:
+            self._content = b"".join(self.iter_content())
+        return self._content
+
+    @property
+    def content(self):
+        """The whole decoded body"""
+        return self.read()
+
+    @property
+    def text(self):
+        """The whole body as text"""
+        return self.read().decode("utf-8", errors="replace")
+
+    def json(self):
+        """The body decoded from JSON, raising ValueError when it is not valid JSON"""
+        return json.loads(self.text)
+
+    def _release(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if self._response.will_close:
+            connection.close()
+        else:
+            self._pool.put(connection)
+
+    def close(self):
+        """Drop a response that was not read to the end, keeping its connection when little of the body is left"""
+        if self._connection is None:
+            return
+        remaining = self._response.length
+        if remaining is not None and remaining <= READ_CHUNK_SIZE:
+            try:
+                self._response.read()
+            except (OSError, http.client.HTTPException):
+                pass
+            else:
+                self._release()
+                return
+        connection, self._connection = self._connection, None
+        connection.close()
+
+
+class ConnectionPool(object):
+    """Idle keep-alive connections to one scheme and host, reused most recent first"""
+
+    def __init__(self, scheme, netloc, maxsize=POOL_MAXSIZE, context=None):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.maxsize = maxsize
+        self.context = context
+        self.idle = []
+        self.lock = threading.Lock()
+        self.target = urlsplit(f"{scheme}://{netloc}")
+        self.proxy = None
+        self.proxy_headers = {}
+        proxy = _proxy_for(scheme, self.target.hostname)
+        if proxy:
+            self.proxy = urlsplit(proxy)
+            if self.proxy.username:
+                credentials = f"{unquote(self.proxy.username)}:{unquote(self.proxy.password or '')}"
+                self.proxy_headers["Proxy-Authorization"] = f"Basic {base64.b64encode(credentials.encode()).decode()}"
+
+    def _connect(self, timeout):
+        """Open a new connection, directly or through the proxy"""
+        host, port = self.target.hostname, self.target.port
+        if self.proxy:
+            host, port = self.proxy.hostname, self.proxy.port
+        if self.scheme == "https":
+            connection = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.context or ssl_context())
+            if self.proxy:
+                # HTTPS goes through a CONNECT tunnel, so only the proxy sees the proxy credentials.
+                connection.set_tunnel(self.target.hostname, self.target.port, headers=self.proxy_headers)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        try:
+            connection.connect()
+        except (OSError, http.client.HTTPException) as exc:
+            connection.close()
+            raise TransportError(to_text(exc) or type(exc).__name__, connected=False)
+        return connection
+
+    def get(self, timeout):
+        """Return a connection and whether it was reused from the pool"""
+        with self.lock:
+            while self.idle:
+                connection = self.idle.pop()
+                if _is_dropped(connection):
+                    connection.close()
+                    continue
+                connection.sock.settimeout(timeout)
+                return connection, True
+        return self._connect(timeout), False
+
+    def put(self, connection):
+        """Hand a connection whose response was read back, closing it when the pool is full"""
+        with self.lock:
+            if len(self.idle) < self.maxsize:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, target, body, headers, timeout):
+        """Send a request and return its response, with the body not yet read"""
+        url = f"{self.scheme}://{self.netloc}{target}"
+        if self.proxy and self.scheme == "http":
+            # Plain HTTP proxies take the absolute URL and the credentials with every request.
+            target = url
+            headers = dict(headers)
+            headers.update(self.proxy_headers)
+        while True:
+            connection, reused = self.get(timeout)
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                response = connection.getresponse()
+            except STALE_CONNECTION_ERRORS as exc:
+                connection.close()
+                if reused and method in IDEMPOTENT_METHODS:
+                    continue
+                raise TransportError(to_text(exc) or type(exc).__name__)
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                raise TransportError(to_text(exc) or type(exc).__name__)
+            return HttpResponse(self, connection, response, url)
+
+
+def get_pool(scheme, netloc, pool_key=None, validate_certs=True, ca_path=None):
+    """Return the connection pool for a scheme and host, creating it on first use.
+
+    Pools are also keyed by process id so a forked worker never reuses the
+    sockets it inherited from its parent, by pool_key so callers such as
+    different accounts can keep their connections apart, and by the
+    certificate validation settings their connections were opened with.
+    """
+    key = (os.getpid(), scheme, netloc, pool_key, validate_certs, ca_path)
+    context = ssl_context(validate_certs, ca_path) if scheme == "https" else None
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(scheme, netloc, context=context)
+    return pool
+
+
+def request(method, url, headers=None, data=None, timeout=None, stream=False, pool_key=None,
+            validate_certs=True, ca_path=None):
+    """Send a request over a pooled connection and return the HttpResponse.
+
+    Unless stream is set, the body is read before returning, so the
+    connection is already back in the pool.
+    """
+    parts = urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target = f"{target}?{parts.query}"
+    request_headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"}
+    request_headers.update(headers or {})
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    pool = get_pool(parts.scheme, parts.netloc, pool_key, validate_certs, ca_path)
+    response = pool.request(method, target, data, request_headers, timeout)
+    if not stream:
+        response.read()
+    return response
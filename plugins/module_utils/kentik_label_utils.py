@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Label helpers shared by the label modules and the kentik_label action plugin."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import logging
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikApiError,
+    kentik_argument_spec,
+)
+
+LABEL_API_VERSION = "v202210"
+# Reference-data cache entries built from the label list.
+LABEL_CACHE_ENDPOINTS = ("labels", "label_list")
+
+
+def label_argument_spec():
+    """Return the argument spec options describing a single label"""
+    return dict(
+        name=dict(type="str", required=True),
+        color=dict(type="str", required=True),
+        state=dict(default="present", choices=["present", "absent"]),
+    )
+
+
+def label_module_argument_spec():
+    """Return the full argument spec of the kentik_label module"""
+    argument_spec = label_argument_spec()
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    return argument_spec
+
+
+def list_labels(client):
+    """Return the full list of labels in the tenant"""
+    label_data = client.get(f"/label/{LABEL_API_VERSION}/labels")
+    return label_data["labels"]
+
+
+def gather_labels(client):
+    """Return a name to id dictionary of the labels in the tenant"""
+    label_dict = {}
+    for label in list_labels(client):
+        label_dict[label["name"]] = label["id"]
+    return label_dict
+
+
+def gather_label_list(client):
+    """Return the id, name and color of every label in the tenant"""
+    return [
+        {"id": label["id"], "name": label["name"], "color": label.get("color")}
+        for label in list_labels(client)
+    ]
+
+
+def build_label_payload(params):
+    """Build the label object sent to the API from a set of label options"""
+    return {"name": params["name"], "color": params["color"]}
+
+
+def label_changes(label, label_object):
+    """Return the names of the fields where a label returned by the API differs from label_object"""
+    if (label.get("color") or "").lower() != (label_object["color"] or "").lower():
+        logging.info("Label %s color does not match", label_object["name"])
+        return ["color"]
+    return []
+
+
+def create_label(client, label_object):
+    """Create a label and return its id"""
+    logging.info("Creating Label...")
+    label_data = client.post(f"/label/{LABEL_API_VERSION}/labels", {"label": label_object})
+    return label_data["label"]["id"]
+
+
+def update_label(client, label_id, label_object):
+    """Update a label and return its id"""
+    logging.info("Updating Label...")
+    label_object = dict(label_object, id=label_id)
+    label_data = client.put(f"/label/{LABEL_API_VERSION}/labels/{label_id}", {"label": label_object})
+    return label_data["label"]["id"]
+
+
+def delete_label(client, label_id):
+    """Delete a label"""
+    logging.info("Deleting Label...")
+    client.delete(f"/label/{LABEL_API_VERSION}/labels/{label_id}")
+
+
+def ensure_label(module, client, cache):
+    """Bring a single label to the state described by module.params and return the module result"""
+    params = module.params
+    state = params["state"]
+    result = {"changed": False}
+    try:
+        # The id and the color both come from one cached label list, so a cold run lists the labels once.
+        label = dict(
+            (item["name"], item) for item in cache.get("label_list", lambda: gather_label_list(client))
+        ).get(params["name"])
+        label_id = label["id"] if label else None
+        if label_id:
+            logging.info("Label %s exists", params["name"])
+            if state == "present":
+                label_object = build_label_payload(params)
+                fields = label_changes(label, label_object)
+                if fields:
+                    if not module.check_mode:
+                        update_label(client, label_id, label_object)
+                        cache.invalidate(*LABEL_CACHE_ENDPOINTS)
+                    result["changed"] = True
+                    result["changes"] = fields
+                result["label_id"] = label_id
+            else:
+                if not module.check_mode:
+                    delete_label(client, label_id)
+                    cache.invalidate(*LABEL_CACHE_ENDPOINTS)
+                result["changed"] = True
+        elif state == "present":
+            logging.info("Label does not exists...")
+            if not module.check_mode:
+                result["label_id"] = create_label(client, build_label_payload(params))
+                cache.invalidate(*LABEL_CACHE_ENDPOINTS)
+            result["changed"] = True
+    except KentikApiError as exc:
+        module.fail_json(status_code=exc.status_code, msg=to_text(exc))
+    return result
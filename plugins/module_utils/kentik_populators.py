@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Streaming conversion of customer to IP address lists into custom dimension populators.
+
+The list is read one row at a time and every row for the same customer
+becomes part of one populator, with one criterion per port. Rows are sorted
+by customer in bounded runs that are spilled to temporary files and merged,
+so memory use depends on the run and batch part sizes rather than on the
+size of the list.
+
+The existing populators of a dimension can be indexed by a content hash of
+each value's criteria, so that a load only sends the values that were added,
+changed or removed. The batch API replaces every criterion of a value it
+upserts, so a changed value is sent whole and a removed one as a delete.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import csv
+import hashlib
+import heapq
+import ipaddress
+import json
+import logging
+import operator
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib.parse import quote
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import is_empty
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import iter_items, iter_json_array
+
+REQUIRED_COLUMNS = ("customer", "ip_address")
+DIRECTIONS = ("SRC", "DST")
+DEFAULT_MAX_ADDRESSES = 1000
+# Populators handed from the reader to each uploader at a time.
+HANDOFF_SIZE = 1000
+HANDOFF_DEPTH = 4
+# Populator fields the API returns that are not matching criteria.
+POPULATOR_META_KEYS = (
+    "id",
+    "dimension_id",
+    "value",
+    "company_id",
+    "user",
+    "created_date",
+    "updated_date",
+    "addr_count",
+    "mac_count",
+)
+DIGEST_MODULUS = 2 ** 256
+# Rows sorted in memory at a time before they are spilled to a temporary file.
+SORT_RUN_SIZE = 100000
+
+
+def iter_csv_rows(path, stats=None):
+    """Yield the rows of a customer,ip_address,port,ip_version CSV file as dictionaries, one at a time"""
+    try:
+        with open(path, "r", newline="") as csv_file:
+            reader = csv.DictReader(csv_file)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise KentikError(f"{path} is missing the column(s): {', '.join(missing)}")
+            for row in reader:
+                if stats is not None:
+                    stats["rows"] += 1
+                customer = (row.get("customer") or "").strip()
+                address = (row.get("ip_address") or "").strip()
+                if not customer or not address:
+                    if stats is not None:
+                        stats["skipped"] += 1
+                    continue
+                yield {"customer": customer, "ip_address": address, "port": (row.get("port") or "").strip()}
+    except (IOError, OSError, csv.Error) as exc:
+        raise KentikError(f"Unable to read {path}: {to_text(exc)}")
+
+
+def _spill(run):
+    """Write a sorted run of rows to a temporary file and return it rewound"""
+    spill = tempfile.TemporaryFile("w+")
+    for row in run:
+        spill.write(json.dumps([row["customer"], row["ip_address"], row["port"]]) + "\n")
+    spill.seek(0)
+    return spill
+
+
+def _iter_spill(spill):
+    for line in spill:
+        customer, address, port = json.loads(line)
+        yield {"customer": customer, "ip_address": address, "port": port}
+
+
+def iter_rows_by_customer(rows, run_size=SORT_RUN_SIZE):
+    """Yield rows ordered by customer, keeping the rows of each customer in their original order.
+
+    Rows are sorted in runs of run_size. When there is more than one run,
+    every run is spilled to a temporary file and the files are merged, so at
+    most run_size rows are held in memory.
+    """
+    key = operator.itemgetter("customer")
+    spills = []
+    try:
+        run = []
+        for row in rows:
+            run.append(row)
+            if len(run) >= run_size:
+                run.sort(key=key)
+                spills.append(_spill(run))
+                run = []
+        run.sort(key=key)
+        if not spills:
+            for row in run:
+                yield row
+            return
+        if run:
+            spills.append(_spill(run))
+        logging.info("Merging %d sorted runs of rows", len(spills))
+        # heapq.merge keeps equal keys in the order of the runs, so the file order of a customer's rows holds.
+        for row in heapq.merge(*(_iter_spill(spill) for spill in spills), key=key):
+            yield row
+    except (IOError, OSError) as exc:
+        raise KentikError(f"Unable to sort the rows by customer: {to_text(exc)}")
+    finally:
+        for spill in spills:
+            spill.close()
+
+
+def iter_address_groups(rows, max_addresses=DEFAULT_MAX_ADDRESSES, run_size=SORT_RUN_SIZE):
+    """Group the rows of every customer, whatever their order, into (customer, [(port, addresses), ...]) tuples.
+
+    The addresses of each port are split into lists of at most max_addresses.
+    """
+    customer = None
+    ports = {}
+    for row in iter_rows_by_customer(rows, run_size):
+        if ports and row["customer"] != customer:
+            yield customer, _port_groups(ports, max_addresses)
+            ports = {}
+        customer = row["customer"]
+        ports.setdefault(row["port"], []).append(row["ip_address"])
+    if ports:
+        yield customer, _port_groups(ports, max_addresses)
+
+
+def _port_groups(ports, max_addresses):
+    return [
+        (port, addresses[start:start + max_addresses])
+        for port, addresses in ports.items()
+        for start in range(0, len(addresses), max_addresses)
+    ]
+
+
+def build_populator(value, direction, groups):
+    """Build a batch API populator that maps the (port, addresses) groups in one direction to value"""
+    criteria = []
+    for port, addresses in groups:
+        criterion = {"direction": direction, "addr": list(addresses)}
+        if port:
+            criterion["port"] = [port]
+        criteria.append(criterion)
+    return {"value": value, "criteria": criteria}
+
+
+def iter_populator_pairs(groups, stats=None):
+    """Yield a (SRC populator, DST populator) pair for every customer"""
+    for customer, port_groups in groups:
+        if stats is not None:
+            stats["populators"] += 1
+        yield tuple(build_populator(customer, direction, port_groups) for direction in DIRECTIONS)
+
+
+def _normalize_address(address):
+    # Plain IPv4 host addresses, by far the most common, skip the slower
+    # ipaddress parsing.
+    if "/" not in address and ":" not in address and address.count(".") == 3:
+        return address + "/32"
+    try:
+        return ipaddress.ip_network(address, strict=False).compressed
+    except ValueError:
+        return address.lower()
+
+
+def _criterion_values(key, value):
+    """Return a criterion field as a sorted list of strings, whether it is a list or a comma separated string"""
+    items = value if isinstance(value, list) else [value]
+    values = []
+    for item in items:
+        values.extend(part.strip() for part in str(item).split(",") if part.strip())
+    if key == "addr":
+        values = [_normalize_address(address) for address in values]
+    return sorted(values)
+
+
+def criterion_digest(criterion):
+    """Return a content hash of one criterion, either as the batch API takes it or as a populator the API returns"""
+    fields = {}
+    for key, value in criterion.items():
+        if key in POPULATOR_META_KEYS or is_empty(value):
+            continue
+        if key == "direction":
+            fields[key] = str(value).upper()
+        else:
+            fields[key] = _criterion_values(key, value)
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return int.from_bytes(hashlib.sha256(canonical.encode("utf-8")).digest(), "big")
+
+
+def _index_add(index, value, digest):
+    # Adding the digests makes the hash of a value independent of the order
+    # of its criteria.
+    index[value] = (index.get(value, 0) + digest) % DIGEST_MODULUS
+
+
+def index_populators(populators):
+    """Index populators as the API returns them, one criterion each, by value and the hash of its criteria"""
+    index = {}
+    for populator in populators:
+        _index_add(index, populator["value"], criterion_digest(populator))
+    return index
+
+
+def index_upsert(index, populator):
+    """Add a batch API populator to an index, returning False when its value was already indexed"""
+    value = populator["value"]
+    new = value not in index
+    index.setdefault(value, 0)
+    for criterion in populator.get("criteria") or ():
+        _index_add(index, value, criterion_digest(criterion))
+    return new
+
+
+def merge_upserts(upserts):
+    """Merge batch API populators that share a value into one, keeping the criteria of each in order.
+
+    The batch API replaces every criterion of a value it upserts, so
+    populators sent separately for one value would leave only the last.
+    """
+    merged = {}
+    for populator in upserts:
+        value = populator["value"]
+        if value not in merged:
+            merged[value] = dict(populator, criteria=list(populator.get("criteria") or ()))
+        else:
+            merged[value]["criteria"].extend(populator.get("criteria") or ())
+    return list(merged.values())
+
+
+def index_upserts(upserts):
+    """Index batch API populators by value and the hash of their criteria"""
+    index = {}
+    for populator in upserts:
+        index_upsert(index, populator)
+    return index
+
+
+def diff_indexes(desired, existing):
+    """Return the set of values to upsert, the sorted values to delete and the number of unchanged values"""
+    upserts = set(value for value, digest in desired.items() if existing.get(value) != digest)
+    deletes = sorted(value for value in existing if value not in desired)
+    return upserts, deletes, len(desired) - len(upserts)
+
+
+def find_dimension_id(client, name):
+    """Return the id of the custom dimension called name"""
+    for dimension in iter_items(client, "/api/v5/customdimensions", "customDimensions", api="v5", fields=("id", "name")):
+        if dimension.get("name") == name:
+            return dimension["id"]
+    raise KentikError(f"Custom dimension {name} does not exist.")
+
+
+def iter_dimension_populators(client, dimension_id):
+    """Stream the populators of a custom dimension one at a time"""
+    chunks = client.stream("GET", f"/api/v5/customdimension/{quote(str(dimension_id), safe='')}", api="v5")
+    return iter_json_array(chunks, ("customDimension", "populators"))
+
+
+def index_dimension(client, name):
+    """Fetch the populators of the custom dimension called name and index them by value"""
+    index = index_populators(iter_dimension_populators(client, find_dimension_id(client, name)))
+    logging.info("Indexed %d values of custom dimension %s", len(index), name)
+    return index
+
+
+def index_dimensions(client, names):
+    """Index the populators of several custom dimensions concurrently, returning one index per name"""
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as executor:
+        return list(executor.map(lambda name: index_dimension(client, name), names))
+
+
+def delta_deletes(values):
+    """Return the batch API deletes for the given values"""
+    return [{"value": value} for value in values]
+
+
+class _Aborted(Exception):
+    """Raised inside an uploader when the reader or another uploader failed"""
+
+
+_END = object()
+_ABORT = object()
+
+
+def fan_out(items, consumers, handoff_size=HANDOFF_SIZE, depth=HANDOFF_DEPTH):
+    """Send element i of every tuple in items to consumers[i], each running in its own thread, and return their results.
+
+    items is read once. Every consumer is called with an iterator and runs
+    concurrently with the reader, which hands elements over in blocks through
+    a bounded queue, so at most a few blocks per consumer are in memory. If
+    the reader or any consumer fails, the other consumers see their iterator
+    raise instead of ending, so none of them finishes with partial data, and
+    the first error is raised.
+    """
+    queues = [queue.Queue(depth) for _ in consumers]
+    finished = [threading.Event() for _ in consumers]
+
+    def feed(index):
+        while True:
+            block = queues[index].get()
+            if block is _END:
+                return
+            if block is _ABORT:
+                raise _Aborted()
+            for element in block:
+                yield element
+
+    def put(index, block):
+        while not finished[index].is_set():
+            try:
+                queues[index].put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(index):
+        try:
+            return consumers[index](feed(index))
+        finally:
+            finished[index].set()
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(consumers)) as executor:
+        futures = [executor.submit(run, index) for index in range(len(consumers))]
+        blocks = [[] for _ in consumers]
+        try:
+            for item in items:
+                if any(future.done() for future in futures):
+                    break
+                for block, element in zip(blocks, item):
+                    block.append(element)
+                if len(blocks[0]) >= handoff_size:
+                    for index, block in enumerate(blocks):
+                        put(index, block)
+                    blocks = [[] for _ in consumers]
+            else:
+                for index, block in enumerate(blocks):
+                    if block:
+                        put(index, block)
+        except Exception as exc:
+            errors.append(exc)
+        failed = errors or any(future.done() and future.exception() for future in futures)
+        for index in range(len(consumers)):
+            put(index, _ABORT if failed else _END)
+    for future in futures:
+        exc = future.exception()
+        if exc is not None and not isinstance(exc, _Aborted):
+            errors.append(exc)
+    if errors:
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+def log_stats(stats):
+    """Log how much of a customer list was converted"""
+    logging.info(
+        "Read %d rows, skipped %d and built %d populators per direction",
+        stats["rows"],
+        stats["skipped"],
+        stats["populators"],
+    )
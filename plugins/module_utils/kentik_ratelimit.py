@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Client-side rate limiting and retry backoff for the Kentik APIs."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import email.utils
+import fcntl
+import hashlib
+import json
+import os
+import random
+import time
+
+DEFAULT_STATE_DIR = "~/.ansible/tmp/kentik_ratelimit"
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Return an exponential backoff delay with full jitter for the given retry attempt"""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+def retry_after_delay(value):
+    """Parse a Retry-After header, given either in seconds or as an HTTP date, into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket(object):
+    """Token bucket whose state lives in a lock-protected file.
+
+    Every process that builds a bucket for the same account shares the same
+    state file, so the aggregate request rate of all forks stays at or below
+    rate requests per second, with bursts of up to burst requests.
+    """
+
+    def __init__(self, key, rate, burst=None, state_dir=DEFAULT_STATE_DIR):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.state_dir = os.path.expanduser(state_dir)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        self.path = os.path.join(self.state_dir, f"{digest}.json")
+
+    def _take(self):
+        """Try to take a token and return how long to wait before trying again"""
+        with open(self.path, "a+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                try:
+                    state = json.loads(state_file.read() or "{}")
+                except ValueError:
+                    state = {}
+                now = time.time()
+                tokens = state.get("tokens", self.burst)
+                elapsed = max(0.0, now - state.get("timestamp", now))
+                tokens = min(self.burst, tokens + elapsed * self.rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps({"tokens": tokens, "timestamp": now}))
+                state_file.flush()
+                return wait
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """Block until a token is available and return the total time spent waiting"""
+        if not os.path.isdir(self.state_dir):
+            os.makedirs(self.state_dir, mode=0o700, exist_ok=True)
+        waited = 0.0
+        wait = self._take()
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            wait = self._take()
+        return waited
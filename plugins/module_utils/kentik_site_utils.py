@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Site payload building, comparison and API helpers shared by the site modules and the kentik_site action plugin."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+import logging
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikApiError,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import (
+    changed_fields,
+    merge_update,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import matches_any
+
+SITE_API_VERSION = "v202211"
+
+SITE_TYPES = [
+    "SITE_TYPE_DATA_CENTER",
+    "SITE_TYPE_CLOUD",
+    "SITE_TYPE_BRANCH",
+    "SITE_TYPE_CONNECTIVITY",
+    "SITE_TYPE_CUSTOMER",
+    "SITE_TYPE_OTHER",
+]
+
+ADDRESS_CLASSIFICATION_KEYS = ("infrastructureNetworks", "userAccessNetworks", "otherNetworks")
+
+
+def site_argument_spec():
+    """Return the argument spec options describing a single site"""
+    return dict(
+        title=dict(type="str", required=True),
+        postalAddress=dict(type="dict", required=False),
+        type=dict(
+            choices=SITE_TYPES,
+            required=False,
+            default="SITE_TYPE_OTHER",
+        ),
+        lat=dict(type="float", required=False, default=0),
+        lon=dict(type="float", required=False, default=0),
+        state=dict(default="present", choices=["present", "absent"]),
+        siteMarket=dict(type="str", required=False, default=""),
+        infrastructureNetworks=dict(type="list", required=False, elements="str"),
+        userAccessNetworks=dict(type="list", required=False, elements="str"),
+        otherNetworks=dict(type="list", required=False, elements="str")
+    )
+
+
+def site_module_argument_spec():
+    """Return the full argument spec of the kentik_site module"""
+    argument_spec = site_argument_spec()
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    return argument_spec
+
+
+def list_sites(client):
+    """Return the full list of sites in the tenant"""
+    site_data = client.get(f"/site/{SITE_API_VERSION}/sites")
+    return site_data["sites"]
+
+
+def gather_sites(client):
+    """Return a title to id dictionary of the sites in the tenant"""
+    site_dict = {}
+    for site in list_sites(client):
+        site_dict[site["title"]] = site["id"]
+    return site_dict
+
+
+def site_matches(site, names=None, types=None):
+    """Check whether a site returned by the API matches the title patterns and is one of the types, when given"""
+    if not matches_any(site.get("title"), names):
+        return False
+    return not types or site.get("type") in types
+
+
+def build_site_payload(params):
+    """Build the site object sent to the API from a set of site options"""
+    payload = {}
+    for key in site_argument_spec():
+        if key == "state" or key in ADDRESS_CLASSIFICATION_KEYS:
+            continue
+        payload[key] = copy.deepcopy(params[key])
+    payload["addressClassification"] = dict(
+        (key, list(params[key] or [])) for key in ADDRESS_CLASSIFICATION_KEYS
+    )
+    return payload
+
+
+def get_site(client, site_id):
+    """Return the site with site_id"""
+    site_data = client.get(f"/site/{SITE_API_VERSION}/sites/{site_id}")
+    return site_data["site"]
+
+
+def site_changes(site, site_object):
+    """Return the names of the fields where a site returned by the API differs from site_object"""
+    changes = changed_fields(site, site_object, ignore=("id",))
+    if not changes:
+        logging.info("Site is up to date...")
+    return changes
+
+
+def create_site(client, site_object):
+    """Create a site and return its id"""
+    logging.info("Creating Site...")
+    site_data = client.post(f"/site/{SITE_API_VERSION}/sites", {"site": site_object})
+    return site_data["site"]["id"]
+
+
+def update_site(client, site_id, site_object, fields=None, site=None):
+    """Update the fields of a site listed in fields, every field of site_object by default, and return its id.
+
+    The update endpoint replaces the whole site, so the fields are laid over
+    site, the site as the API returned it, which is fetched when it is not
+    given.
+    """
+    logging.info("Updating Site...")
+    if fields is None:
+        fields = list(site_object)
+    if site is None:
+        site = get_site(client, site_id)
+    site_object = merge_update(site, site_object, fields)
+    site_object["id"] = site_id
+    site_data = client.put(f"/site/{SITE_API_VERSION}/sites/{site_id}", {"site": site_object})
+    return site_data["site"]["id"]
+
+
+def delete_site(client, site_id):
+    """Delete a site"""
+    logging.info("Deleting Site...")
+    client.delete(f"/site/{SITE_API_VERSION}/sites/{site_id}")
+
+
+def ensure_site(module, client, cache):
+    """Bring a single site to the state described by module.params and return the module result"""
+    params = module.params
+    state = params["state"]
+    result = {"changed": False}
+    try:
+        site_id = cache.get("sites", lambda: gather_sites(client)).get(params["title"])
+        if site_id:
+            logging.info("Site Exists")
+            if state == "present":
+                site_object = build_site_payload(params)
+                site = get_site(client, site_id)
+                fields = site_changes(site, site_object)
+                if fields:
+                    if not module.check_mode:
+                        update_site(client, site_id, site_object, fields, site)
+                        cache.invalidate("sites")
+                    result["changed"] = True
+                    result["changes"] = fields
+                result["site_id"] = site_id
+            else:
+                if not module.check_mode:
+                    delete_site(client, site_id)
+                    cache.invalidate("sites")
+                result["changed"] = True
+        elif state == "present":
+            logging.info("Site does not exists")
+            if not module.check_mode:
+                result["site_id"] = create_site(client, build_site_payload(params))
+                cache.invalidate("sites")
+            result["changed"] = True
+    except KentikApiError as exc:
+        module.fail_json(status_code=exc.status_code, msg=to_text(exc))
+    return result
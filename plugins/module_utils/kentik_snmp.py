@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Comparison and concurrent update of the SNMP settings of many devices.
+
+The device API never returns SNMP secrets, so the community and the SNMPv3
+passphrases are compared against salted fingerprints of the values last
+written to each device, kept in a state directory apart from the
+reference-data cache so that they are never expired. The other SNMPv3
+settings are compared against the detail record of the device.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import binascii
+import hashlib
+import logging
+import os
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    DEFAULT_MAX_WORKERS,
+    run_concurrently,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    SNMP_V3_SECRETS,
+    update_device,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import diff
+
+SNMP_AUTH_PROTOCOLS = ["NoAuth", "MD5", "SHA"]
+SNMP_PRIVACY_PROTOCOLS = ["NoPriv", "DES", "AES"]
+# Module option names of the SNMPv3 settings mapped to their names in deviceSnmpV3Conf.
+SNMP_V3_KEYS = dict(
+    user_name="userName",
+    authentication_protocol="authenticationProtocol",
+    authentication_passphrase="authenticationPassphrase",
+    privacy_protocol="privacyProtocol",
+    privacy_passphrase="privacyPassphrase",
+)
+# The device fields the selector and the update need from the device list.
+SNMP_DEVICE_FIELDS = ("id", "deviceName", "deviceSubtype", "plan", "site", "labels")
+SNMP_STATE = "snmp_fingerprints"
+DEFAULT_STATE_DIR = "~/.ansible/kentik_state"
+FINGERPRINT_ITERATIONS = 100000
+
+
+def snmp_v3_argument_spec():
+    """Return the suboptions describing the SNMPv3 settings of a device"""
+    return dict(
+        user_name=dict(type="str", required=True),
+        authentication_protocol=dict(type="str", required=False, choices=SNMP_AUTH_PROTOCOLS),
+        authentication_passphrase=dict(type="str", required=False, no_log=True),
+        privacy_protocol=dict(type="str", required=False, choices=SNMP_PRIVACY_PROTOCOLS),
+        privacy_passphrase=dict(type="str", required=False, no_log=True),
+    )
+
+
+def build_snmp_v3_conf(v3):
+    """Return the deviceSnmpV3Conf the device API takes for a set of SNMPv3 options, or None"""
+    if v3 is None:
+        return None
+    return dict((SNMP_V3_KEYS[key], value) for key, value in v3.items() if value is not None)
+
+
+def secret_values(community, v3_conf):
+    """Return the secrets to write by the key they are fingerprinted under"""
+    secrets = {}
+    if community is not None:
+        secrets["deviceSnmpCommunity"] = community
+    for key in SNMP_V3_SECRETS:
+        if v3_conf and v3_conf.get(key) is not None:
+            secrets[f"deviceSnmpV3Conf.{key}"] = v3_conf[key]
+    return secrets
+
+
+def fingerprint(value, salt):
+    """Return a salted, deliberately slow hash of a secret, so the recorded fingerprints do not reveal it"""
+    digest = hashlib.pbkdf2_hmac("sha256", value.encode("utf-8"), salt.encode("utf-8"), FINGERPRINT_ITERATIONS)
+    return binascii.hexlify(digest).decode("ascii")
+
+
+def load_fingerprints(store):
+    """Return the salt and the per-device secret fingerprints recorded for the account of store.
+
+    The salt is None when nothing has been recorded yet.
+    """
+    state = store.load_state(SNMP_STATE)
+    if not state or not state.get("salt"):
+        return None, {}
+    return state["salt"], state.get("devices") or {}
+
+
+def new_salt():
+    """Return a random salt for a new set of fingerprints"""
+    return binascii.hexlify(os.urandom(16)).decode("ascii")
+
+
+def save_fingerprints(store, salt, written):
+    """Record the fingerprints of the secrets written to every device in written, a device id to fingerprints dict"""
+    def merge(state):
+        if not state or state.get("salt") != salt:
+            # Fingerprints made with another salt can never match, so they are dropped.
+            state = {"salt": salt, "devices": {}}
+        for device_id, fingerprints in written.items():
+            state["devices"].setdefault(str(device_id), {}).update(fingerprints)
+        return state
+
+    if written:
+        store.update_state(SNMP_STATE, merge)
+
+
+def snmp_changes(device, community, v3_conf, recorded, fingerprints, force=False):
+    """Return the SNMP fields of a device to write: those whose settings or secret fingerprints differ"""
+    fields = []
+    # The fields holding a secret whose fingerprint differs from the recorded one.
+    stale = set(key.split(".", 1)[0] for key, value in fingerprints.items() if recorded.get(key) != value)
+    if community is not None and (force or "deviceSnmpCommunity" in stale):
+        fields.append("deviceSnmpCommunity")
+    if v3_conf is not None:
+        settings = dict((key, value) for key, value in v3_conf.items() if key not in SNMP_V3_SECRETS)
+        if force or "deviceSnmpV3Conf" in stale or diff(device.get("deviceSnmpV3Conf"), settings):
+            # The settings are written whole, so a change to any of them sends the passphrases too.
+            fields.append("deviceSnmpV3Conf")
+    return fields
+
+
+def plan_snmp_changes(devices, community, v3_conf, salt, recorded, force=False):
+    """Return a (device, fields, fingerprints) tuple for every device whose SNMP settings have to be written"""
+    fingerprints = dict((key, fingerprint(value, salt)) for key, value in secret_values(community, v3_conf).items())
+    changes = []
+    for device in devices:
+        fields = snmp_changes(
+            device, community, v3_conf, recorded.get(str(device["id"])) or {}, fingerprints, force
+        )
+        if fields:
+            logging.info("SNMP settings of %s differ: %s", device["deviceName"], ", ".join(fields))
+            written = dict(
+                (key, value) for key, value in fingerprints.items()
+                if key.split(".", 1)[0] in fields
+            )
+            changes.append((device, fields, written))
+    return changes
+
+
+def write_snmp_changes(client, changes, community, v3_conf, max_workers=DEFAULT_MAX_WORKERS, detailed=False):
+    """Write the planned SNMP fields of every device concurrently and return one result per device.
+
+    The update endpoint replaces the whole device, so the SNMP fields are laid
+    over its detail record. detailed says whether the planned devices already
+    are detail records; otherwise each one is fetched before it is written.
+    """
+    device_object = {"deviceSnmpCommunity": community, "deviceSnmpV3Conf": v3_conf}
+
+    def write(change):
+        device, fields, _fingerprints = change
+        update_device(client, device["id"], device_object, fields, device=device if detailed else None)
+        return {"changed": True}
+
+    results = run_concurrently(write, changes, max_workers)
+    for (device, fields, _fingerprints), result in zip(changes, results):
+        result.update(name=device["deviceName"], id=device["id"], changes=fields)
+        result.setdefault("changed", False)
+    return results
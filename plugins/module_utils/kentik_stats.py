@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Per-invocation telemetry of the Kentik API calls a module makes.
+
+When a module is run with api_stats enabled, the client records the method,
+endpoint template, status, latency, retries and bytes of every call, and a
+summary is returned in the module result as api_stats.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import math
+import re
+import threading
+
+# Paths whose variable segments are names rather than ids.
+PATH_TEMPLATES = (
+    (re.compile(r"^/api/v5/device/[^/]+$"), "/api/v5/device/{device}"),
+    (re.compile(r"^/api/v5/batch/customdimensions/[^/]+/populators$"),
+     "/api/v5/batch/customdimensions/{dimension}/populators"),
+)
+_ID_SEGMENT = re.compile(r"^\d+$")
+_GUID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F-]{27,}$")
+LATENCY_DIGITS = 4
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def endpoint_template(path):
+    """Return path with its ids, guids and names replaced by placeholders, so calls to one endpoint group together"""
+    path = path.split("?", 1)[0]
+    for pattern, template in PATH_TEMPLATES:
+        if pattern.match(path):
+            return template
+    segments = []
+    for segment in path.split("/"):
+        if _ID_SEGMENT.match(segment):
+            segment = "{id}"
+        elif _GUID_SEGMENT.match(segment):
+            segment = "{guid}"
+        segments.append(segment)
+    return "/".join(segments)
+
+
+def percentile(values, share):
+    """Return the nearest-rank percentile of a list of numbers, or 0 for an empty list"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(share * len(ordered))) - 1)]
+
+
+def latency_buckets(latencies, bounds=LATENCY_BUCKETS):
+    """Return cumulative histogram counts of latencies keyed by upper bound, ending with +Inf"""
+    buckets = dict((str(bound), sum(1 for latency in latencies if latency <= bound)) for bound in bounds)
+    buckets["+Inf"] = len(latencies)
+    return buckets
+
+
+def _summarize(calls):
+    latencies = [call["latency"] for call in calls]
+    statuses = {}
+    for call in calls:
+        status = str(call["status"] or "error")
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "calls": len(calls),
+        "retries": sum(call["retries"] for call in calls),
+        "errors": sum(1 for call in calls if call["status"] != 200),
+        "statuses": statuses,
+        "latency_total": round(sum(latencies), LATENCY_DIGITS),
+        "latency_p95": round(percentile(latencies, 0.95), LATENCY_DIGITS),
+        "latency_max": round(max(latencies or [0]), LATENCY_DIGITS),
+        "latency_buckets": latency_buckets(latencies),
+        "bytes_sent": sum(call["bytes_sent"] for call in calls),
+        "bytes_received": sum(call["bytes_received"] for call in calls),
+    }
+
+
+class ApiStats(object):
+    """Thread-safe record of the API calls made during one module invocation"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, method, path, status, latency, retries=0, bytes_sent=0, bytes_received=0):
+        """Record one API call, including any retries, with its final status, or None if it never got one"""
+        call = {
+            "method": method,
+            "endpoint": endpoint_template(path),
+            "status": status,
+            "latency": latency,
+            "retries": retries,
+            "bytes_sent": bytes_sent,
+            "bytes_received": bytes_received,
+        }
+        with self.lock:
+            self.calls.append(call)
+
+    def summary(self):
+        """Return the call counts, latencies in seconds and bytes, in total and per endpoint"""
+        with self.lock:
+            calls = list(self.calls)
+        endpoints = {}
+        for call in calls:
+            endpoints.setdefault(f"{call['method']} {call['endpoint']}", []).append(call)
+        summary = _summarize(calls)
+        summary["endpoints"] = dict((key, _summarize(value)) for key, value in sorted(endpoints.items()))
+        return summary
+
+
+def module_api_stats(module):
+    """Return the ApiStats of a module invocation, or None when its api_stats option is off.
+
+    The first call wraps the module's exit_json and fail_json so that every
+    result it returns carries the summary.
+    """
+    if not module.params.get("api_stats"):
+        return None
+    stats = getattr(module, "_kentik_api_stats", None)
+    if stats is None:
+        stats = module._kentik_api_stats = ApiStats()
+        for name in ("exit_json", "fail_json"):
+            setattr(module, name, _reporting(getattr(module, name), stats))
+    return stats
+
+
+def _reporting(method, stats):
+    """Wrap exit_json or fail_json so that the result carries the stats summary"""
+    def report(*args, **kwargs):
+        kwargs.setdefault("api_stats", stats.summary())
+        return method(*args, **kwargs)
+    return report
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Incremental parsing of large Kentik list responses."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import codecs
+import fnmatch
+import json
+
+from urllib.parse import quote
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+
+WHITESPACE = " \t\n\r"
+# Keys the list APIs use to hand back the token for the next page.
+PAGE_TOKEN_KEYS = ("nextPageToken", "next_page_token")
+
+_DECODER = json.JSONDecoder()
+
+
+class _Buffer(object):
+    """Text buffer that is refilled from an iterator of byte chunks on demand"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk to the buffer, returning False once the stream is exhausted"""
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.text += self.decoder.decode(b"", final=True)
+            return False
+        # Drop what has already been consumed so the buffer never holds more than
+        # the value being parsed plus one chunk.
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def grow(self):
+        """Read chunks until the unconsumed text has doubled, returning False if nothing was added.
+
+        Doubling keeps the number of attempts to decode a value that spans
+        many chunks logarithmic in its size rather than linear.
+        """
+        target = 2 * (len(self.text) - self.pos)
+        grown = False
+        while self.fill():
+            grown = True
+            if len(self.text) - self.pos >= target:
+                break
+        return grown
+
+    def peek(self):
+        """Skip whitespace and return the next character, or None at the end of the stream"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        """Consume the next character, which must be char"""
+        found = self.peek()
+        if found != char:
+            raise KentikError(f"Malformed JSON list response: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode and consume the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except ValueError:
+                if self.grow():
+                    continue
+                raise KentikError("Malformed JSON list response: truncated value")
+            # A number or literal that ends exactly at the end of the buffer may
+            # continue in the next chunk, so only trust it once more text follows.
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks, key, extras=None):
+    """Yield the elements of the array stored under key in a JSON object read from an iterator of byte chunks.
+
+    Only one element is held in memory at a time. key may be a tuple naming
+    an array nested in objects, such as ("customDimension", "populators").
+    The other top level members of the object are stored in extras when a
+    dictionary is given.
+    """
+    path = key if isinstance(key, tuple) else (key,)
+    buf = _Buffer(chunks)
+    for element in _iter_object(buf, path, extras):
+        yield element
+
+
+def _iter_object(buf, path, extras):
+    """Yield the elements of the array at path within the object that starts at the buffer position"""
+    buf.expect("{")
+    if buf.peek() == "}":
+        buf.expect("}")
+        return
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == path[0] and len(path) > 1 and buf.peek() == "{":
+            for element in _iter_object(buf, path[1:], None):
+                yield element
+        elif name == path[0] and len(path) == 1 and buf.peek() == "[":
+            buf.expect("[")
+            if buf.peek() != "]":
+                while True:
+                    yield buf.value()
+                    if buf.peek() != ",":
+                        break
+                    buf.expect(",")
+            buf.expect("]")
+        else:
+            value = buf.value()
+            if extras is not None:
+                extras[name] = value
+        if buf.peek() != ",":
+            break
+        buf.expect(",")
+    buf.expect("}")
+
+
+def project(record, fields):
+    """Reduce a record to the given top level fields"""
+    if fields is None:
+        return record
+    return dict((field, record[field]) for field in fields if field in record)
+
+
+def matches_any(value, patterns):
+    """Check whether value matches one of the shell-style patterns, or whether no patterns are given"""
+    if not patterns:
+        return True
+    return any(fnmatch.fnmatchcase(value or "", pattern) for pattern in patterns)
+
+
+def iter_items(client, path, key, api="grpc", fields=None):
+    """Stream every item of a list endpoint, following page tokens, as compact records holding only fields"""
+    page_token = None
+    seen_tokens = set()
+    while True:
+        page_path = path
+        if page_token:
+            separator = "&" if "?" in path else "?"
+            page_path = f"{path}{separator}pageToken={quote(str(page_token))}"
+        extras = {}
+        for item in iter_json_array(client.stream("GET", page_path, api=api), key, extras):
+            yield project(item, fields)
+        page_token = None
+        for token_key in PAGE_TOKEN_KEYS:
+            if extras.get(token_key):
+                page_token = extras[token_key]
+                break
+        if not page_token:
+            return
+        if page_token in seen_tokens:
+            raise KentikError(f"{path} returned page token {page_token} more than once")
+        seen_tokens.add(page_token)
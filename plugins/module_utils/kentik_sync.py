@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Tenant snapshots, offline change planning and concurrent apply shared by the snapshot, plan and bulk modules.
+
+A change is a small dictionary naming the object kind, the action and only
+the fields that differ, which are laid over the current object when an
+update is applied. Sites, plans and labels are referenced by name and
+resolved to ids when the change is applied, so a plan stays valid when it
+creates a site or label that devices in the same plan use.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    DEFAULT_MAX_WORKERS,
+    run_concurrently,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    STREAM_CHUNK_SIZE,
+    KentikError,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    build_device_payload,
+    create_device,
+    delete_device,
+    device_changes,
+    gather_plans,
+    iter_devices,
+    labels_differ,
+    list_plans,
+    resolve_labels,
+    write_device,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import changed_values
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_label_utils import (
+    LABEL_CACHE_ENDPOINTS,
+    build_label_payload,
+    create_label,
+    delete_label,
+    gather_labels,
+    label_changes,
+    list_labels,
+    update_label,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (
+    build_site_payload,
+    create_site,
+    delete_site,
+    gather_sites,
+    list_sites,
+    site_changes,
+    update_site,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import iter_json_array
+
+SNAPSHOT_VERSION = 1
+PLAN_VERSION = 1
+KINDS = ("labels", "sites", "devices")
+ACTIONS = ("create", "update", "delete", "none")
+# Stands in for the id of a site or label the plan itself creates.
+PENDING_ID = 0
+# Reference-data cache entries to drop after changing objects of each kind.
+CACHE_ENDPOINTS = {"labels": LABEL_CACHE_ENDPOINTS, "sites": ("sites",)}
+# Keys of a change that only the apply step needs.
+PAYLOAD_KEYS = ("object", "site", "plan", "labels")
+
+
+def write_snapshot(client, dest):
+    """Write every label, site, plan and device in the tenant to dest and return the number of each.
+
+    Devices are streamed from the API to the file one at a time and written
+    last, so neither taking nor reading a snapshot holds the device list in
+    memory. The file is replaced atomically.
+    """
+    dest = os.path.abspath(os.path.expanduser(dest))
+    counts = {}
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as snapshot:
+            header = {"version": SNAPSHOT_VERSION, "region": client.region, "created": time.time()}
+            for kind, items in (("labels", list_labels(client)), ("sites", list_sites(client)), ("plans", list_plans(client))):
+                header[kind] = items
+                counts[kind] = len(items)
+            snapshot.write(json.dumps(header)[:-1])
+            snapshot.write(', "devices": [')
+            counts["devices"] = 0
+            for device in iter_devices(client):
+                if counts["devices"]:
+                    snapshot.write(", ")
+                snapshot.write(json.dumps(device))
+                counts["devices"] += 1
+            snapshot.write("]}\n")
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logging.info("Wrote snapshot of %d devices to %s", counts["devices"], dest)
+    return counts
+
+
+def read_snapshot(path, device_names=None):
+    """Read a snapshot written by write_snapshot.
+
+    When device_names is given, only those devices are kept whole and the
+    rest are reduced to their id and name, which is all pruning needs.
+    """
+    snapshot = {}
+    devices = []
+    try:
+        with open(os.path.expanduser(path), "rb") as snapshot_file:
+            chunks = iter(lambda: snapshot_file.read(STREAM_CHUNK_SIZE), b"")
+            for device in iter_json_array(chunks, "devices", snapshot):
+                if device_names is not None and device["deviceName"] not in device_names:
+                    device = {"id": device["id"], "deviceName": device["deviceName"]}
+                devices.append(device)
+    except (IOError, OSError) as exc:
+        raise KentikError(f"Unable to read snapshot {path}: {to_text(exc)}")
+    except ValueError as exc:
+        raise KentikError(f"Snapshot {path} is not valid JSON: {to_text(exc)}")
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise KentikError(f"Snapshot {path} has unsupported version {snapshot.get('version')}")
+    snapshot["devices"] = devices
+    return snapshot
+
+
+def _change(kind, name, action="none", **extra):
+    """Return a new change entry"""
+    change = {"kind": kind, "name": name, "action": action, "changed": False}
+    change.update(extra)
+    return change
+
+
+def plan_label_changes(desired, remote_labels, prune=False):
+    """Compare the desired labels to the tenant's labels and return the changes to make"""
+    remote_by_name = dict((label["name"], label) for label in remote_labels)
+    changes = []
+    for params in desired:
+        remote = remote_by_name.get(params["name"])
+        change = _change("labels", params["name"])
+        if remote is not None:
+            change["id"] = remote["id"]
+        if params["state"] == "absent":
+            if remote is not None:
+                change["action"] = "delete"
+        elif remote is None:
+            change["action"] = "create"
+            change["object"] = build_label_payload(params)
+        else:
+            label_object = build_label_payload(params)
+            fields = label_changes(remote, label_object)
+            if fields:
+                change["action"] = "update"
+                change["changes"] = fields
+                change["object"] = label_object
+        changes.append(change)
+    if prune:
+        seen = set(params["name"] for params in desired)
+        for name, remote in remote_by_name.items():
+            if name not in seen:
+                changes.append(_change("labels", name, "delete", id=remote["id"]))
+    return changes
+
+
+def plan_site_changes(desired, remote_sites, prune=False):
+    """Compare the desired sites to the tenant's sites and return the changes to make"""
+    remote_by_title = dict((site["title"], site) for site in remote_sites)
+    changes = []
+    for params in desired:
+        remote = remote_by_title.get(params["title"])
+        change = _change("sites", params["title"])
+        if remote is not None:
+            change["id"] = remote["id"]
+        if params["state"] == "absent":
+            if remote is not None:
+                change["action"] = "delete"
+        elif remote is None:
+            change["action"] = "create"
+            change["object"] = build_site_payload(params)
+        else:
+            site_object = build_site_payload(params)
+            fields = site_changes(remote, site_object)
+            if fields:
+                change["action"] = "update"
+                change["changes"] = fields
+                change["object"] = changed_values(site_object, fields)
+        changes.append(change)
+    if prune:
+        seen = set(params["title"] for params in desired)
+        for title, remote in remote_by_title.items():
+            if title not in seen:
+                changes.append(_change("sites", title, "delete", id=remote["id"]))
+    return changes
+
+
+def plan_device_changes(desired, remote_devices, label_dict, site_dict, plan_dict, prune=False):
+    """Compare the desired devices to the tenant's devices and return the changes to make.
+
+    Sites and labels that another part of the plan creates should be present
+    in site_dict and label_dict with PENDING_ID as their id.
+    """
+    remote_by_name = dict((device["deviceName"], device) for device in remote_devices)
+    changes = []
+    for params in desired:
+        name = params["deviceName"]
+        remote = remote_by_name.get(name)
+        change = _change("devices", name)
+        if remote is not None:
+            change["id"] = remote["id"]
+        if params["state"] == "absent":
+            if remote is not None:
+                change["action"] = "delete"
+            changes.append(change)
+            continue
+        try:
+            device_object = build_device_payload(params, site_dict, plan_dict)
+            label_ids = resolve_labels(params["labels"], label_dict) if params["labels"] else None
+        except KentikError as exc:
+            change.update(failed=True, msg=to_text(exc))
+            changes.append(change)
+            continue
+        if remote is None:
+            fields = list(device_object)
+            if label_ids:
+                fields.append("labels")
+            change["action"] = "create"
+            change["site"] = params["siteName"]
+        else:
+            fields = device_changes(remote, device_object, params["updateSnmpAuth"])
+            if label_ids is not None and labels_differ(remote, label_ids):
+                fields.append("labels")
+            if not fields:
+                changes.append(change)
+                continue
+            change["action"] = "update"
+            change["changes"] = fields
+            if "siteId" in fields:
+                change["site"] = params["siteName"]
+        if "labels" in fields:
+            change["labels"] = sorted(label for label in params["labels"] if label)
+        change["plan"] = params["planName"]
+        # Site and plan ids are resolved from their names when the change is applied.
+        change["object"] = dict(
+            (key, value) for key, value in changed_values(device_object, fields).items()
+            if key not in ("siteId", "planId")
+        )
+        changes.append(change)
+    if prune:
+        seen = set(params["deviceName"] for params in desired)
+        for name, remote in remote_by_name.items():
+            if name not in seen:
+                changes.append(_change("devices", name, "delete", id=remote["id"]))
+    return changes
+
+
+def pending_names(changes):
+    """Return the names of the objects a list of changes creates"""
+    return [change["name"] for change in changes if change["action"] == "create"]
+
+
+def plan_from_snapshot(snapshot, labels=None, sites=None, devices=None, prune=()):
+    """Diff the desired labels, sites and devices against a snapshot and return the plan"""
+    label_changes = plan_label_changes(labels or [], snapshot["labels"], "labels" in prune)
+    site_changes_ = plan_site_changes(sites or [], snapshot["sites"], "sites" in prune)
+    device_changes_ = []
+    if devices or "devices" in prune:
+        label_dict = dict((label["name"], label["id"]) for label in snapshot["labels"])
+        label_dict.update((name, PENDING_ID) for name in pending_names(label_changes))
+        site_dict = dict((site["title"], site["id"]) for site in snapshot["sites"])
+        site_dict.update((name, PENDING_ID) for name in pending_names(site_changes_))
+        plan_dict = dict((plan["name"], plan["id"]) for plan in snapshot["plans"])
+        device_changes_ = plan_device_changes(
+            devices or [], snapshot["devices"], label_dict, site_dict, plan_dict, "devices" in prune
+        )
+    changes = label_changes + site_changes_ + device_changes_
+    return {
+        "version": PLAN_VERSION,
+        "snapshot_created": snapshot.get("created"),
+        "changes": [change for change in changes if change["action"] != "none" or change.get("failed")],
+        "summary": summarize(changes),
+    }
+
+
+def summarize(changes):
+    """Count the changes per kind and action"""
+    summary = dict((kind, dict((action, 0) for action in ACTIONS + ("failed",))) for kind in KINDS)
+    for change in changes:
+        counts = summary[change["kind"]]
+        counts[change["action"]] += 1
+        if change.get("failed"):
+            counts["failed"] += 1
+    return summary
+
+
+def change_result(change):
+    """Return the part of a change or change result that is reported back to the user"""
+    return dict((key, value) for key, value in change.items() if key not in PAYLOAD_KEYS)
+
+
+def _resolve(names, name, kind):
+    """Return the id of a named site or plan, failing when the tenant does not have it"""
+    if name not in names:
+        raise KentikError(f"{kind} {name} does not exist.")
+    return int(names[name])
+
+
+def apply_label_change(client, change):
+    """Apply a single label change and return its result"""
+    result = {"kind": "labels", "name": change["name"], "action": change["action"], "changed": True}
+    if change["action"] == "create":
+        result["id"] = create_label(client, change["object"])
+    elif change["action"] == "update":
+        result["id"] = update_label(client, change["id"], change["object"])
+        result["changes"] = change["changes"]
+    elif change["action"] == "delete":
+        delete_label(client, change["id"])
+        result["id"] = change["id"]
+    return result
+
+
+def apply_site_change(client, change):
+    """Apply a single site change and return its result"""
+    result = {"kind": "sites", "name": change["name"], "action": change["action"], "changed": True}
+    if change["action"] == "create":
+        result["id"] = create_site(client, change["object"])
+    elif change["action"] == "update":
+        result["id"] = update_site(client, change["id"], change["object"])
+        result["changes"] = change["changes"]
+    elif change["action"] == "delete":
+        delete_site(client, change["id"])
+        result["id"] = change["id"]
+    return result
+
+
+def apply_device_change(client, change, references):
+    """Apply a single device change and return its result"""
+    result = {"kind": "devices", "name": change["name"], "action": change["action"], "changed": True}
+    if change["action"] == "delete":
+        delete_device(client, change["id"])
+        result["id"] = change["id"]
+        return result
+    device_object = dict(change["object"], planId=_resolve(references["plans"], change["plan"], "Plan"))
+    if "site" in change:
+        device_object["siteId"] = _resolve(references["sites"], change["site"], "Site")
+    label_ids = None
+    if "labels" in change:
+        label_ids = resolve_labels(change["labels"], references["labels"])
+    if change["action"] == "create":
+        device_id = create_device(client, device_object, label_ids)
+    else:
+        device_id = write_device(client, change["id"], device_object, change["changes"], label_ids)
+        result["changes"] = change["changes"]
+    result["id"] = device_id
+    return result
+
+
+def _references(client, cache, device_changes_):
+    """Load the label, site and plan name to id maps the device changes refer to"""
+    references = {}
+    loaders = (("labels", "labels", gather_labels), ("sites", "site", gather_sites), ("plans", "plan", gather_plans))
+    for kind, key, loader in loaders:
+        if any(key in change for change in device_changes_):
+            references[kind] = cache.get(kind, lambda loader=loader: loader(client))
+    return references
+
+
+def _cache_endpoints(changes):
+    """Return the reference-data cache entries made stale by a list of changes"""
+    endpoints = set()
+    for change in changes:
+        endpoints.update(CACHE_ENDPOINTS[change["kind"]])
+    return sorted(endpoints)
+
+
+def apply_changes(client, cache, changes, max_workers=DEFAULT_MAX_WORKERS):
+    """Apply a list of changes and return one result per change, in the same order.
+
+    Changes run in three phases so that dependencies exist when they are
+    needed: label and site creates and updates first, then every device
+    change, then site and label deletes. Each phase runs concurrently.
+    """
+    changes = [change for change in changes if change["action"] != "none" and not change.get("failed")]
+    first = [change for change in changes if change["kind"] != "devices" and change["action"] != "delete"]
+    devices = [change for change in changes if change["kind"] == "devices"]
+    last = [change for change in changes if change["kind"] != "devices" and change["action"] == "delete"]
+
+    def apply_reference_change(change):
+        if change["kind"] == "labels":
+            return apply_label_change(client, change)
+        return apply_site_change(client, change)
+
+    results = {}
+    phase = run_concurrently(apply_reference_change, first, max_workers)
+    results.update(zip(map(id, first), phase))
+    if first:
+        cache.invalidate(*_cache_endpoints(first))
+    if devices:
+        try:
+            references = _references(client, cache, devices)
+        except KentikError as exc:
+            failure = {"failed": True, "msg": to_text(exc), "status_code": getattr(exc, "status_code", None)}
+            phase = [dict(failure) for change in devices]
+        else:
+            phase = run_concurrently(lambda change: apply_device_change(client, change, references), devices, max_workers)
+        results.update(zip(map(id, devices), phase))
+    phase = run_concurrently(apply_reference_change, last, max_workers)
+    results.update(zip(map(id, last), phase))
+    if last:
+        cache.invalidate(*_cache_endpoints(last))
+
+    applied = []
+    for change in changes:
+        result = results[id(change)]
+        for key in ("kind", "name", "action", "id"):
+            if key in change:
+                result.setdefault(key, change[key])
+        result.setdefault("changed", False)
+        applied.append(result)
+    return applied
+
+
+def sync(client, cache, changes, check_mode=False, max_workers=DEFAULT_MAX_WORKERS):
+    """Apply the changes that are needed, or only report them in check mode, and return one result per change"""
+    pending = [change for change in changes if change["action"] != "none" and not change.get("failed")]
+    logging.info("%d of %d objects need changes", len(pending), len(changes))
+    if check_mode:
+        applied = [dict(change, changed=True) for change in pending]
+    else:
+        applied = apply_changes(client, cache, pending, max_workers)
+    applied_by_change = dict(zip(map(id, pending), applied))
+    return [change_result(applied_by_change.get(id(change), change)) for change in changes]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Run a bulk module against several Kentik regions and accounts at once.
+
+Every target gets its own client, so its own pooled connections and rate
+limiter, and its own reference-data cache namespace. Targets sync
+concurrently and a target that fails is reported without affecting the
+others.
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import logging
+
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import ReferenceCache
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikClient,
+    KentikError,
+    kentik_argument_spec,
+)
+
+# Passed to AnsibleModule by the modules that accept targets.
+TARGETS_MODULE_OPTIONS = dict(
+    required_one_of=[("email", "targets")],
+    required_together=[("email", "token")],
+    mutually_exclusive=[("email", "targets"), ("token", "targets")],
+)
+
+
+def kentik_targets_argument_spec():
+    """Return the authentication options of the modules that accept a list of targets"""
+    spec = kentik_argument_spec()
+    spec["email"]["required"] = False
+    spec["token"]["required"] = False
+    spec["targets"] = dict(
+        type="list",
+        required=False,
+        elements="dict",
+        options=dict(
+            name=dict(type="str", required=False),
+            email=dict(type="str", required=True),
+            token=dict(type="str", no_log=True, required=True),
+            region=dict(type="str", required=False, default="US", choices=["US", "EU"]),
+        ),
+    )
+    return spec
+
+
+def module_targets(module):
+    """Return the targets set on a module, each with a name that defaults to its email and region"""
+    targets = []
+    for target in module.params["targets"] or []:
+        target = dict(target)
+        target["name"] = target["name"] or f"{target['email']} ({target['region']})"
+        targets.append(target)
+    names = [target["name"] for target in targets]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        module.fail_json(msg=f"Targets are listed more than once: {', '.join(duplicates)}")
+    return targets
+
+
+def sum_summaries(summaries):
+    """Add up the per-action counts of several summaries"""
+    total = {}
+    for summary in summaries:
+        for key, count in summary.items():
+            total[key] = total.get(key, 0) + count
+    return total
+
+
+def _run_target(module, worker, target):
+    """Run worker against one target and return its result, recording a KentikError as a failure"""
+    client = KentikClient.from_module(module, target)
+    cache = ReferenceCache.from_module(module, target)
+    try:
+        result = worker(client, cache)
+    except KentikError as exc:
+        result = {"failed": True, "msg": to_text(exc), "status_code": getattr(exc, "status_code", None)}
+    result.setdefault("changed", False)
+    result.setdefault("failed", False)
+    result.update(name=target["name"], email=target["email"], region=target["region"])
+    logging.info("Target %s finished, changed=%s failed=%s", target["name"], result["changed"], result["failed"])
+    return result
+
+
+def run_targets(module, worker):
+    """Call worker(client, cache) for every target and exit the module with the outcome.
+
+    worker returns the result of one target: the keys the module returns,
+    with failed and msg set when some of its objects failed. Without targets
+    it runs once against the account set by email and token and its result is
+    returned as is. With targets they run concurrently and the module returns
+    every result under targets, along with changed and the summaries added up.
+    """
+    targets = module_targets(module)
+    if not targets:
+        client = KentikClient.from_module(module)
+        cache = ReferenceCache.from_module(module)
+        try:
+            result = worker(client, cache)
+        except KentikError as exc:
+            module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+        if result.pop("failed", False):
+            module.fail_json(**result)
+        module.exit_json(**result)
+
+    # Imported here so that modules run against a single account start faster.
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        results = list(executor.map(lambda target: _run_target(module, worker, target), targets))
+    changed = any(result["changed"] for result in results)
+    summary = sum_summaries(result["summary"] for result in results if "summary" in result)
+    failed = [result["name"] for result in results if result["failed"]]
+    if failed:
+        module.fail_json(
+            msg=f"{len(failed)} of {len(results)} target(s) failed: {', '.join(failed)}",
+            changed=changed,
+            targets=results,
+            summary=summary,
+        )
+    module.exit_json(changed=changed, targets=results, summary=summary)
@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_batch
+short_description: Load custom dimension populators or flow tags through the Kentik batch API
+version_added: "1.2.0"
+description:
+- Splits the entries into parts small enough for the batch API, submits them concurrently and waits for every
+  batch to complete, polling with a growing delay.
+- With I(replace_all), every part is sent as part of a single multi-part batch, so the existing entries are only
+  replaced once the whole set has arrived.
+- Without I(replace_all), each part is sent as its own batch.
+- With I(incremental), the existing populators of the dimension are fetched and compared with I(upserts) by a
+  hash of every value's criteria, and only the values that were added, changed or removed are sent.
+options:
+    target:
+        description: Whether to load the populators of a custom dimension or flow tags.
+        type: str
+        choices: [populators, tags]
+        default: populators
+    dimension:
+        description: The name of the custom dimension, for example C(c_customer). Required when I(target=populators).
+        type: str
+    upserts:
+        description:
+        - The populators or tags to add or update, in the format the batch API expects.
+        - Reference Kentik API Documentation for exact dictionary format.
+        - Populators that share a value are merged into one with all of their criteria, since the batch API
+          replaces every criterion of a value it upserts.
+        type: list
+        elements: dict
+        default: []
+    deletes:
+        description:
+        - The populators or tags to remove, in the format the batch API expects.
+        type: list
+        elements: dict
+        default: []
+    replace_all:
+        description: Remove every existing entry that is not in I(upserts).
+        type: bool
+        default: false
+    incremental:
+        description:
+        - Treat I(upserts) as the complete set of populators of the dimension, and only send the values that differ
+          from the ones it already holds, along with deletes for the values that are not in I(upserts).
+        - Only supported when I(target=populators). I(replace_all) and I(deletes) are ignored.
+        type: bool
+        default: false
+    chunk_size:
+        description:
+        - The maximum number of entries sent in one request.
+        - Parts are also kept under 2 MB, so a part may hold fewer entries.
+        type: int
+        default: 10000
+    wait:
+        description: Wait for every batch to be applied before returning.
+        type: bool
+        default: true
+    wait_timeout:
+        description: How many seconds to wait for the batches to be applied.
+        type: int
+        default: 1800
+    max_workers:
+        description: The maximum number of requests in flight at once.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Replace the populators of the customer dimension
+  kentik.kentik_config.kentik_batch:
+    dimension: c_src_customer
+    replace_all: true
+    upserts:
+      - value: customer_a
+        criteria:
+          - direction: SRC
+            addr: ["192.0.2.0/24"]
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Send only the populators that differ from the ones the dimension holds
+  kentik.kentik_config.kentik_batch:
+    dimension: c_src_customer
+    incremental: true
+    upserts: "{{ customer_populators }}"
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+batches:
+    description: One entry per batch with its guid, the number of parts and entries sent and its last status.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - guid: 8de2e3a6-9a31-4c29-9a1e-0b8f0c1f8c3e
+        parts: 3
+        upserts: 25000
+        deletes: 0
+        status: {"is_complete": true, "upsert": {"applied": 25000, "invalid": 0}}
+summary:
+    description: The counts of all batches added up.
+    type: dict
+    returned: always
+    sample: {"batches": 1, "parts": 3, "upserts": 25000, "deletes": 0, "upserts_applied": 25000, "upserts_invalid": 0,
+             "deletes_applied": 0, "deletes_unapplied": 0, "incomplete": 0, "failed": 0}
+delta:
+    description: The number of values sent as upserts and deletes and the number left unchanged.
+    type: dict
+    returned: when I(incremental=true)
+    sample: {"upserts": 12, "deletes": 1, "unchanged": 24988}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_batch import (
+    BATCH_TARGETS,
+    batch_argument_spec,
+    batch_path,
+    iter_chunks,
+    run_batches,
+    summarize_batches,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_populators import (
+    delta_deletes,
+    diff_indexes,
+    index_dimension,
+    index_upserts,
+    merge_upserts,
+)
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        target=dict(type="str", required=False, default="populators", choices=list(BATCH_TARGETS)),
+        dimension=dict(type="str", required=False),
+        upserts=dict(type="list", required=False, default=[], elements="dict"),
+        deletes=dict(type="list", required=False, default=[], elements="dict"),
+        replace_all=dict(type="bool", required=False, default=False),
+        incremental=dict(type="bool", required=False, default=False),
+    )
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(batch_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_if=[("target", "populators", ("dimension",))],
+        supports_check_mode=True,
+    )
+    params = module.params
+    if params["incremental"] and params["target"] != "populators":
+        module.fail_json(msg="incremental is only supported for custom dimension populators")
+    path = batch_path(params["target"], params["dimension"])
+    upserts = params["upserts"]
+    if params["target"] == "populators":
+        upserts = merge_upserts(upserts)
+    deletes = params["deletes"]
+    replace_all = params["replace_all"]
+    extra = {}
+    client = None
+    if params["incremental"]:
+        client = KentikClient.from_module(module)
+        try:
+            existing = index_dimension(client, params["dimension"])
+        except KentikError as exc:
+            module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+        changed_values, delete_values, unchanged = diff_indexes(index_upserts(upserts), existing)
+        upserts = [populator for populator in upserts if populator["value"] in changed_values]
+        deletes = delta_deletes(delete_values)
+        replace_all = False
+        extra["delta"] = {"upserts": len(changed_values), "deletes": len(delete_values), "unchanged": unchanged}
+    chunks = iter_chunks(upserts, deletes, params["chunk_size"])
+    if not (upserts or deletes or replace_all):
+        module.exit_json(changed=False, batches=[], summary=summarize_batches([]), **extra)
+    if module.check_mode:
+        batches = [dict(parts=1, upserts=len(chunk["upserts"]), deletes=len(chunk["deletes"])) for chunk in chunks]
+        module.exit_json(changed=True, batches=batches, summary=summarize_batches(batches), **extra)
+
+    client = client or KentikClient.from_module(module)
+    try:
+        batches, summary = run_batches(
+            client,
+            path,
+            chunks,
+            replace_all=replace_all,
+            max_workers=params["max_workers"],
+            wait_for_completion=params["wait"],
+            timeout=params["wait_timeout"],
+        )
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+    if summary["failed"] or summary["incomplete"]:
+        module.fail_json(
+            msg=f"{summary['failed']} batch(es) failed and {summary['incomplete']} did not complete in time",
+            changed=True,
+            batches=batches,
+            summary=summary,
+            **extra
+        )
+    module.exit_json(changed=True, batches=batches, summary=summary, **extra)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_custom_dimension_populators
+short_description: Load a customer to IP address list into source and destination custom dimensions
+version_added: "1.2.0"
+description:
+- Reads a CSV file with the columns C(customer), C(ip_address) and optionally C(port) and C(ip_version) one row
+  at a time and builds the source and destination populators for every customer in a single pass.
+- All the rows of a customer become one populator with one criterion per port, whatever their order in the file.
+  Large files are sorted by customer in bounded runs spilled to temporary files.
+- The populators are uploaded through the batch API in bounded parts while the file is still being read, and the
+  source and destination dimensions are loaded concurrently, so memory use does not grow with the size of the list.
+- If reading the file or loading either dimension fails, the other load is abandoned before it completes, so a
+  I(replace_all) load never replaces a dimension with part of the list.
+- With I(incremental), the existing populators of each dimension are fetched and indexed by a hash of every
+  customer's criteria, and only the customers that were added, changed or removed are sent. The file is read
+  twice, once to hash it and once to send the changed customers.
+options:
+    src:
+        description: The path of the CSV file on the host that runs the module.
+        type: path
+        required: true
+    src_dimension:
+        description: The name of the custom dimension that maps source addresses to customers, for example C(c_src_customer).
+        type: str
+    dst_dimension:
+        description: The name of the custom dimension that maps destination addresses to customers, for example C(c_dst_customer).
+        type: str
+    replace_all:
+        description: Replace every existing populator of the dimensions with the ones built from I(src).
+        type: bool
+        default: true
+    incremental:
+        description:
+        - Only send the customers whose populators differ from the ones the dimensions already hold, and delete the
+          customers that are no longer in I(src).
+        - The result is the same as a I(replace_all) load, so I(replace_all) is ignored.
+        type: bool
+        default: false
+    max_addresses:
+        description: The maximum number of addresses in one populator. Longer runs of rows are split.
+        type: int
+        default: 1000
+    chunk_size:
+        description:
+        - The maximum number of populators sent in one request.
+        - Parts are also kept under 2 MB, so a part may hold fewer populators.
+        type: int
+        default: 10000
+    wait:
+        description: Wait for every batch to be applied before returning.
+        type: bool
+        default: true
+    wait_timeout:
+        description: How many seconds to wait for the batches to be applied.
+        type: int
+        default: 1800
+    max_workers:
+        description: The maximum number of requests in flight at once for each dimension.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Load the customer list into the source and destination customer dimensions
+  kentik.kentik_config.kentik_custom_dimension_populators:
+    src: files/private_customer_list.csv
+    src_dimension: c_src_customer
+    dst_dimension: c_dst_customer
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Send only the customers that changed since the last load
+  kentik.kentik_config.kentik_custom_dimension_populators:
+    src: files/private_customer_list.csv
+    src_dimension: c_src_customer
+    dst_dimension: c_dst_customer
+    incremental: true
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+rows:
+    description: The number of rows read from I(src), and how many were skipped because the customer or address was empty.
+    type: dict
+    returned: always
+    sample: {"rows": 1000000, "skipped": 0, "populators": 52000}
+dimensions:
+    description:
+    - The batches and summary of every dimension that was loaded, keyed by direction.
+    - With I(incremental), also the number of customers sent as upserts and deletes and the number left unchanged.
+    type: dict
+    returned: always
+    sample:
+      SRC:
+        dimension: c_src_customer
+        summary: {"batches": 1, "parts": 6, "upserts": 52000, "upserts_applied": 52000, "failed": 0, "incomplete": 0}
+        delta: {"upserts": 12, "deletes": 1, "unchanged": 51988}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_batch import (
+    batch_argument_spec,
+    batch_path,
+    iter_chunks,
+    run_batches,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_populators import (
+    DEFAULT_MAX_ADDRESSES,
+    DIRECTIONS,
+    delta_deletes,
+    diff_indexes,
+    fan_out,
+    index_dimensions,
+    index_upsert,
+    iter_address_groups,
+    iter_csv_rows,
+    iter_populator_pairs,
+    log_stats,
+)
+
+
+def plan_delta(client, targets, items):
+    """Hash the customer list and the existing populators and return the values to upsert and delete per target"""
+    desired = [{} for _target in targets]
+    for item in items:
+        for index, populator in zip(desired, item):
+            index_upsert(index, populator)
+    existing = index_dimensions(client, [dimension for _index, _direction, dimension in targets])
+    return [diff_indexes(wanted, found) for wanted, found in zip(desired, existing)]
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        src=dict(type="path", required=True),
+        src_dimension=dict(type="str", required=False),
+        dst_dimension=dict(type="str", required=False),
+        replace_all=dict(type="bool", required=False, default=True),
+        incremental=dict(type="bool", required=False, default=False),
+        max_addresses=dict(type="int", required=False, default=DEFAULT_MAX_ADDRESSES),
+    )
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(batch_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_one_of=[("src_dimension", "dst_dimension")],
+        supports_check_mode=True,
+    )
+    params = module.params
+    # Position of each loaded direction in the populator pairs, and its dimension.
+    targets = [
+        (index, direction, params[f"{direction.lower()}_dimension"])
+        for index, direction in enumerate(DIRECTIONS)
+        if params[f"{direction.lower()}_dimension"]
+    ]
+    stats = {"rows": 0, "skipped": 0, "populators": 0}
+
+    def pairs_for_targets():
+        """Read the file and yield the populators of every loaded direction for each customer"""
+        pairs = iter_populator_pairs(
+            iter_address_groups(iter_csv_rows(params["src"], stats), params["max_addresses"]), stats
+        )
+        return (tuple(pair[index] for index, _direction, _dimension in targets) for pair in pairs)
+
+    def read(items):
+        """Run a pass over the file, failing the module on a read error"""
+        try:
+            return items()
+        except KentikError as exc:
+            module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None), rows=stats)
+
+    def dimension_results(results=None, deltas=None):
+        dimensions = {}
+        for position, (_index, direction, dimension) in enumerate(targets):
+            dimensions[direction] = {"dimension": dimension}
+            if results and results[position] is not None:
+                batches, summary = results[position]
+                dimensions[direction].update(batches=batches, summary=summary)
+            if deltas:
+                upserts, deletes, unchanged = deltas[position]
+                dimensions[direction]["delta"] = {
+                    "upserts": len(upserts),
+                    "deletes": len(deletes),
+                    "unchanged": unchanged,
+                }
+        return dimensions
+
+    deltas = None
+    if params["incremental"]:
+        client = KentikClient.from_module(module)
+        deltas = read(lambda: plan_delta(client, targets, pairs_for_targets()))
+        changed = any(upserts or deletes for upserts, deletes, _unchanged in deltas)
+        if module.check_mode or not changed:
+            log_stats(stats)
+            module.exit_json(changed=changed, rows=stats, dimensions=dimension_results(deltas=deltas))
+        # The file is read again to send the changed customers, so count it once.
+        stats.update(rows=0, skipped=0, populators=0)
+    elif module.check_mode:
+        read(lambda: sum(1 for _item in pairs_for_targets()))
+        log_stats(stats)
+        module.exit_json(
+            changed=stats["populators"] > 0 or params["replace_all"], rows=stats, dimensions=dimension_results()
+        )
+    else:
+        client = KentikClient.from_module(module)
+
+    def loader(dimension, delta=None):
+        def load(populators):
+            deletes = ()
+            if delta is not None:
+                upserts, delete_values, _unchanged = delta
+                populators = (populator for populator in populators if populator["value"] in upserts)
+                deletes = delta_deletes(delete_values)
+            return run_batches(
+                client,
+                batch_path("populators", dimension),
+                iter_chunks(populators, deletes, chunk_size=params["chunk_size"]),
+                replace_all=params["replace_all"] and delta is None,
+                max_workers=params["max_workers"],
+                wait_for_completion=params["wait"],
+                timeout=params["wait_timeout"],
+            )
+        return load
+
+    # Only the dimensions with something to send are loaded.
+    loaded = [
+        position for position in range(len(targets)) if deltas is None or deltas[position][0] or deltas[position][1]
+    ]
+    items = (tuple(item[position] for position in loaded) for item in pairs_for_targets())
+    consumers = [loader(targets[position][2], deltas and deltas[position]) for position in loaded]
+    try:
+        loads = fan_out(items, consumers)
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None), rows=stats)
+    log_stats(stats)
+    results = [None] * len(targets)
+    for position, load in zip(loaded, loads):
+        results[position] = load
+    dimensions = dimension_results(results, deltas)
+    failed = sum(
+        result["summary"]["failed"] + result["summary"]["incomplete"]
+        for result in dimensions.values()
+        if "summary" in result
+    )
+    if failed:
+        module.fail_json(
+            msg=f"{failed} batch(es) failed or did not complete in time",
+            changed=True,
+            rows=stats,
+            dimensions=dimensions,
+        )
+    module.exit_json(changed=True, rows=stats, dimensions=dimensions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_device_info
+short_description: Gather information about devices in Kentik
+version_added: "1.2.0"
+description:
+- Returns the devices in the Kentik tenant that match every filter given.
+- Devices are streamed from the API and filtered one at a time, so only the matching devices are held in memory.
+- Use I(fields) to keep registered results and fact caches small on large tenants.
+options:
+    names:
+        description: Shell-style patterns, such as C(edge-*), that the device name must match one of.
+        type: list
+        elements: str
+    sites:
+        description: Only return devices assigned to one of these sites.
+        type: list
+        elements: str
+    labels:
+        description: Only return devices that carry at least one of these labels.
+        type: list
+        elements: str
+    subtypes:
+        description: Only return devices of one of these subtypes.
+        type: list
+        elements: str
+        choices: [ router, host-nprobe-dns-www, aws-subnet, azure_subnet, cisco_asa, gcp-subnet, istio_beta, open_nms, paloalto, silverpeak ]
+    fields:
+        description:
+        - The top level device fields to return, for example C([id, deviceName, sendingIps]).
+        - Every field is returned when this is not set.
+        type: list
+        elements: str
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Get the name and sending IPs of every edge router in Seattle
+  kentik.kentik_config.kentik_device_info:
+    names: ["edge-*"]
+    sites: [Seattle]
+    subtypes: [router]
+    fields: [id, deviceName, sendingIps]
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+  register: edge_routers
+"""
+
+RETURN = r"""
+devices:
+    description: The matching devices, reduced to I(fields) when it is set.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - id: "12345"
+        deviceName: edge-sea-01
+        sendingIps: ["192.0.2.10"]
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    DEVICE_SUBTYPES,
+    device_matches,
+    iter_devices,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import project
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        names=dict(type="list", required=False, elements="str"),
+        sites=dict(type="list", required=False, elements="str"),
+        labels=dict(type="list", required=False, elements="str"),
+        subtypes=dict(type="list", required=False, elements="str", choices=DEVICE_SUBTYPES),
+        fields=dict(type="list", required=False, elements="str"),
+    )
+    argument_spec.update(kentik_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+    params = module.params
+    client = KentikClient.from_module(module)
+    try:
+        devices = [
+            project(device, params["fields"])
+            for device in iter_devices(client)
+            if device_matches(device, params["names"], params["sites"], params["labels"], params["subtypes"])
+        ]
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+    module.exit_json(changed=False, devices=devices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_device_labels
+short_description: Assign labels to many Kentik devices at once
+version_added: "1.2.0"
+description:
+- Applies a list of label assignments to every device they select, for example to re-label devices after a
+  change of label taxonomy.
+- The device list is read once and the devices are grouped by the set of labels they should end with. Only the
+  devices whose labels change are updated, concurrently with a bounded number of workers.
+- A device that fails to update is reported without stopping the others.
+options:
+    assignments:
+        description: The assignments to apply, in order, so that a later one sees the labels an earlier one set.
+        type: list
+        elements: dict
+        required: true
+        suboptions:
+            names:
+                description: Shell-style patterns, such as C(edge-*), that the device name must match one of.
+                type: list
+                elements: str
+            sites:
+                description: Only select devices assigned to one of these sites.
+                type: list
+                elements: str
+            has_labels:
+                description: Only select devices that carry at least one of these labels.
+                type: list
+                elements: str
+            subtypes:
+                description: Only select devices of one of these subtypes.
+                type: list
+                elements: str
+            labels:
+                description: The names of the labels to apply.
+                type: list
+                elements: str
+                required: true
+            action:
+                description:
+                - Whether I(labels) replace the labels of the selected devices, are added to them or are removed
+                  from them.
+                type: str
+                choices: [replace, add, remove]
+                default: replace
+    max_workers:
+        description: The maximum number of label updates in flight at once.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik.targets
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Move every device from the old region labels to the new ones
+  kentik.kentik_config.kentik_device_labels:
+    assignments:
+      - has_labels: [us-west]
+        labels: [us-west]
+        action: remove
+      - has_labels: [us-west]
+        labels: [amer, amer-west]
+        action: add
+    max_workers: 16
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Label every edge router in Seattle
+  kentik.kentik_config.kentik_device_labels:
+    assignments:
+      - names: ["edge-*"]
+        sites: [Seattle]
+        labels: [edge]
+        action: add
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+"""
+
+RETURN = r"""
+groups:
+    description: The devices whose labels change, grouped by the labels they end with.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - labels: [amer, amer-west]
+        devices: [edge-sea-01, edge-sea-02]
+devices:
+    description: The outcome of every device update.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - name: edge-sea-01
+        id: "12345"
+        changed: true
+summary:
+    description: The number of devices updated, left unchanged and failed, added up over every target.
+    type: dict
+    returned: always
+    sample: {"changed": 2, "unchanged": 1498, "failed": 0}
+targets:
+    description:
+    - The outcome for every target, with its I(groups), I(devices) and I(summary).
+    - A target whose devices could not be listed has I(failed) and I(msg) set instead.
+    type: list
+    elements: dict
+    returned: when I(targets) is set
+    sample:
+      - name: eu
+        email: ops@example.com
+        region: EU
+        changed: true
+        failed: false
+        groups: [{"labels": [amer, amer-west], "devices": [edge-sea-01]}]
+        devices: [{"name": "edge-sea-01", "id": "12345", "changed": true}]
+        summary: {"changed": 1, "unchanged": 740, "failed": 0}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    DEVICE_SUBTYPES,
+    LABEL_ACTIONS,
+    assign_label_groups,
+    gather_labels,
+    group_label_assignments,
+    iter_devices,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_targets import (
+    TARGETS_MODULE_OPTIONS,
+    kentik_targets_argument_spec,
+    run_targets,
+)
+import functools
+
+DEVICE_FIELDS = ("id", "deviceName", "deviceSubtype", "site", "labels")
+
+
+def assign_labels(module, client, cache):
+    """Apply the label assignments to the devices of one account and return its result"""
+    label_dict = cache.get("labels", lambda: gather_labels(client))
+    devices = list(iter_devices(client, fields=DEVICE_FIELDS))
+    groups = group_label_assignments(devices, module.params["assignments"], label_dict)
+
+    label_names = dict((label_id, name) for name, label_id in label_dict.items())
+    group_results = [
+        {
+            "labels": sorted(label_names.get(label_id, str(label_id)) for label_id in label_ids),
+            "devices": sorted(device["deviceName"] for device in group),
+        }
+        for label_ids, group in groups.items()
+    ]
+    if module.check_mode:
+        results = [
+            {"name": device["deviceName"], "id": device["id"], "changed": True}
+            for group in groups.values()
+            for device in group
+        ]
+    else:
+        results = assign_label_groups(client, groups, module.params["max_workers"])
+    failed = sum(1 for result in results if result.get("failed"))
+    summary = {"changed": len(results) - failed, "unchanged": len(devices) - len(results), "failed": failed}
+    result = dict(changed=summary["changed"] > 0, groups=group_results, devices=results, summary=summary)
+    if failed:
+        result.update(failed=True, msg=f"{failed} device(s) failed")
+    return result
+
+
+def main():
+    """Main function for the program"""
+    assignment_spec = dict(
+        names=dict(type="list", required=False, elements="str"),
+        sites=dict(type="list", required=False, elements="str"),
+        has_labels=dict(type="list", required=False, elements="str"),
+        subtypes=dict(type="list", required=False, elements="str", choices=DEVICE_SUBTYPES),
+        labels=dict(type="list", required=True, elements="str"),
+        action=dict(type="str", required=False, default="replace", choices=list(LABEL_ACTIONS)),
+    )
+    argument_spec = dict(
+        assignments=dict(
+            type="list",
+            required=True,
+            elements="dict",
+            options=assignment_spec,
+            required_one_of=[("names", "sites", "has_labels", "subtypes")],
+        ),
+    )
+    argument_spec.update(kentik_targets_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        **TARGETS_MODULE_OPTIONS,
+    )
+    run_targets(module, functools.partial(assign_labels, module))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_device_snmp
+short_description: Set the SNMP credentials of many Kentik devices at once
+version_added: "1.2.0"
+description:
+- Sets the SNMPv2 community and/or the SNMPv3 settings of every device the selector matches, for example to
+  rotate SNMP credentials across a fleet.
+- The device list is read once and only the devices whose settings differ are updated, concurrently with a
+  bounded number of workers. Running it again with the same settings makes no writes.
+- The API never returns SNMP secrets, so the community and passphrases are compared against salted
+  fingerprints of the values this module last wrote to each device, kept in I(state_dir). Every selected device
+  is written the first time, and after that only when a secret changes. Use I(force) after a credential was
+  changed outside of this module.
+- I(state_dir) must survive between runs. On runners that start from a clean file system, such as AWX or
+  execution environment containers and throwaway cron hosts, point it at persistent storage. Otherwise every
+  run writes the credentials to every selected device, and the module warns that no fingerprints were found.
+- The other SNMPv3 settings are compared against the detail record of each device, which are fetched
+  concurrently.
+- The API replaces the whole device on update, so the SNMP settings are laid over the detail record of each
+  device that is written and its other attributes are kept.
+- A device that fails to update is reported without stopping the others.
+options:
+    names:
+        description: Shell-style patterns, such as C(edge-*), that the device name must match one of.
+        type: list
+        elements: str
+    sites:
+        description: Only select devices assigned to one of these sites.
+        type: list
+        elements: str
+    has_labels:
+        description: Only select devices that carry at least one of these labels.
+        type: list
+        elements: str
+    subtypes:
+        description: Only select devices of one of these subtypes.
+        type: list
+        elements: str
+    community:
+        description: The SNMPv2 community the selected devices are polled with.
+        type: str
+    v3:
+        description: The SNMPv3 settings the selected devices are polled with.
+        type: dict
+        suboptions:
+            user_name:
+                description: The SNMPv3 user name.
+                type: str
+                required: true
+            authentication_protocol:
+                description: The SNMPv3 authentication protocol.
+                type: str
+                choices: [ NoAuth, MD5, SHA ]
+            authentication_passphrase:
+                description: The SNMPv3 authentication passphrase.
+                type: str
+            privacy_protocol:
+                description: The SNMPv3 privacy protocol.
+                type: str
+                choices: [ NoPriv, DES, AES ]
+            privacy_passphrase:
+                description: The SNMPv3 privacy passphrase.
+                type: str
+    state_dir:
+        description:
+        - Directory where the fingerprints of the secrets written to each device are kept, per region and account.
+        - Unlike I(cache_dir), it is never expired and must persist between runs for a re-run to make no writes.
+        type: path
+        default: ~/.ansible/kentik_state
+    force:
+        description: Write the settings to every selected device, even the ones that already have them.
+        type: bool
+        default: false
+    max_workers:
+        description: The maximum number of device updates in flight at once.
+        type: int
+        default: 8
+    max_in_flight:
+        description:
+        - The maximum number of detail reads in flight at once.
+        - Reads overlap on an asyncio event loop, through aiohttp when it is installed.
+        type: int
+        default: 32
+extends_documentation_fragment:
+- kentik.kentik_config.kentik.targets
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Rotate the SNMPv3 credentials of the devices in the inventory
+  kentik.kentik_config.kentik_device_snmp:
+    names: "{{ ansible_play_hosts }}"
+    v3:
+      user_name: "{{ snmp_user }}"
+      authentication_protocol: SHA
+      authentication_passphrase: "{{ snmp_auth_password }}"
+      privacy_protocol: AES
+      privacy_passphrase: "{{ snmp_priv_password }}"
+    max_workers: 16
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Set the SNMPv2 community of every router in Seattle
+  kentik.kentik_config.kentik_device_snmp:
+    sites: [Seattle]
+    subtypes: [router]
+    community: "{{ snmp_community }}"
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+devices:
+    description: The outcome of every device update.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - name: edge-sea-01
+        id: "12345"
+        changed: true
+        changes: ["deviceSnmpV3Conf"]
+summary:
+    description: The number of devices updated, left unchanged and failed, added up over every target.
+    type: dict
+    returned: always
+    sample: {"changed": 2, "unchanged": 1498, "failed": 0}
+targets:
+    description:
+    - The outcome for every target, with its I(devices) and I(summary).
+    - A target whose devices could not be read has I(failed) and I(msg) set instead.
+    type: list
+    elements: dict
+    returned: when I(targets) is set
+    sample:
+      - name: eu
+        email: ops@example.com
+        region: EU
+        changed: true
+        failed: false
+        devices: [{"name": "edge-ams-01", "id": "23456", "changed": true, "changes": ["deviceSnmpCommunity"]}]
+        summary: {"changed": 1, "unchanged": 740, "failed": 0}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import (
+    ReferenceCache,
+    kentik_cache_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    bulk_argument_spec,
+    fetch_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    DEVICE_SUBTYPES,
+    device_matches,
+    get_device_details,
+    iter_devices,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_snmp import (
+    DEFAULT_STATE_DIR,
+    SNMP_DEVICE_FIELDS,
+    build_snmp_v3_conf,
+    load_fingerprints,
+    new_salt,
+    plan_snmp_changes,
+    save_fingerprints,
+    snmp_v3_argument_spec,
+    write_snmp_changes,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_targets import (
+    TARGETS_MODULE_OPTIONS,
+    kentik_targets_argument_spec,
+    run_targets,
+)
+import functools
+
+
+def update_snmp(module, community, v3_conf, client, cache):
+    """Bring the SNMP settings of the selected devices of one account up to date and return its result"""
+    params = module.params
+    devices = [
+        device for device in iter_devices(client, fields=SNMP_DEVICE_FIELDS)
+        if device_matches(device, params["names"], params["sites"], params["has_labels"], params["subtypes"])
+    ]
+    if v3_conf is not None:
+        names = set(device["deviceName"] for device in devices)
+        devices = get_device_details(client, devices, names, params["max_in_flight"])
+    store = ReferenceCache(cache.region, cache.email, cache_dir=params["state_dir"])
+    salt, recorded = load_fingerprints(store)
+    if salt is None:
+        salt = new_salt()
+        if devices and not params["force"]:
+            module.warn(
+                f"No SNMP fingerprints are recorded in {params['state_dir']} for {cache.email} ({cache.region}), "
+                "so the settings are written to every selected device"
+            )
+    changes = plan_snmp_changes(devices, community, v3_conf, salt, recorded, params["force"])
+    if module.check_mode:
+        results = [
+            {"name": device["deviceName"], "id": device["id"], "changed": True, "changes": fields}
+            for device, fields, _fingerprints in changes
+        ]
+    else:
+        results = write_snmp_changes(
+            client, changes, community, v3_conf, params["max_workers"], detailed=v3_conf is not None
+        )
+        save_fingerprints(store, salt, dict(
+            (device["id"], fingerprints)
+            for (device, _fields, fingerprints), result in zip(changes, results)
+            if not result.get("failed")
+        ))
+    failed = sum(1 for result in results if result.get("failed"))
+    summary = {"changed": len(results) - failed, "unchanged": len(devices) - len(results), "failed": failed}
+    result = dict(changed=summary["changed"] > 0, devices=results, summary=summary)
+    if failed:
+        result.update(failed=True, msg=f"{failed} device(s) failed")
+    return result
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        names=dict(type="list", required=False, elements="str"),
+        sites=dict(type="list", required=False, elements="str"),
+        has_labels=dict(type="list", required=False, elements="str"),
+        subtypes=dict(type="list", required=False, elements="str", choices=DEVICE_SUBTYPES),
+        community=dict(type="str", required=False, no_log=True),
+        v3=dict(type="dict", required=False, options=snmp_v3_argument_spec()),
+        state_dir=dict(type="path", required=False, default=DEFAULT_STATE_DIR),
+        force=dict(type="bool", required=False, default=False),
+    )
+    argument_spec.update(kentik_targets_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    argument_spec.update(fetch_argument_spec())
+    options = dict(TARGETS_MODULE_OPTIONS)
+    options["required_one_of"] = options["required_one_of"] + [
+        ("names", "sites", "has_labels", "subtypes"),
+        ("community", "v3"),
+    ]
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        **options,
+    )
+    community = module.params["community"]
+    v3_conf = build_snmp_v3_conf(module.params["v3"])
+    run_targets(module, functools.partial(update_snmp, module, community, v3_conf))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_devices
+short_description: Reconcile a list of devices with Kentik in a single task
+version_added: "1.2.0"
+description:
+- Fetches every device in the Kentik tenant once, compares it to the list of desired devices in memory and
+  creates, updates or deletes only the devices that differ.
+- Devices whose I(nms) or I(deviceSnmpV3Conf) is set are compared against their detail records, which are
+  fetched concurrently.
+- The API replaces the whole device on update, so each device that changes is fetched again and the changed
+  fields are laid over it. The attributes the task does not set are kept.
+- Changes are applied concurrently with a bounded number of workers.
+- Use this module instead of looping over M(kentik.kentik_config.kentik_device) when syncing a fleet.
+options:
+    devices:
+        description:
+        - The desired devices.
+        - Each entry accepts the same options as M(kentik.kentik_config.kentik_device) apart from the authentication options.
+        type: list
+        elements: dict
+        required: true
+        suboptions:
+            deviceName:
+                description: The name of the device.
+                required: true
+                type: str
+            deviceDescription:
+                description: The device description.
+                type: str
+                default: Added by Ansible
+            deviceSubtype:
+                description: The device subtype.
+                choices: [ router, host-nprobe-dns-www, aws-subnet, azure_subnet, cisco_asa, gcp-subnet, istio_beta, open_nms, paloalto, silverpeak ]
+                type: str
+                default: "router"
+            cdnAttr:
+                description: If this is a DNS server, you can contribute its queries to Kentik's CDN attribution database.
+                choices: [ none, y, n ]
+                type: str
+            deviceSampleRate:
+                description: The rate at which the device is sampling flows.
+                type: int
+                default: 1
+            planName:
+                description: The name of the plan to which this device is assigned.
+                required: true
+                type: str
+            siteName:
+                description: The name of the site (if any) to which this device is assigned.
+                type: str
+            sendingIps:
+                description: IP addresses from which the device is sending flow.
+                type: list
+                elements: str
+            minimizeSnmp:
+                description: Poll the device for a minimal set of SNMP OIDs.
+                type: bool
+            deviceSnmpIp:
+                description: IP address from which the device is listening on snmp.
+                type: str
+            deviceSnmpCommunity:
+                description: The SNMP community to use when polling the device.
+                type: str
+            updateSnmpAuth:
+                description:
+                - Update the SNMP Authentication.
+                - The API never returns the SNMP community or the SNMPv3 passphrases, so they are not compared. Set this to
+                  write them to an existing device.
+                type: bool
+                default: false
+            deviceSnmpV3Conf:
+                description:
+                - A dictionary with all snmpv3 attributes.
+                - Reference Kentik API Documentation for exact dictionary format.
+                type: dict
+            deviceBgpType:
+                description: BGP (device_bgp_type) - Device bgp type.
+                choices: [ none, device, other_device ]
+                type: str
+                default: none
+            deviceBgpNeighborIp:
+                description: Your IPv4 peering address.
+                type: str
+            deviceBgpNeighborIp6:
+                description: Your IPv6 peering address.
+                type: str
+            deviceBgpNeighborAsn:
+                description: The valid AS number (ASN) of the autonomous system that this device belongs to.
+                type: str
+            deviceBgpPassword:
+                description:
+                - Optional BGP MD5 password.
+                - The API never returns it, so it is not compared. It is set when the device is created or its BGP settings change.
+                type: str
+            useBgpDeviceId:
+                description: The ID of the device whose BGP table should be shared with this device.
+                type: int
+            deviceBgpFlowspec:
+                description: Toggle BGP Flowspec Compatibility for device.
+                type: bool
+            nms:
+                description:
+                - A dictionary for adding NMS SNMP or streaming telemetry to a device.
+                - Reference Kentik API Documentation for exact dictionary format.
+                type: dict
+            labels:
+                description: Labels that get assigned to the device.
+                type: list
+                elements: str
+            state:
+                description: Whether to ensure the device should be present or if it should be removed.
+                type: str
+                choices: [present, absent]
+                default: present
+    prune:
+        description: Delete every device in Kentik that is not in I(devices).
+        type: bool
+        default: false
+    max_workers:
+        description: The maximum number of API writes in flight at once.
+        type: int
+        default: 8
+    max_in_flight:
+        description:
+        - The maximum number of detail reads in flight at once.
+        - Reads overlap on an asyncio event loop, through aiohttp when it is installed.
+        type: int
+        default: 32
+extends_documentation_fragment:
+- kentik.kentik_config.kentik.targets
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Make Kentik match the inventory exactly
+  kentik.kentik_config.kentik_devices:
+    devices:
+      - deviceName: access_switch_01
+        planName: Free Flowpak Plan
+        siteName: Seattle
+        sendingIps: ["192.0.2.100"]
+        deviceSnmpIp: "192.0.2.100"
+        labels: ["access switch"]
+      - deviceName: access_switch_02
+        planName: Free Flowpak Plan
+        siteName: Seattle
+        sendingIps: ["192.0.2.101"]
+    prune: true
+    max_workers: 16
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Preview which devices would change
+  kentik.kentik_config.kentik_devices:
+    devices: "{{ desired_devices }}"
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  check_mode: true
+  register: device_preview
+
+- name: Sync each tenant's devices in both regions at once
+  kentik.kentik_config.kentik_devices:
+    devices: "{{ desired_devices }}"
+    targets:
+      - name: us-tenant
+        email: "{{ kentik_us_user }}"
+        token: "{{ kentik_us_token }}"
+      - name: eu-tenant
+        email: "{{ kentik_eu_user }}"
+        token: "{{ kentik_eu_token }}"
+        region: EU
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+devices:
+    description: The outcome for every device that was created, updated, deleted or left alone.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - name: access_switch_01
+        action: update
+        changed: true
+        id: "12345"
+        changes: ["sendingIps", "labels"]
+summary:
+    description: The number of devices per action, added up over every target.
+    type: dict
+    returned: always
+    sample: {"create": 0, "update": 1, "delete": 0, "none": 99, "failed": 0}
+targets:
+    description:
+    - The outcome for every target, with its I(devices) and I(summary).
+    - A target whose devices could not be read has I(failed) and I(msg) set instead.
+    type: list
+    elements: dict
+    returned: when I(targets) is set
+    sample:
+      - name: eu
+        email: ops@example.com
+        region: EU
+        changed: true
+        failed: false
+        devices: [{"name": "edge-ams-01", "action": "update", "changed": true, "id": "12345", "changes": ["labels"]}]
+        summary: {"create": 0, "update": 1, "delete": 0, "none": 99, "failed": 0}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import (
+    bulk_argument_spec,
+    fetch_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import (
+    device_argument_spec,
+    gather_labels,
+    gather_plans,
+    gather_sites,
+    get_device_details,
+    iter_devices,
+    needs_device_detail,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import (
+    plan_device_changes,
+    summarize,
+    sync,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_targets import (
+    TARGETS_MODULE_OPTIONS,
+    kentik_targets_argument_spec,
+    run_targets,
+)
+from collections import Counter
+import functools
+
+
+def sync_devices(module, desired, client, cache):
+    """Reconcile the desired devices with one account and return its result"""
+    names = set(params["deviceName"] for params in desired)
+    label_dict = cache.get("labels", lambda: gather_labels(client))
+    site_dict = cache.get("sites", lambda: gather_sites(client))
+    plan_dict = cache.get("plans", lambda: gather_plans(client))
+    # Only the devices this task manages are kept whole; the rest are only
+    # needed by name and id for pruning.
+    remote_devices = [
+        device if device["deviceName"] in names else {"id": device["id"], "deviceName": device["deviceName"]}
+        for device in iter_devices(client)
+    ]
+    detailed = set(params["deviceName"] for params in desired if needs_device_detail(params))
+    remote_devices = get_device_details(client, remote_devices, detailed, module.params["max_in_flight"])
+
+    changes = plan_device_changes(desired, remote_devices, label_dict, site_dict, plan_dict, module.params["prune"])
+    results = sync(client, cache, changes, module.check_mode, module.params["max_workers"])
+    summary = summarize(results)["devices"]
+    result = dict(changed=any(result["changed"] for result in results), devices=results, summary=summary)
+    if summary["failed"]:
+        result.update(failed=True, msg=f"{summary['failed']} device(s) failed")
+    return result
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        devices=dict(type="list", required=True, elements="dict", options=device_argument_spec()),
+        prune=dict(type="bool", required=False, default=False),
+    )
+    argument_spec.update(kentik_targets_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    argument_spec.update(fetch_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        **TARGETS_MODULE_OPTIONS,
+    )
+    desired = module.params["devices"]
+    names = Counter(params["deviceName"] for params in desired)
+    duplicates = sorted(name for name, count in names.items() if count > 1)
+    if duplicates:
+        module.fail_json(msg=f"Devices are listed more than once: {', '.join(duplicates)}")
+    run_targets(module, functools.partial(sync_devices, module, desired))
+
+
+if __name__ == "__main__":
+    main()
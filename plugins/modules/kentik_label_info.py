@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_label_info
+short_description: Gather information about labels in Kentik
+version_added: "1.2.0"
+description:
+- Returns the labels in the Kentik tenant whose name matches one of the patterns given.
+options:
+    names:
+        description:
+        - Shell-style patterns, such as C(role-*), that the label name must match one of.
+        - Every label is returned when this is not set.
+        type: list
+        elements: str
+    fields:
+        description:
+        - The top level label fields to return, for example C([id, name]).
+        - Every field is returned when this is not set.
+        type: list
+        elements: str
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Get the role labels
+  kentik.kentik_config.kentik_label_info:
+    names: ["role-*"]
+    fields: [id, name, color]
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+  register: role_labels
+"""
+
+RETURN = r"""
+labels:
+    description: The matching labels, reduced to I(fields) when it is set.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - id: 42
+        name: role-access
+        color: "#007090"
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_label_utils import list_labels
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import (
+    matches_any,
+    project,
+)
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        names=dict(type="list", required=False, elements="str"),
+        fields=dict(type="list", required=False, elements="str"),
+    )
+    argument_spec.update(kentik_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+    params = module.params
+    client = KentikClient.from_module(module)
+    try:
+        labels = [
+            project(label, params["fields"])
+            for label in list_labels(client)
+            if matches_any(label.get("name"), params["names"])
+        ]
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+    module.exit_json(changed=False, labels=labels)
+
+
+if __name__ == "__main__":
+    main()
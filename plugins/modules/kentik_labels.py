@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_labels
+short_description: Reconcile a list of labels with Kentik in a single task
+version_added: "1.2.0"
+description:
+- Fetches the tenant's labels with a single list call, matches them to the desired labels by name and
+  creates, recolors or deletes only the labels that differ.
+- Colors are compared without regard to case and updated in place, so a label keeps its id and its devices.
+- Changes are applied concurrently with a bounded number of workers.
+- Use this module instead of looping over M(kentik.kentik_config.kentik_label) when syncing a label catalog.
+options:
+    labels:
+        description: The desired labels.
+        type: list
+        elements: dict
+        required: true
+        suboptions:
+            name:
+                description: The name of the label.
+                required: true
+                type: str
+            color:
+                description: The hexadecimal color code of the label.
+                required: true
+                type: str
+            state:
+                description: Whether to ensure the label should be present or if it should be removed.
+                type: str
+                choices: [present, absent]
+                default: present
+    prune:
+        description: Delete every label in Kentik that is not in I(labels).
+        type: bool
+        default: false
+    max_workers:
+        description: The maximum number of API writes in flight at once.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik.targets
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Sync the role labels
+  kentik.kentik_config.kentik_labels:
+    labels:
+      - name: access switch
+        color: "#007090"
+      - name: core router
+        color: "#ff0000"
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Keep the same labels in the US and EU accounts
+  kentik.kentik_config.kentik_labels:
+    labels: "{{ role_labels }}"
+    targets:
+      - name: us
+        email: "{{ kentik_us_user }}"
+        token: "{{ kentik_us_token }}"
+      - name: eu
+        email: "{{ kentik_eu_user }}"
+        token: "{{ kentik_eu_token }}"
+        region: EU
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+labels:
+    description: The outcome for every label that was created, updated, deleted or left alone.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - kind: labels
+        name: core router
+        action: update
+        changed: true
+        id: 42
+        changes: ["color"]
+summary:
+    description: The number of labels per action, added up over every target.
+    type: dict
+    returned: always
+    sample: {"create": 3, "update": 1, "delete": 0, "none": 250, "failed": 0}
+targets:
+    description:
+    - The outcome for every target, with its I(labels) and I(summary).
+    - A target whose labels could not be listed has I(failed) and I(msg) set instead.
+    type: list
+    elements: dict
+    returned: when I(targets) is set
+    sample:
+      - name: eu
+        email: ops@example.com
+        region: EU
+        changed: true
+        failed: false
+        labels: [{"kind": "labels", "name": "core router", "action": "create", "changed": true, "id": 43}]
+        summary: {"create": 1, "update": 0, "delete": 0, "none": 250, "failed": 0}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_label_utils import (
+    label_argument_spec,
+    list_labels,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import (
+    plan_label_changes,
+    summarize,
+    sync,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_targets import (
+    TARGETS_MODULE_OPTIONS,
+    kentik_targets_argument_spec,
+    run_targets,
+)
+from collections import Counter
+import functools
+
+
+def sync_labels(module, desired, client, cache):
+    """Reconcile the desired labels with one account and return its result"""
+    remote_labels = list_labels(client)
+    changes = plan_label_changes(desired, remote_labels, module.params["prune"])
+    results = sync(client, cache, changes, module.check_mode, module.params["max_workers"])
+    summary = summarize(results)["labels"]
+    result = dict(changed=any(result["changed"] for result in results), labels=results, summary=summary)
+    if summary["failed"]:
+        result.update(failed=True, msg=f"{summary['failed']} label(s) failed")
+    return result
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        labels=dict(type="list", required=True, elements="dict", options=label_argument_spec()),
+        prune=dict(type="bool", required=False, default=False),
+    )
+    argument_spec.update(kentik_targets_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        **TARGETS_MODULE_OPTIONS,
+    )
+    desired = module.params["labels"]
+    names = Counter(params["name"] for params in desired)
+    duplicates = sorted(name for name, count in names.items() if count > 1)
+    if duplicates:
+        module.fail_json(msg=f"Labels are listed more than once: {', '.join(duplicates)}")
+    run_targets(module, functools.partial(sync_labels, module, desired))
+
+
+if __name__ == "__main__":
+    main()
@@ -43,13 +43,6 @@ options:
         description: Name of the Site Market this site belongs to.
         type: str
         default: ''
-    region:
-        description: The reqion that your Kentik portal is located in.
-        type: str
-        default: US
-        choices:
-            - US
-            - EU
     state:
         description: States whether to delete or create.
         type: str
@@ -57,14 +50,6 @@ options:
         choices:
             - present
             - absent
-    token:
-        description: The Kentik API Token used to authenticate.
-        type: str
-        required: true
-    email:
-        description: The Kentik API Email used to authenticate.
-        type: str
-        required: true
     infrastructureNetworks:
         description: Network subnets that connect to other network devices.
         type: list
@@ -77,7 +62,9 @@ options:
         description: Network subnets that connect to something other then what is noted above.
         type: list
         elements: str
-
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
 author:
 - Ethan Angele (@kentikethan)
 """
@@ -123,249 +110,25 @@ message:
 """
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils._text import to_text
-try:
-    import requests
-except ImportError:
-    HAS_ANOTHER_LIBRARY = False
-import json
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikClient
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import ReferenceCache
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (
+    ensure_site,
+    site_module_argument_spec,
+)
 import logging
 logging.basicConfig(level=logging.INFO)
 
 
-def build_payload(module):
-    """Build the payload"""
-    payload = module.params
-    del payload["email"]
-    del payload["token"]
-    del [payload["state"]]
-    del [payload["region"]]
-    if payload["infrastructureNetworks"] is None:
-        payload["infrastructureNetworks"] = []
-    if payload["userAccessNetworks"] is None:
-        payload["userAccessNetworks"] = []
-    if payload["otherNetworks"] is None:
-        payload["otherNetworks"] = []
-    address_classification = {
-        "infrastructureNetworks": payload["infrastructureNetworks"],
-        "userAccessNetworks": payload["userAccessNetworks"],
-        "otherNetworks": payload["otherNetworks"]
-    }
-    del [payload["infrastructureNetworks"]]
-    del [payload["userAccessNetworks"]]
-    del [payload["otherNetworks"]]
-    payload["addressClassification"] = address_classification
-    return payload
-
-
-def gather_sites(base_url, api_version, auth, module):
-    """Gather a list of sites"""
-    url = f"{base_url}{api_version}/sites"
-
-    payload = {}
-    headers = auth
-    try:
-        response = requests.request(
-            "GET", url, headers=headers, data=payload, timeout=30
-        )
-        site_data = response.json()
-    except ConnectionError as exc:
-        module.fail_json(msg=to_text(exc))
-    site_dict = {}
-    for site in site_data["sites"]:
-        site_dict[site["title"]] = site["id"]
-    return site_dict
-
-
-def compare_site(site_list, module):
-    """Check to see if the site exists"""
-    site = module.params["title"]
-    if site in site_list:
-        logging.info("Site Exists")
-        function_return = site_list[site]
-    else:
-        logging.info("Site does not exists")
-        function_return = False
-    return function_return
-
-
-def delete_site(base_url, api_version, auth, site_id, module):
-    """Function to delete a site"""
-    logging.info("Deleting Site...")
-    url = f"{base_url}{api_version}/sites/{site_id}"
-    payload = {}
-    headers = auth
-    try:
-        response = requests.request(
-            "DELETE", url, headers=headers, data=payload, timeout=30
-        )
-        if response.status_code == 200:
-            function_return = "ok"
-        else:
-            module.fail_json(msg=response.text)
-    except ConnectionError as exc:
-        module.fail_json(msg=to_text(exc))
-    return function_return
-
-
-def create_site(base_url, api_version, auth, site_object, module):
-    """Function for creating the site"""
-    logging.info("Creating Site...")
-    url = f"{base_url}{api_version}/sites"
-
-    payload = json.dumps({"site": site_object})
-    headers = auth
-    try:
-        response = requests.request(
-            "POST", url, headers=headers, data=payload, timeout=30
-        )
-        if response.status_code == 200:
-            site_data = response.json()
-            function_return = site_data["site"]["id"]
-        else:
-            module.fail_json(msg=response.text)
-    except ConnectionError as exc:
-        module.fail_json(msg=to_text(exc))
-    return function_return
-
-
-def update_check(base_url, api_version, auth, site_id, site_object, module):
-    """Function to check whether a site needs to be updated"""
-    logging.info("Checking site update...")
-    url = f"{base_url}{api_version}/sites/{site_id}"
-    headers = auth
-    site_data = {}
-    payload = {}
-    try:
-        response = requests.request(
-            "GET", url, headers=headers, data=payload, timeout=30
-        )
-        if response.status_code == 200:
-            site_data = response.json()
-        else:
-            module.fail_json(function="update_check", msg=response.text)
-    except ConnectionError as exc:
-        module.fail_json(function="update_check", msg=to_text(exc))
-    return_bool = False
-    if site_object["lat"] == 0.0:
-        site_object["lat"] = int(site_object["lat"])
-    if site_object["lon"] == 0.0:
-        site_object["lon"] = int(site_object["lon"])
-    for key in site_object:
-        if key not in site_data["site"]:
-            logging.info("Configured %s: %s is not yet configured.", key, site_object[key])
-            return_bool = True
-        else:
-            if str(site_data["site"][key]) != str(site_object[key]):
-                logging.info("Configured %s: %s does not match returned %s: %s",
-                             key,
-                             site_object[key],
-                             key,
-                             site_data["site"][key])
-                return_bool = True
-    if return_bool is False:
-        logging.info("Site is up to date...")
-    return return_bool
-
-
-def update_site(base_url, api_version, auth, module, site_id, site_object):
-    """Function to update a site to kentik"""
-    logging.info("Updating Site...")
-    url = f"{base_url}{api_version}/sites/{site_id}"
-    site_object['id'] = site_id
-    payload = json.dumps({"site": site_object})
-    headers = auth
-    try:
-        response = requests.request(
-            "PUT", url, headers=headers, data=payload, timeout=30
-        )
-        if response.status_code == 200:
-            site_data = response.json()
-        else:
-            module.fail_json(
-                function="update_site",
-                status_code=response.status_code,
-                msg=response.text,
-            )
-    except ConnectionError as exc:
-        module.fail_json(function="update_site", msg=to_text(exc))
-
-    return site_data["site"]["id"]
-
-
 def main():
     """Main function for the program"""
-    argument_spec = dict(
-        title=dict(type="str", required=True),
-        postalAddress=dict(type="dict", required=False),
-        type=dict(
-            choices=[
-                "SITE_TYPE_DATA_CENTER",
-                "SITE_TYPE_CLOUD",
-                "SITE_TYPE_BRANCH",
-                "SITE_TYPE_CONNECTIVITY",
-                "SITE_TYPE_CUSTOMER",
-                "SITE_TYPE_OTHER",
-            ],
-            required=False,
-            default="SITE_TYPE_OTHER",
-        ),
-        lat=dict(type="float", required=False, default=0),
-        lon=dict(type="float", required=False, default=0),
-        email=dict(type="str", required=True),
-        token=dict(type="str", no_log=True, required=True),
-        region=dict(type="str", required=False, default="US", choices=["US", "EU"]),
-        state=dict(default="present", choices=["present", "absent"]),
-        siteMarket=dict(type="str", required=False, default=""),
-        infrastructureNetworks=dict(type="list", required=False, elements="str"),
-        userAccessNetworks=dict(type="list", required=False, elements="str"),
-        otherNetworks=dict(type="list", required=False, elements="str")
-    )
     module = AnsibleModule(
-        argument_spec=argument_spec,
+        argument_spec=site_module_argument_spec(),
         supports_check_mode=True,
     )
-    result = {"changed": False}
-    warnings = list()
-    state = module.params["state"]
-    auth = {
-        "X-CH-Auth-Email": module.params["email"],
-        "X-CH-Auth-API-Token": module.params["token"],
-        "Content-Type": "application/json",
-    }
-    if module.params["region"] == "EU":
-        base_url = "https://grpc.api.kentik.eu/site/"
-    else:
-        base_url = "https://grpc.api.kentik.com/site/"
-    api_version = "v202211"
-    site_object = build_payload(module)
-    site_list = gather_sites(base_url, api_version, auth, module)
-    site_id = compare_site(site_list, module)
-
-    if site_id:
-        needs_updated = update_check(base_url,
-                                     api_version,
-                                     auth,
-                                     site_id,
-                                     site_object,
-                                     module)
-        if state == "present" and needs_updated:
-            update_site(base_url, api_version, auth, module, site_id, site_object)
-            result["changed"] = True
-            result["site_id"] = site_id
-        elif state == "present":
-            result["changed"] = False
-            result["site_id"] = site_id
-        elif state == "absent":
-            delete_site(base_url, api_version, auth, site_id, module)
-            result["changed"] = True
-    else:
-        if state == "present":
-            site_id = create_site(base_url, api_version, auth, site_object, module)
-            result["changed"] = True
-            result["site_id"] = site_id
-        elif state == "absent":
-            result["changed"] = False
+    client = KentikClient.from_module(module)
+    cache = ReferenceCache.from_module(module)
+    result = ensure_site(module, client, cache)
     module.exit_json(**result)
 
 
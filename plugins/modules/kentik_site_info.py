@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_site_info
+short_description: Gather information about sites in Kentik
+version_added: "1.2.0"
+description:
+- Returns the sites in the Kentik tenant that match every filter given.
+- Use I(fields) to keep registered results and fact caches small.
+options:
+    names:
+        description: Shell-style patterns, such as C(DC-*), that the site title must match one of.
+        type: list
+        elements: str
+    types:
+        description: Only return sites of one of these types.
+        type: list
+        elements: str
+        choices: [ SITE_TYPE_DATA_CENTER, SITE_TYPE_CLOUD, SITE_TYPE_BRANCH, SITE_TYPE_CONNECTIVITY, SITE_TYPE_CUSTOMER, SITE_TYPE_OTHER ]
+    fields:
+        description:
+        - The top level site fields to return, for example C([id, title]).
+        - Every field is returned when this is not set.
+        type: list
+        elements: str
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Get the ids of every data center site
+  kentik.kentik_config.kentik_site_info:
+    types: [SITE_TYPE_DATA_CENTER]
+    fields: [id, title]
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+  register: data_centers
+"""
+
+RETURN = r"""
+sites:
+    description: The matching sites, reduced to I(fields) when it is set.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - id: "1234"
+        title: DC-Seattle
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (
+    SITE_TYPES,
+    list_sites,
+    site_matches,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import project
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        names=dict(type="list", required=False, elements="str"),
+        types=dict(type="list", required=False, elements="str", choices=SITE_TYPES),
+        fields=dict(type="list", required=False, elements="str"),
+    )
+    argument_spec.update(kentik_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+    params = module.params
+    client = KentikClient.from_module(module)
+    try:
+        sites = [
+            project(site, params["fields"])
+            for site in list_sites(client)
+            if site_matches(site, params["names"], params["types"])
+        ]
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+    module.exit_json(changed=False, sites=sites)
+
+
+if __name__ == "__main__":
+    main()
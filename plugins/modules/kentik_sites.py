@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_sites
+short_description: Reconcile a list of sites with Kentik in a single task
+version_added: "1.2.0"
+description:
+- Fetches every site in the Kentik tenant once, compares it to the list of desired sites in memory and
+  creates, updates or deletes only the sites that differ.
+- The site list carries every field that is compared, so only the sites that change are fetched on their own.
+  The API replaces the whole site on update, so the changed fields are laid over the current site and the
+  fields the task does not set are kept.
+- Changes are applied concurrently with a bounded number of workers.
+- Use this module instead of looping over M(kentik.kentik_config.kentik_site) when syncing from a source of truth.
+options:
+    sites:
+        description:
+        - The desired sites.
+        - Each entry accepts the same options as M(kentik.kentik_config.kentik_site) apart from the authentication options.
+        type: list
+        elements: dict
+        required: true
+        suboptions:
+            title:
+                description: The site name to be displayed and referenced going forward.
+                required: true
+                type: str
+            postalAddress:
+                description: The physical address of the site.
+                type: dict
+            type:
+                description: The type of site this is, see choices for options.
+                type: str
+                default: SITE_TYPE_OTHER
+                choices: [ SITE_TYPE_DATA_CENTER, SITE_TYPE_CLOUD, SITE_TYPE_BRANCH, SITE_TYPE_CONNECTIVITY, SITE_TYPE_CUSTOMER, SITE_TYPE_OTHER ]
+            lat:
+                description: The latitude of the site.
+                type: float
+                default: 0.0
+            lon:
+                description: The longitude of the site.
+                type: float
+                default: 0.0
+            siteMarket:
+                description: Name of the Site Market this site belongs to.
+                type: str
+                default: ''
+            state:
+                description: Whether to ensure the site should be present or if it should be removed.
+                type: str
+                choices: [present, absent]
+                default: present
+            infrastructureNetworks:
+                description: Network subnets that connect to other network devices.
+                type: list
+                elements: str
+            userAccessNetworks:
+                description: Network subnets that connect to end users or servers.
+                type: list
+                elements: str
+            otherNetworks:
+                description: Network subnets that connect to something other than what is noted above.
+                type: list
+                elements: str
+    prune:
+        description: Delete every site in Kentik that is not in I(sites).
+        type: bool
+        default: false
+    max_workers:
+        description: The maximum number of API writes in flight at once.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik.targets
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Make the Kentik sites match NetBox
+  kentik.kentik_config.kentik_sites:
+    sites:
+      - title: sea1
+        type: SITE_TYPE_DATA_CENTER
+        lat: 47.6
+        lon: -122.3
+      - title: lax1
+        type: SITE_TYPE_DATA_CENTER
+    prune: true
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Roll the same sites out to every tenant
+  kentik.kentik_config.kentik_sites:
+    sites: "{{ netbox_sites }}"
+    targets: "{{ kentik_tenants }}"
+  delegate_to: localhost
+  run_once: true
+  register: site_sync
+"""
+
+RETURN = r"""
+sites:
+    description: The outcome for every site that was created, updated, deleted or left alone.
+    type: list
+    elements: dict
+    returned: when I(targets) is not set
+    sample:
+      - kind: sites
+        name: sea1
+        action: update
+        changed: true
+        id: "1234"
+        changes: ["lat", "lon"]
+summary:
+    description: The number of sites per action, added up over every target.
+    type: dict
+    returned: always
+    sample: {"create": 1, "update": 0, "delete": 0, "none": 40, "failed": 0}
+targets:
+    description:
+    - The outcome for every target, with its I(sites) and I(summary).
+    - A target whose sites could not be read has I(failed) and I(msg) set instead.
+    type: list
+    elements: dict
+    returned: when I(targets) is set
+    sample:
+      - name: eu
+        email: ops@example.com
+        region: EU
+        changed: true
+        failed: false
+        sites: [{"kind": "sites", "name": "Seattle", "action": "create", "changed": true, "id": 7}]
+        summary: {"create": 1, "update": 0, "delete": 0, "none": 40, "failed": 0}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import kentik_cache_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import (
+    list_sites,
+    site_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import (
+    plan_site_changes,
+    summarize,
+    sync,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_targets import (
+    TARGETS_MODULE_OPTIONS,
+    kentik_targets_argument_spec,
+    run_targets,
+)
+from collections import Counter
+import functools
+
+
+def sync_sites(module, desired, client, cache):
+    """Reconcile the desired sites with one account and return its result"""
+    changes = plan_site_changes(desired, list_sites(client), module.params["prune"])
+    results = sync(client, cache, changes, module.check_mode, module.params["max_workers"])
+    summary = summarize(results)["sites"]
+    result = dict(changed=any(result["changed"] for result in results), sites=results, summary=summary)
+    if summary["failed"]:
+        result.update(failed=True, msg=f"{summary['failed']} site(s) failed")
+    return result
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        sites=dict(type="list", required=True, elements="dict", options=site_argument_spec()),
+        prune=dict(type="bool", required=False, default=False),
+    )
+    argument_spec.update(kentik_targets_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        **TARGETS_MODULE_OPTIONS,
+    )
+    desired = module.params["sites"]
+    titles = Counter(params["title"] for params in desired)
+    duplicates = sorted(title for title, count in titles.items() if count > 1)
+    if duplicates:
+        module.fail_json(msg=f"Sites are listed more than once: {', '.join(duplicates)}")
+    run_targets(module, functools.partial(sync_sites, module, desired))
+
+
+if __name__ == "__main__":
+    main()
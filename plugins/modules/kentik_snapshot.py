@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_snapshot
+short_description: Save the labels, sites, plans and devices of a Kentik tenant to a local file
+version_added: "1.2.0"
+description:
+- Fetches every label, site, plan and device in the Kentik tenant and writes them to a single JSON file.
+- The snapshot is the input of M(kentik.kentik_config.kentik_sync_plan), which computes changes offline.
+- Devices are streamed to the file one at a time, so memory use does not grow with the size of the tenant.
+- The file is replaced atomically, so a reader never sees a partial snapshot.
+options:
+    dest:
+        description: The path of the snapshot file to write. The directory must exist.
+        type: path
+        required: true
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Snapshot the tenant
+  kentik.kentik_config.kentik_snapshot:
+    dest: /var/tmp/kentik_snapshot.json
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = r"""
+dest:
+    description: The path of the snapshot file.
+    type: str
+    returned: always
+    sample: /var/tmp/kentik_snapshot.json
+counts:
+    description: The number of objects of each kind in the snapshot.
+    type: dict
+    returned: success and not check mode
+    sample: {"labels": 12, "sites": 40, "plans": 3, "devices": 10000}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikError,
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import write_snapshot
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        dest=dict(type="path", required=True),
+    )
+    argument_spec.update(kentik_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+    result = {"changed": True, "dest": module.params["dest"]}
+    if module.check_mode:
+        module.exit_json(**result)
+    client = KentikClient.from_module(module)
+    try:
+        result["counts"] = write_snapshot(client, module.params["dest"])
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc), status_code=getattr(exc, "status_code", None))
+    except (IOError, OSError) as exc:
+        module.fail_json(msg=f"Unable to write snapshot {module.params['dest']}: {to_text(exc)}")
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_sync_apply
+short_description: Apply a plan computed by kentik_sync_plan to Kentik
+version_added: "1.2.0"
+description:
+- Makes exactly the changes listed in a plan from M(kentik.kentik_config.kentik_sync_plan), and nothing else.
+  Objects the plan does not list are not fetched or compared again.
+- Label and site creates and updates run first, then device changes, then site and label deletes, so that
+  devices can use the sites and labels the same plan creates.
+- Changes within each step are applied concurrently with a bounded number of workers.
+- A change that fails is reported without stopping the others.
+options:
+    plan:
+        description:
+        - The plan to apply, as registered from M(kentik.kentik_config.kentik_sync_plan).
+        - Mutually exclusive with I(src).
+        type: dict
+    src:
+        description:
+        - The path of a plan file written by the I(dest) option of M(kentik.kentik_config.kentik_sync_plan).
+        - Mutually exclusive with I(plan).
+        type: path
+    max_workers:
+        description: The maximum number of API writes in flight at once.
+        type: int
+        default: 8
+extends_documentation_fragment:
+- kentik.kentik_config.kentik
+- kentik.kentik_config.kentik.cache
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Apply the reviewed plan
+  kentik.kentik_config.kentik_sync_apply:
+    plan: "{{ kentik_plan }}"
+    max_workers: 16
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+  delegate_to: localhost
+  run_once: true
+
+- name: Apply a plan saved to a file
+  kentik.kentik_config.kentik_sync_apply:
+    src: /var/tmp/kentik_plan.json
+    email: "{{ kentik_user }}"
+    token: "{{ kentik_token }}"
+"""
+
+RETURN = r"""
+results:
+    description: The outcome of every change in the plan.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - name: access_switch_01
+        action: update
+        changed: true
+        id: "12345"
+        changes: ["sendingIps"]
+summary:
+    description: The number of changes applied per kind and action.
+    type: dict
+    returned: always
+    sample: {"devices": {"create": 0, "update": 1, "delete": 0, "none": 0, "failed": 0}}
+"""
+
+import json
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import (
+    KentikClient,
+    kentik_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import (
+    ReferenceCache,
+    kentik_cache_argument_spec,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_bulk import bulk_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import (
+    KINDS,
+    PLAN_VERSION,
+    apply_changes,
+    change_result,
+    summarize,
+)
+
+
+def load_plan(module):
+    """Return the plan given by the plan or src option"""
+    plan = module.params["plan"]
+    if module.params["src"]:
+        try:
+            with open(module.params["src"], "r") as plan_file:
+                plan = json.load(plan_file)
+        except (IOError, OSError, ValueError) as exc:
+            module.fail_json(msg=f"Unable to read plan {module.params['src']}: {to_text(exc)}")
+    if plan.get("version") != PLAN_VERSION or not isinstance(plan.get("changes"), list):
+        module.fail_json(msg="The plan was not produced by kentik_sync_plan or has an unsupported version")
+    for change in plan["changes"]:
+        if change.get("kind") not in KINDS:
+            module.fail_json(msg=f"The plan holds a change of unknown kind {change.get('kind')}")
+    return plan
+
+
+def main():
+    """Main function for the program"""
+    argument_spec = dict(
+        plan=dict(type="dict", required=False),
+        src=dict(type="path", required=False),
+    )
+    argument_spec.update(kentik_argument_spec())
+    argument_spec.update(kentik_cache_argument_spec())
+    argument_spec.update(bulk_argument_spec())
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        mutually_exclusive=[("plan", "src")],
+        required_one_of=[("plan", "src")],
+        supports_check_mode=True,
+    )
+    changes = load_plan(module)["changes"]
+    pending = [change for change in changes if change["action"] != "none" and not change.get("failed")]
+    if module.check_mode:
+        applied = [dict(change, changed=True) for change in pending]
+    else:
+        client = KentikClient.from_module(module)
+        cache = ReferenceCache.from_module(module)
+        applied = apply_changes(client, cache, pending, module.params["max_workers"])
+    results = [change_result(result) for result in applied]
+    summary = summarize(applied)
+    changed = any(result["changed"] for result in results)
+    failed = sum(counts["failed"] for counts in summary.values())
+    if failed:
+        module.fail_json(msg=f"{failed} change(s) failed", changed=changed, results=results, summary=summary)
+    module.exit_json(changed=changed, results=results, summary=summary)
+
+
+if __name__ == "__main__":
+    main()
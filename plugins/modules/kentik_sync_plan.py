@@ -0,0 +1,192 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: kentik_sync_plan
+short_description: Compute the changes needed to bring Kentik to a desired state, offline
+version_added: "1.2.0"
+description:
+- Compares desired labels, sites and devices to a snapshot written by M(kentik.kentik_config.kentik_snapshot) and
+  returns the list of creates, updates and deletes needed, without contacting Kentik.
+- Each change holds only the fields that differ, so the plan stays small and objects that are already in sync
+  are left out of it.
+- Pass the plan to M(kentik.kentik_config.kentik_sync_apply) to make the changes.
+- The plan is only as current as the snapshot. Take the snapshot shortly before planning.
+options:
+    snapshot:
+        description: The path of the snapshot file to compare against.
+        type: path
+        required: true
+    labels:
+        description:
+        - The desired labels.
+        - Each entry accepts the same options as M(kentik.kentik_config.kentik_label) apart from the authentication options.
+        type: list
+        elements: dict
+        default: []
+    sites:
+        description:
+        - The desired sites.
+        - Each entry accepts the same options as M(kentik.kentik_config.kentik_site) apart from the authentication options.
+        type: list
+        elements: dict
+        default: []
+    devices:
+        description:
+        - The desired devices.
+        - Each entry accepts the same options as M(kentik.kentik_config.kentik_device) apart from the authentication options.
+        - Sites and labels created by the same plan can be referenced.
+        type: list
+        elements: dict
+        default: []
+    prune:
+        description: Kinds of objects to delete from Kentik when they are not listed in the desired state.
+        type: list
+        elements: str
+        choices: [labels, sites, devices]
+        default: []
+    dest:
+        description: Also write the plan to this file, for review or for M(kentik.kentik_config.kentik_sync_apply) I(src).
+        type: path
+author:
+- Ethan Angele (@kentikethan)
+"""
+
+EXAMPLES = r"""
+- name: Plan the changes from a snapshot
+  kentik.kentik_config.kentik_sync_plan:
+    snapshot: /var/tmp/kentik_snapshot.json
+    sites:
+      - title: Seattle
+        type: SITE_TYPE_DATA_CENTER
+    labels:
+      - name: access switch
+        color: "#007090"
+    devices: "{{ desired_devices }}"
+    prune: [devices]
+    dest: /var/tmp/kentik_plan.json
+  delegate_to: localhost
+  run_once: true
+  register: kentik_plan
+
+- name: Show what would change
+  ansible.builtin.debug:
+    var: kentik_plan.summary
+"""
+
+RETURN = r"""
+changes:
+    description:
+    - The changes to make, one per object that differs. Objects that are already in sync are not listed.
+    - Entries that could not be planned, for example because they reference a plan that does not exist,
+      have I(failed) set.
+    type: list
+    elements: dict
+    returned: always
+    sample:
+      - kind: devices
+        name: access_switch_01
+        action: update
+        changed: false
+        id: "12345"
+        changes: ["sendingIps"]
+        plan: Free Flowpak Plan
+        object: {"deviceName": "access_switch_01", "deviceSubtype": "router", "sendingIps": ["192.0.2.100"]}
+summary:
+    description: The number of objects per kind and action, including the objects that need no change.
+    type: dict
+    returned: always
+    sample: {"labels": {"create": 1, "update": 0, "delete": 0, "none": 11, "failed": 0}}
+snapshot_created:
+    description: When the snapshot the plan was computed from was taken, in seconds since the epoch.
+    type: float
+    returned: always
+    sample: 1760000000.0
+version:
+    description: The format version of the plan.
+    type: int
+    returned: always
+    sample: 1
+"""
+
+import json
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_text
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_device_utils import device_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_label_utils import label_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_site_utils import site_argument_spec
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_sync import (
+    KINDS,
+    plan_from_snapshot,
+    read_snapshot,
+)
+from collections import Counter
+
+
+def duplicate_names(items, key):
+    """Return the names listed more than once"""
+    names = Counter(item[key] for item in items)
+    return sorted(name for name, count in names.items() if count > 1)
+
+
+def write_plan(module, plan, dest):
+    """Write the plan to dest unless it already holds the same plan, and return whether it was written"""
+    content = json.dumps(plan, indent=2, sort_keys=True)
+    try:
+        with open(dest, "r") as plan_file:
+            if plan_file.read() == content:
+                return False
+    except (IOError, OSError):
+        pass
+    if not module.check_mode:
+        try:
+            with open(dest, "w") as plan_file:
+                plan_file.write(content)
+        except (IOError, OSError) as exc:
+            module.fail_json(msg=f"Unable to write plan {dest}: {to_text(exc)}")
+    return True
+
+
+def main():
+    """Main function for the program"""
+    module = AnsibleModule(
+        argument_spec=dict(
+            snapshot=dict(type="path", required=True),
+            labels=dict(type="list", required=False, default=[], elements="dict", options=label_argument_spec()),
+            sites=dict(type="list", required=False, default=[], elements="dict", options=site_argument_spec()),
+            devices=dict(type="list", required=False, default=[], elements="dict", options=device_argument_spec()),
+            prune=dict(type="list", required=False, default=[], elements="str", choices=list(KINDS)),
+            dest=dict(type="path", required=False),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    for kind, key in (("labels", "name"), ("sites", "title"), ("devices", "deviceName")):
+        duplicates = duplicate_names(params[kind], key)
+        if duplicates:
+            module.fail_json(msg=f"{kind.capitalize()} are listed more than once: {', '.join(duplicates)}")
+    try:
+        snapshot = read_snapshot(params["snapshot"], set(device["deviceName"] for device in params["devices"]))
+    except KentikError as exc:
+        module.fail_json(msg=to_text(exc))
+    plan = plan_from_snapshot(snapshot, params["labels"], params["sites"], params["devices"], params["prune"])
+    result = dict(plan, changed=False)
+    if params["dest"]:
+        result["changed"] = write_plan(module, plan, os.path.expanduser(params["dest"]))
+    failed = sum(counts["failed"] for counts in plan["summary"].values())
+    if failed:
+        module.fail_json(msg=f"{failed} object(s) could not be planned", **result)
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
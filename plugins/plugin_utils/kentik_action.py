@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Controller-side execution of the single-object Kentik modules."""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+from ansible.module_utils.errors import UnsupportedError
+from ansible.module_utils.common.parameters import remove_values
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible.utils.vars import merge_hash
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import ReferenceCache
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikClient
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stats import ApiStats
+
+display = Display()
+
+# Clients and caches live for the whole worker process, so every item of a
+# loop reuses the same pooled connections and the reference data parsed by the
+# first item.
+_CLIENTS = {}
+_CACHES = {}
+_SHARED_LOCK = threading.Lock()
+
+
+class ModuleFailure(Exception):
+    """Raised by ControllerModule.fail_json to stop the item, carrying the failure result"""
+
+    def __init__(self, result):
+        super(ModuleFailure, self).__init__(result.get("msg"))
+        self.result = result
+
+
+class ControllerModule(object):
+    """The part of the AnsibleModule interface the Kentik ensure functions use, for running them on the controller"""
+
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+
+    def fail_json(self, msg, **kwargs):
+        """Stop the item with a failure, like AnsibleModule.fail_json"""
+        kwargs["msg"] = msg
+        kwargs["failed"] = True
+        raise ModuleFailure(kwargs)
+
+    def warn(self, warning):
+        """Show a warning"""
+        display.warning(warning)
+
+
+def shared_client(params):
+    """Return the process-wide client for a set of module parameters"""
+    key = (
+        params["region"], params["email"], params["token"], params["max_retries"], params["rate_limit"],
+        params["validate_certs"], params["ca_path"],
+    )
+    with _SHARED_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = KentikClient(
+                params["email"],
+                params["token"],
+                params["region"],
+                max_retries=params["max_retries"],
+                rate_limit=params["rate_limit"],
+                validate_certs=params["validate_certs"],
+                ca_path=params["ca_path"],
+            )
+        return _CLIENTS[key]
+
+
+def shared_cache(params):
+    """Return the process-wide reference-data cache for a set of module parameters"""
+    key = (params["region"], params["email"], params["cache_ttl"], params["cache_dir"])
+    with _SHARED_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = ReferenceCache.from_module(ControllerModule(params))
+        return _CACHES[key]
+
+
+class KentikActionBase(ActionBase):
+    """Run looped items of a Kentik module in-process on the controller.
+
+    When the task loops over items on a local connection, every item would
+    otherwise build, copy and start its own module payload. Such items are
+    validated against the module argument spec and handed to the module's
+    ensure function directly, sharing one client and cache per worker. Any
+    other invocation, including every async one, runs the module as usual.
+    """
+
+    MODULE = None
+    TRANSFERS_FILES = False
+
+    def argument_spec(self):
+        """Return the argument spec of the module"""
+        raise NotImplementedError
+
+    def ensure(self, module, client, cache):
+        """Apply one item and return its result"""
+        raise NotImplementedError
+
+    def _run_in_process(self):
+        """Whether this invocation should run on the controller instead of as a module"""
+        looped = bool(self._task.loop or self._task.loop_with)
+        return looped and self._connection.transport == "local" and not self._task.async_val
+
+    def run(self, tmp=None, task_vars=None):
+        self._supports_check_mode = True
+        self._supports_async = True
+        result = super(KentikActionBase, self).run(tmp, task_vars)
+        del tmp
+
+        if not self._run_in_process():
+            # The same as ansible.builtin.normal, so async and the remote tmp dir behave as usual.
+            wrap_async = self._task.async_val and not self._connection.has_native_async
+            result = merge_hash(result, self._execute_module(
+                module_name=f"kentik.kentik_config.{self.MODULE}",
+                module_args=self._task.args,
+                task_vars=task_vars,
+                wrap_async=wrap_async,
+            ))
+            if not wrap_async:
+                self._remove_tmp_path(self._connection._shell.tmpdir)
+            return result
+
+        validation = ArgumentSpecValidator(self.argument_spec()).validate(self._task.args)
+        params = validation.validated_parameters
+        no_log_values = validation._no_log_values
+        if validation.error_messages:
+            msg = validation.errors.msg
+            if isinstance(validation.errors[0], UnsupportedError):
+                msg = f"Unsupported parameters for ({self.MODULE}) module: {msg}"
+            result.update(failed=True, msg=remove_values(msg, no_log_values))
+            return result
+        module = ControllerModule(params, check_mode=self._task.check_mode)
+        client = shared_client(params)
+        stats = None
+        if params.get("api_stats"):
+            # The shared client serves every item, so each item records its
+            # calls through a copy of it.
+            stats = ApiStats()
+            client = client.with_stats(stats)
+        try:
+            result.update(self.ensure(module, client, shared_cache(params)))
+        except ModuleFailure as exc:
+            result.update(exc.result)
+        if stats is not None:
+            result["api_stats"] = stats.summary()
+        result["invocation"] = {"module_args": remove_values(params, no_log_values)}
+        return remove_values(result, no_log_values)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import threading
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_batch import (
+    batch_path,
+    iter_chunks,
+    submit_chunks,
+    summarize_batches,
+)
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+
+
+def populators(count):
+    return [{"value": f"customer-{index:04d}", "criteria": [{"direction": "SRC", "addr": ["10.0.0.1/32"]}]}
+            for index in range(count)]
+
+
+def test_iter_chunks_splits_by_count():
+    chunks = list(iter_chunks(populators(25), [{"value": "gone"}], chunk_size=10))
+    assert [(len(chunk["upserts"]), len(chunk["deletes"])) for chunk in chunks] == [(10, 0), (10, 0), (5, 1)]
+
+
+def test_iter_chunks_splits_by_size():
+    items = populators(20)
+    max_bytes = 5 * (len(json.dumps(items[0])) + 1)
+    chunks = list(iter_chunks(items, chunk_size=1000, max_bytes=max_bytes))
+    assert [len(chunk["upserts"]) for chunk in chunks] == [5, 5, 5, 5]
+    assert [item for chunk in chunks for item in chunk["upserts"]] == items
+
+
+def test_iter_chunks_keeps_an_oversized_entry_in_its_own_part():
+    chunks = list(iter_chunks(populators(3), chunk_size=10, max_bytes=10))
+    assert [len(chunk["upserts"]) for chunk in chunks] == [1, 1, 1]
+
+
+def test_iter_chunks_empty():
+    assert list(iter_chunks()) == []
+    assert list(iter_chunks([], None)) == []
+
+
+def test_iter_chunks_is_lazy():
+    def items():
+        for item in populators(3):
+            yield item
+        raise AssertionError("read past the first part")
+
+    chunks = iter_chunks(items(), chunk_size=2)
+    assert len(next(chunks)["upserts"]) == 2
+
+
+def test_batch_path():
+    assert batch_path("tags") == "/api/v5/batch/tags"
+    assert batch_path("populators", "c_customer/x") == "/api/v5/batch/customdimensions/c_customer%2Fx/populators"
+    with pytest.raises(KentikError):
+        batch_path("populators")
+
+
+class BatchClient(object):
+    """Record the batch parts posted and hand out a guid per new batch"""
+
+    def __init__(self):
+        self.parts = []
+        self.lock = threading.Lock()
+
+    def post(self, path, payload, api="grpc"):
+        with self.lock:
+            self.parts.append(payload)
+            return {"guid": payload.get("guid") or f"guid-{len(self.parts)}"}
+
+
+def test_submit_chunks_sends_independent_batches():
+    client = BatchClient()
+    batches = submit_chunks(client, "/path", iter_chunks(populators(25), chunk_size=10), max_workers=2)
+    assert [batch["upserts"] for batch in batches] == [10, 10, 5]
+    assert all(part["complete"] and not part["replace_all"] for part in client.parts)
+    assert len(set(batch["guid"] for batch in batches)) == 3
+
+
+def test_submit_chunks_replace_all_is_one_batch():
+    client = BatchClient()
+    batches = submit_chunks(client, "/path", iter_chunks(populators(45), chunk_size=10), replace_all=True, max_workers=2)
+    assert len(batches) == 1
+    assert batches[0]["parts"] == 5
+    assert batches[0]["upserts"] == 45
+    first, last = client.parts[0], client.parts[-1]
+    assert "guid" not in first and not first["complete"]
+    assert last["guid"] == batches[0]["guid"] and last["complete"]
+    assert all(part["guid"] == batches[0]["guid"] and not part["complete"] for part in client.parts[1:-1])
+    assert all(part["replace_all"] for part in client.parts)
+
+
+def test_submit_chunks_replace_all_with_nothing_sends_one_empty_part():
+    client = BatchClient()
+    batches = submit_chunks(client, "/path", iter_chunks(), replace_all=True)
+    assert client.parts == [{"replace_all": True, "complete": True}]
+    assert batches[0]["parts"] == 1
+
+
+def test_summarize_batches():
+    batches = [
+        {"parts": 2, "upserts": 3, "deletes": 1, "status": {"upsert": {"applied": 3}, "delete": {"applied": 1}}},
+        {"parts": 1, "upserts": 2, "deletes": 0, "timed_out": True},
+        {"parts": 1, "upserts": 1, "deletes": 0, "failed": True},
+    ]
+    summary = summarize_batches(batches)
+    assert summary["batches"] == 3
+    assert summary["parts"] == 4
+    assert summary["upserts"] == 6
+    assert summary["upserts_applied"] == 3
+    assert summary["deletes_applied"] == 1
+    assert summary["incomplete"] == 1
+    assert summary["failed"] == 1
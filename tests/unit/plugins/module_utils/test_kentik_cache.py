@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+import time
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils import kentik_cache
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_cache import ReferenceCache
+
+
+class Loader(object):
+    """Count the calls made to load an endpoint"""
+
+    def __init__(self, value, delay=0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(kentik_cache.time, "time", lambda: now[0])
+    return now
+
+
+def make_cache(tmp_path, ttl=300, email="user@example.com"):
+    return ReferenceCache("US", email, ttl=ttl, cache_dir=str(tmp_path / "cache"))
+
+
+def test_get_caches_until_ttl_expires(tmp_path, clock):
+    loader = Loader(["plan"])
+    cache = make_cache(tmp_path)
+    assert cache.get("plans", loader) == ["plan"]
+    assert make_cache(tmp_path).get("plans", loader) == ["plan"]
+    assert loader.calls == 1
+    clock[0] += 301
+    assert make_cache(tmp_path).get("plans", loader) == ["plan"]
+    assert loader.calls == 2
+
+
+def test_entries_are_keyed_by_account_and_endpoint(tmp_path, clock):
+    loader = Loader([])
+    make_cache(tmp_path).get("plans", loader)
+    make_cache(tmp_path).get("sites", loader)
+    make_cache(tmp_path, email="other@example.com").get("plans", loader)
+    assert loader.calls == 3
+
+
+def test_disabled_cache_always_loads(tmp_path):
+    loader = Loader([])
+    cache = make_cache(tmp_path, ttl=0)
+    cache.get("plans", loader)
+    cache.get("plans", loader)
+    assert loader.calls == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_invalidate_forces_a_reload(tmp_path, clock):
+    loader = Loader([])
+    cache = make_cache(tmp_path)
+    cache.get("labels", loader)
+    cache.invalidate("labels", "never_cached")
+    cache.get("labels", loader)
+    assert loader.calls == 2
+
+
+def test_concurrent_misses_load_once(tmp_path):
+    loader = Loader({"id": 1}, delay=0.2)
+    results = []
+
+    def fetch():
+        results.append(make_cache(tmp_path).get("sites", loader))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{"id": 1}] * 8
+    assert loader.calls == 1
+
+
+def test_state_never_expires_and_survives_disabled_cache(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=0)
+    assert cache.load_state("populators") is None
+    cache.update_state("populators", lambda state: {"a": 1})
+    clock[0] += 10 ** 6
+    assert make_cache(tmp_path, ttl=0).load_state("populators") == {"a": 1}
+
+
+def test_concurrent_state_updates_are_not_lost(tmp_path):
+    def add(state):
+        state = state or []
+        time.sleep(0.01)
+        return state + [len(state)]
+
+    threads = [
+        threading.Thread(target=make_cache(tmp_path).update_state, args=("counter", add)) for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert make_cache(tmp_path).load_state("counter") == list(range(10))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_diff import (
+    changed_fields,
+    changed_values,
+    diff,
+    is_empty,
+    merge_update,
+    overlay,
+)
+
+
+@pytest.mark.parametrize("value", [None, "", 0, False, [], (), {}, {"a": None, "b": {"c": ""}}])
+def test_is_empty(value):
+    assert is_empty(value)
+
+
+@pytest.mark.parametrize("value", ["x", 1, True, [None], {"a": 1}])
+def test_is_not_empty(value):
+    assert not is_empty(value)
+
+
+def test_diff_ignores_fields_desired_does_not_set():
+    remote = {"id": "1", "name": "a", "extra": {"x": 1}}
+    assert diff(remote, {"name": "a", "other": None}) == []
+
+
+def test_diff_treats_numbers_and_numeric_strings_as_equal():
+    assert diff({"lat": 1.5, "port": "161"}, {"lat": "1.50", "port": 161}) == []
+    assert diff({"flag": True}, {"flag": 1}) == []
+    assert diff({"flag": False}, {"flag": "false"}) == [("flag",)]
+
+
+def test_diff_treats_missing_and_empty_values_alike():
+    assert diff({}, {"description": "", "ips": [], "conf": {"a": None}}) == []
+    assert diff({"description": None}, {"description": "x"}) == [("description",)]
+
+
+def test_diff_compares_scalar_lists_unordered():
+    assert diff({"ips": ["10.0.0.2", "10.0.0.1"]}, {"ips": ["10.0.0.1", "10.0.0.2"]}) == []
+    assert diff({"ips": ["10.0.0.1"]}, {"ips": ["10.0.0.1", "10.0.0.2"]}) == [("ips",)]
+
+
+def test_diff_compares_dict_lists_in_order():
+    remote = {"labels": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]}
+    assert diff(remote, {"labels": [{"id": 1}, {"id": 2}]}) == []
+    assert diff(remote, {"labels": [{"id": 2}, {"id": 1}]}) == [("labels",)]
+
+
+def test_diff_reports_nested_paths():
+    remote = {"nms": {"snmp": {"port": 161, "community": "public"}}}
+    desired = {"nms": {"snmp": {"port": 1161, "community": "public"}}}
+    assert diff(remote, desired) == [("nms", "snmp", "port")]
+
+
+def test_changed_fields_returns_top_level_fields_once():
+    remote = {"a": {"x": 1, "y": 2}, "b": 1}
+    desired = {"a": {"x": 0, "y": 0}, "b": 2}
+    assert changed_fields(remote, desired) == ["a", "b"]
+
+
+def test_changed_fields_skips_ignored_dotted_paths():
+    remote = {"conf": {"user": "u", "secret": None}, "password": None}
+    desired = {"conf": {"user": "u", "secret": "s"}, "password": "p"}
+    assert changed_fields(remote, desired, ignore=("conf.secret", "password")) == []
+    desired["conf"]["user"] = "v"
+    assert changed_fields(remote, desired, ignore=("conf.secret", "password")) == ["conf"]
+
+
+def test_changed_values_keeps_listed_fields_that_are_set():
+    desired = {"a": 1, "b": None, "c": 3}
+    assert changed_values(desired, ["a", "b"]) == {"a": 1}
+
+
+def test_overlay_merges_dicts_and_skips_none():
+    remote = {"postalAddress": {"city": "Paris", "country": "FR"}, "lat": 1}
+    merged = overlay(remote, {"postalAddress": {"city": "Lyon", "country": None}, "lat": None})
+    assert merged == {"postalAddress": {"city": "Lyon", "country": "FR"}, "lat": 1}
+    assert remote["postalAddress"]["city"] == "Paris"
+
+
+def test_overlay_replaces_lists_and_scalars():
+    assert overlay({"ips": ["a", "b"]}, {"ips": ["c"]}) == {"ips": ["c"]}
+    assert overlay("old", {"a": 1}) == {"a": 1}
+
+
+def test_merge_update_sends_back_untouched_fields():
+    remote = {"id": "1", "name": "a", "description": "old", "nms": {"agentId": "x", "snmp": {"port": 161}}}
+    desired = {"name": "a", "description": "new", "nms": {"snmp": {"port": 1161}}}
+    payload = merge_update(remote, desired, ["description", "nms"])
+    assert payload == {"id": "1", "name": "a", "description": "new", "nms": {"agentId": "x", "snmp": {"port": 1161}}}
+    assert remote["nms"]["snmp"]["port"] == 161
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import gzip
+import json
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils import kentik_http
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answer every request with its method, path and body as JSON, over keep-alive connections"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        self.server.peers.add(self.client_address)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.dumps({
+            "method": self.command,
+            "path": self.path,
+            "body": self.rfile.read(length).decode("utf-8"),
+        }).encode("utf-8")
+        gzipped = self.path.startswith("/gzip") and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path.startswith("/drop"):
+            # Close without announcing it, like a server timing out an idle keep-alive connection.
+            self.close_connection = True
+
+    do_GET = do_PUT = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.peers = set()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def pools(monkeypatch):
+    monkeypatch.setattr(kentik_http, "_POOLS", {})
+    for key in ("http_proxy", "HTTP_PROXY", "https_proxy", "HTTPS_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(key, raising=False)
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_request_reads_body_and_reuses_connection(server):
+    first = kentik_http.request("GET", url(server, "/a"), timeout=5)
+    second = kentik_http.request("PUT", url(server, "/b"), data='{"x": 1}', timeout=5)
+    assert first.status_code == 200
+    assert first.json() == {"method": "GET", "path": "/a", "body": ""}
+    assert second.json() == {"method": "PUT", "path": "/b", "body": '{"x": 1}'}
+    assert len(server.peers) == 1
+
+
+def test_read_hands_connection_back(server):
+    response = kentik_http.request("GET", url(server, "/a"), timeout=5, stream=True)
+    pool = kentik_http.get_pool("http", f"127.0.0.1:{server.server_address[1]}")
+    assert pool.idle == []
+    assert json.loads(response.read()) == {"method": "GET", "path": "/a", "body": ""}
+    assert len(pool.idle) == 1
+
+
+def test_gzip_body_is_decoded(server):
+    response = kentik_http.request("GET", url(server, "/gzip"), timeout=5)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["path"] == "/gzip"
+
+
+def test_iter_content_streams_whole_body(server):
+    response = kentik_http.request("GET", url(server, "/gzip/stream"), timeout=5, stream=True)
+    assert json.loads(b"".join(response.iter_content(chunk_size=8)))["path"] == "/gzip/stream"
+
+
+def test_dropped_idle_connection_is_replaced(server):
+    kentik_http.request("GET", url(server, "/drop"), timeout=5)
+    response = kentik_http.request("GET", url(server, "/after"), timeout=5)
+    assert response.json()["path"] == "/after"
+    assert len(server.peers) == 2
+
+
+def test_refused_connection_is_not_connected():
+    with pytest.raises(kentik_http.TransportError) as exc:
+        kentik_http.request("GET", "http://127.0.0.1:1/", timeout=5)
+    assert exc.value.connected is False
+
+
+def test_pools_are_kept_apart_per_key_and_certificate_settings():
+    pool = kentik_http.get_pool("https", "api.example.com", "a@example.com")
+    assert kentik_http.get_pool("https", "api.example.com", "a@example.com") is pool
+    assert kentik_http.get_pool("https", "api.example.com", "b@example.com") is not pool
+    assert kentik_http.get_pool("https", "api.example.com", "a@example.com", validate_certs=False) is not pool
+
+
+def test_ssl_context_validates_by_default():
+    context = kentik_http.ssl_context()
+    assert context.verify_mode == ssl.CERT_REQUIRED
+    assert context.check_hostname is True
+    assert kentik_http.ssl_context() is context
+
+
+def test_ssl_context_without_validation():
+    context = kentik_http.ssl_context(validate_certs=False)
+    assert context.verify_mode == ssl.CERT_NONE
+    assert context.check_hostname is False
+
+
+def test_ssl_context_ca_path(tmp_path):
+    context = kentik_http.ssl_context(ca_path=str(tmp_path))
+    assert context.verify_mode == ssl.CERT_REQUIRED
+    with pytest.raises((OSError, ssl.SSLError)):
+        kentik_http.ssl_context(ca_path=str(tmp_path / "missing.pem"))
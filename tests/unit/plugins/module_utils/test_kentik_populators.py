@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_populators import (
+    build_populator,
+    criterion_digest,
+    diff_indexes,
+    fan_out,
+    index_populators,
+    index_upserts,
+    iter_address_groups,
+    merge_upserts,
+)
+
+
+def row(customer, address, port=""):
+    return {"customer": customer, "ip_address": address, "port": port}
+
+
+def test_iter_address_groups_groups_unsorted_rows_across_runs():
+    rows = [row("b", "10.0.0.1"), row("a", "10.0.0.2", "80"), row("b", "10.0.0.3"), row("a", "10.0.0.4", "80")]
+    groups = list(iter_address_groups(rows, max_addresses=10, run_size=2))
+    assert groups == [
+        ("a", [("80", ["10.0.0.2", "10.0.0.4"])]),
+        ("b", [("", ["10.0.0.1", "10.0.0.3"])]),
+    ]
+
+
+def test_iter_address_groups_splits_large_address_lists():
+    rows = [row("a", f"10.0.0.{index}") for index in range(5)]
+    groups = list(iter_address_groups(rows, max_addresses=2))
+    assert [len(addresses) for _port, addresses in groups[0][1]] == [2, 2, 1]
+
+
+def test_digest_matches_between_batch_and_api_forms():
+    upsert = build_populator("a", "src", [("80", ["10.0.0.1", "10.0.0.0/24"]), ("", ["2001:DB8::1"])])
+    returned = [
+        {"id": 1, "value": "a", "direction": "SRC", "port": "80", "addr": "10.0.0.0/24,10.0.0.1/32", "addr_count": 257},
+        {"id": 2, "value": "a", "direction": "SRC", "addr": "2001:db8::1/128", "created_date": "2024-01-01"},
+    ]
+    assert index_upserts([upsert]) == index_populators(reversed(returned))
+
+
+def test_digest_changes_with_criteria():
+    base = {"direction": "SRC", "addr": ["10.0.0.1"]}
+    assert criterion_digest(base) == criterion_digest({"direction": "src", "addr": "10.0.0.1/32", "port": []})
+    assert criterion_digest(base) != criterion_digest({"direction": "DST", "addr": ["10.0.0.1"]})
+    assert criterion_digest(base) != criterion_digest(dict(base, port=["80"]))
+
+
+def test_diff_indexes():
+    existing = index_upserts([build_populator(value, "SRC", [("", ["10.0.0.1"])]) for value in ("a", "b", "c")])
+    desired = index_upserts([
+        build_populator("a", "SRC", [("", ["10.0.0.1"])]),
+        build_populator("b", "SRC", [("", ["10.0.0.2"])]),
+        build_populator("d", "SRC", [("", ["10.0.0.1"])]),
+    ])
+    assert diff_indexes(desired, existing) == ({"b", "d"}, ["c"], 1)
+
+
+def test_merge_upserts_keeps_every_criterion():
+    first = build_populator("a", "SRC", [("80", ["10.0.0.1"])])
+    second = build_populator("a", "SRC", [("443", ["10.0.0.1"])])
+    merged = merge_upserts([first, second, build_populator("b", "SRC", [])])
+    assert [populator["value"] for populator in merged] == ["a", "b"]
+    assert merged[0]["criteria"] == first["criteria"] + second["criteria"]
+    assert len(first["criteria"]) == 1
+
+
+def test_fan_out_sends_each_element_to_its_consumer():
+    items = ((index, -index) for index in range(2500))
+    results = fan_out(items, [list, sum], handoff_size=100, depth=2)
+    assert results == [list(range(2500)), -sum(range(2500))]
+
+
+def test_fan_out_aborts_the_other_consumers_when_one_fails():
+    seen = []
+
+    def failing(elements):
+        for element in elements:
+            if element == 150:
+                raise ValueError("bad element")
+
+    def collecting(elements):
+        for element in elements:
+            seen.append(element)
+        return "finished"
+
+    with pytest.raises(ValueError, match="bad element"):
+        fan_out(((index, index) for index in range(100000)), [failing, collecting], handoff_size=50, depth=1)
+    assert len(seen) < 100000
+
+
+def test_fan_out_aborts_the_consumers_when_reading_fails():
+    finished = threading.Event()
+
+    def items():
+        for index in range(10):
+            yield index, index
+        raise IOError("read failed")
+
+    def consumer(elements):
+        list(elements)
+        finished.set()
+
+    with pytest.raises(IOError, match="read failed"):
+        fan_out(items(), [consumer, consumer], handoff_size=3)
+    assert not finished.is_set()
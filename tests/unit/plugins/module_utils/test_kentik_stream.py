@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_client import KentikError
+from ansible_collections.kentik.kentik_config.plugins.module_utils.kentik_stream import (
+    iter_items,
+    iter_json_array,
+    matches_any,
+)
+
+
+def chunked(data, size):
+    """Split bytes into chunks of size bytes"""
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+DOCUMENT = {
+    "devices": [
+        {"id": "1", "deviceName": "réseau-1", "sendingIps": ["10.0.0.1"], "lat": 12.5},
+        {"id": "2", "deviceName": "edge", "nested": {"a": [1, 2, {"b": None}]}},
+        12345,
+        True,
+    ],
+    "nextPageToken": "abc",
+    "total": 4,
+}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_iter_json_array_any_chunk_size(size):
+    data = json.dumps(DOCUMENT, indent=1).encode("utf-8")
+    extras = {}
+    items = list(iter_json_array(chunked(data, size), "devices", extras))
+    assert items == DOCUMENT["devices"]
+    assert extras == {"nextPageToken": "abc", "total": 4}
+
+
+def test_iter_json_array_nested_key():
+    data = json.dumps({"customDimension": {"id": 7, "populators": [{"value": "a"}, {"value": "b"}]}}).encode("utf-8")
+    assert list(iter_json_array(chunked(data, 5), ("customDimension", "populators"))) == [{"value": "a"}, {"value": "b"}]
+
+
+@pytest.mark.parametrize("data", [b"{}", b'{"devices": []}', b'{"other": [1, 2]}'])
+def test_iter_json_array_empty(data):
+    assert list(iter_json_array([data], "devices")) == []
+
+
+@pytest.mark.parametrize("data", [b'{"devices": [{"id": 1}', b'["devices"]', b'{"devices": [1 2]}'])
+def test_iter_json_array_malformed(data):
+    with pytest.raises(KentikError):
+        list(iter_json_array(chunked(data, 4), "devices"))
+
+
+def test_iter_json_array_is_lazy():
+    def chunks():
+        yield b'{"devices": [{"id": 1}, '
+        raise AssertionError("read past the first element")
+
+    assert next(iter_json_array(chunks(), "devices")) == {"id": 1}
+
+
+class PagedClient(object):
+    """Serve the pages of a list endpoint by page token"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.paths = []
+
+    def stream(self, method, path, api="grpc"):
+        self.paths.append(path)
+        token = path.split("pageToken=")[1] if "pageToken=" in path else None
+        return chunked(json.dumps(self.pages[token]).encode("utf-8"), 16)
+
+
+def test_iter_items_follows_page_tokens_and_projects():
+    client = PagedClient({
+        None: {"devices": [{"id": "1", "deviceName": "a", "extra": 1}], "nextPageToken": "p 2"},
+        "p%202": {"devices": [{"id": "2", "deviceName": "b"}], "nextPageToken": ""},
+    })
+    items = list(iter_items(client, "/device/v202308beta1/device?x=1", "devices", fields=("id", "deviceName")))
+    assert items == [{"id": "1", "deviceName": "a"}, {"id": "2", "deviceName": "b"}]
+    assert client.paths == ["/device/v202308beta1/device?x=1", "/device/v202308beta1/device?x=1&pageToken=p%202"]
+
+
+def test_iter_items_rejects_repeated_page_token():
+    client = PagedClient({
+        None: {"devices": [], "nextPageToken": "loop"},
+        "loop": {"devices": [], "nextPageToken": "loop"},
+    })
+    with pytest.raises(KentikError):
+        list(iter_items(client, "/devices", "devices"))
+
+
+def test_matches_any():
+    assert matches_any("edge-01", None)
+    assert matches_any("edge-01", ["core-*", "edge-*"])
+    assert not matches_any("Edge-01", ["edge-*"])
+    assert matches_any("edge[1]", ["edge[[]1]"])
+    assert not matches_any(None, ["*x"])